@@ -1,12 +1,23 @@
 import os
+import httpx
 import requests
 from dotenv import load_dotenv, find_dotenv
+from http_client import endpoint, get_async_client, get_session, request_timeout
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from prompt_registry import get_prompt
+from fewshot import FEWSHOT_K, with_examples, with_examples_async
+from resilience import get_resilience
+from chunking import analyze_in_chunks, analyze_in_chunks_async, needs_chunking, merge_text_verdicts
 
 # Load environment variables if available.
 _ = load_dotenv(find_dotenv())
 
-# Set the custom API endpoint URL.
-CUSTOM_API_URL = os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query")
+# Set the custom API endpoint URL (the mock server when USE_MOCK_LLM=1).
+CUSTOM_API_URL = endpoint(os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query"), "/query")
+
+# System prompt template, loaded once (the version is selected with PROMPT_CUSTOM_API_VERSION).
+PROMPT = get_prompt("custom_api")
 
 # Optionally, set a toolkit name (if needed) via an environment variable.
 # TKD_NAME can be set in your main application.
@@ -14,25 +25,17 @@ CUSTOM_API_URL = os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query")
 
 def get_system_prompt() -> str:
     """
-    Returns a multi-line system prompt string for the custom API,
-    using triple-quoted strings for readability.
+    Returns the system prompt for the custom API: the selected version of the
+    custom_api template in prompts/, loaded and hashed once at import.
+    """
+    return PROMPT.text
+
+def prompt_version() -> str:
     """
-    prompt = """
-You are a compliance analyst trained to detect and categorize potential fraudulent or non compliant communication within a regulated banking environment.
-Given a communication excerpt, identify whether it suggests suspicious or fraudulent activity. If yes, assign it to one of the following categories:
-1. Guarantees & Assurances
-2. Gifts & Entertainment
-3. Front Running
-
-Instructions:
-1. Read the message carefully.
-2. If it contains language suggesting fraud, ethical lapses, or regulatory risk, classify it and respond: "Suspicious Activity detected".
-3. If no suspicious activity is detected, respond: "No suspicious activity detected".
-4. Provide a brief explanation of the reasoning behind the classification.
+    Returns the label (family/version@hash) of the system prompt, recorded with each result;
+    "+fewshot<k>" is added when similar examples from the category guide are appended.
     """
-    result = prompt.strip()
-    print(f"DEBUG: system_prompt (first 100 chars): {result[:100]}...")
-    return result
+    return f"{PROMPT.label}+fewshot{FEWSHOT_K}" if FEWSHOT_K > 0 else PROMPT.label
 
 def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str:
     """
@@ -58,6 +61,22 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
         print("ERROR:", error_msg)
         raise ValueError(error_msg)
     
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return analyze_in_chunks(input_text, lambda chunk: invoke_custom_api(tkd_name, chunk, system_prompt),
+                                 merge_text_verdicts)
+
+    # The examples most similar to the input are appended to the static instructions (FEWSHOT_K > 0).
+    system_prompt = with_examples(system_prompt, input_text)
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+    
     payload = {
         "tkd_name": tkd_name,
         "input": input_text,
@@ -66,14 +85,74 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
     print("DEBUG: Invoking custom API with payload:")
     print(f"DEBUG: {payload}")
     
+    # Concurrent identical calls share one request instead of each calling the API.
+    return get_single_flight().do(cache_key, _post_custom_api, payload, cache_key)
+
+async def invoke_custom_api_async(tkd_name: str, input_text: str, system_prompt: str) -> str:
+    """
+    Async variant of invoke_custom_api for use inside async FastAPI handlers.
+
+    The request goes through the shared, pooled httpx.AsyncClient (keep-alive, pool
+    size and timeouts configured in http_client.py), so the event loop keeps serving
+    other requests while the custom API is working.
+
+    Args:
+        tkd_name (str): The toolkit/model identifier.
+        input_text (str): The email content.
+        system_prompt (str): The analysis instructions.
+
+    Returns:
+        str: The plain text response from the custom API.
+    """
+    if not input_text or input_text.strip() == "":
+        error_msg = "Input text is empty. Cannot invoke custom API without email content."
+        print("ERROR:", error_msg)
+        raise ValueError(error_msg)
+
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return await analyze_in_chunks_async(
+            input_text, lambda chunk: invoke_custom_api_async(tkd_name, chunk, system_prompt), merge_text_verdicts
+        )
+
+    # The examples most similar to the input are appended to the static instructions (FEWSHOT_K > 0).
+    system_prompt = await with_examples_async(system_prompt, input_text)
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+
+    payload = {
+        "tkd_name": tkd_name,
+        "input": input_text,
+        "system_prompt": system_prompt
+    }
+    print(f"DEBUG: Invoking custom API (async) with payload: {payload}")
+
+    # Concurrent identical calls await one shared request instead of each calling the API.
+    return await get_single_flight().do_async(cache_key, _post_custom_api_async, payload, cache_key)
+
+def _post_custom_api(payload: dict, cache_key: str) -> str:
+    """
+    Sends the payload to the custom API and caches its plain text response.
+    """
     headers = {"Content-Type": "application/json"}
     
+    def send(timeout: float):
+        response = get_session().post(CUSTOM_API_URL, json=payload, headers=headers, timeout=request_timeout(timeout))
+        response.raise_for_status()  # Raise an error if HTTP error code.
+        return response
+
     try:
-        response = requests.post(CUSTOM_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
+        # Per-attempt timeout, retries with backoff and the circuit breaker are in resilience.py.
+        response = get_resilience("custom_api").call(send)
     except requests.exceptions.HTTPError as he:
         print("ERROR: HTTP error when invoking custom API:", he)
-        print("ERROR: Response Content:", response.text)
+        print("ERROR: Response Content:", he.response.text)
         raise he
     except Exception as e:
         print("ERROR invoking custom API:", e)
@@ -81,4 +160,31 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
     
     result = response.text
     print(f"DEBUG: Received custom API response (first 100 chars): {result[:100]}...")
+    get_result_cache().put(cache_key, result)
+    return result
+
+async def _post_custom_api_async(payload: dict, cache_key: str) -> str:
+    """
+    Async variant of _post_custom_api using the pooled httpx.AsyncClient.
+    """
+    headers = {"Content-Type": "application/json"}
+
+    async def send(timeout: float):
+        response = await get_async_client().post(CUSTOM_API_URL, json=payload, headers=headers)
+        response.raise_for_status()
+        return response
+
+    try:
+        response = await get_resilience("custom_api").call_async(send)
+    except httpx.HTTPStatusError as he:
+        print("ERROR: HTTP error when invoking custom API:", he)
+        print("ERROR: Response Content:", he.response.text)
+        raise he
+    except Exception as e:
+        print("ERROR invoking custom API:", e)
+        raise e
+
+    result = response.text
+    print(f"DEBUG: Received custom API response (first 100 chars): {result[:100]}...")
+    await get_result_cache().put_async(cache_key, result)
     return result
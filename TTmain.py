@@ -5,9 +5,12 @@ from fastapi.responses import JSONResponse
 
 # Import custom modules.
 # parser.py should define parse_email(file_path: str) -> dict
-# analyzer.py should define get_system_prompt() -> str and invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
+# analyzer.py should define get_system_prompt() -> str and invoke_custom_api_async(tkd_name: str, input_text: str, system_prompt: str) -> str
 from parser import parse_email
-from analyzer import get_system_prompt, invoke_custom_api
+from parse_cache import get_parse_cache
+from analyzer import get_system_prompt, invoke_custom_api_async
+from http_client import close_async_client
+from reply_history import prepare_body
 
 # Determine the absolute base directory and set the archive folder.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,6 +32,11 @@ app = FastAPI(
     version="1.0"
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    # Release the pooled connections to the custom API.
+    await close_async_client()
+
 @app.get("/analyze-email")
 async def analyze_email_endpoint(
     filename: str = Query(..., description="Filename of the .msg email to analyze")
@@ -47,25 +55,27 @@ async def analyze_email_endpoint(
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
 
     try:
-        # Parse the .msg file to extract metadata and formatted email body.
-        email_data = parse_email(file_path)
+        # Parse the .msg file to extract metadata and formatted email body
+        # (served from the parse cache when the file content is unchanged).
+        email_data = get_parse_cache().parse(parse_email, file_path)
         print("DEBUG: Parsed email data:", email_data)
 
         # Extract the email body (formatted) from the parsed results.
-        email_body = email_data.get("body", "")
+        email_body, history = prepare_body(email_data.get("body", ""))
         print(f"DEBUG: Extracted email body (first 100 chars): {email_body[:100]}...")
 
         # Retrieve the system prompt (instructions) using the analyzer function.
         system_prompt = get_system_prompt()
 
         # Invoke the custom API, sending the toolkit name, email body, and the system prompt.
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        analysis = await invoke_custom_api_async(TKD_NAME, email_body, system_prompt)
         print(f"DEBUG: Custom API analysis received (first 100 chars): {analysis[:100]}...")
 
         # Assemble the response result.
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history
         }
         print("DEBUG: Assembled result:", result)
     except Exception as e:
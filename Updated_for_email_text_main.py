@@ -1,17 +1,25 @@
 import os
+import time
 import uvicorn
-import shutil
-import tempfile
 
 from fastapi import FastAPI, HTTPException, Query, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Import custom modules.
-# parser.py should define parse_email(file_path: str) -> dict.
-# analyzer.py defines get_system_prompt() -> str and invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str.
+# parser.py should define parse_email(source, filename: str = None) -> dict, where source is a path or bytes.
+# analyzer.py defines get_system_prompt() -> str and invoke_custom_api_async(tkd_name: str, input_text: str, system_prompt: str) -> str.
+# prompt_version() -> str is the version of the system prompt, recorded with each result.
+# invoke_custom_api_batched has the same signature and may batch short texts (LLM_BATCH_ENABLED=1).
+# stream_custom_api has the same signature and is an async generator of response text chunks.
 from parser import parse_email
-from analyzer import get_system_prompt, invoke_custom_api
+from analyzer import (get_system_prompt, invoke_custom_api_async, invoke_custom_api_batched, prompt_version,
+                      stream_custom_api)
+from http_client import close_async_client
+from resilience import CircuitOpenError, get_resilience
+from reply_history import prepare_body
+from prescreen import rules_verdict, screen_and_analyze_async, screen_body
+from streaming import single_chunk, sse_analysis
 
 # Determine the absolute base directory (project folder) and set the archive folder.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -33,6 +41,11 @@ app = FastAPI(
     version="1.0"
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    # Release the pooled connections to the custom API.
+    await close_async_client()
+
 # ---------------------------
 # Endpoint 1: Analyze via Filename (GET)
 # ---------------------------
@@ -56,21 +69,30 @@ async def analyze_email_endpoint(
         # Parse the email file.
         email_data = parse_email(file_path)
         print("DEBUG: Parsed email data:", email_data)
-        email_body = email_data.get("body", "")
+        email_body, history = prepare_body(email_data.get("body", ""))
         print(f"DEBUG: Extracted email body (first 100 chars): {email_body[:100]}...")
         
         # Get the system prompt (instructions) from the analyzer.
         system_prompt = get_system_prompt()
         
-        # Invoke the custom API.
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        # Pre-screen the body and invoke the custom API unless PRESCREEN_MODE skips it.
+        analysis, screen = await screen_and_analyze_async(
+            email_body, lambda text: invoke_custom_api_async(TKD_NAME, text, system_prompt)
+        )
         print(f"DEBUG: Custom API analysis received (first 100 chars): {analysis[:100]}...")
         
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history,
+            "prescreen": screen,
+            "prompt_version": prompt_version()
         }
         print("DEBUG: Assembled result:", result)
+    except CircuitOpenError as e:
+        # The custom API is down; fail fast instead of queueing more requests.
+        print("DEBUG: Custom API unavailable in /analyze-email endpoint:", str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print("DEBUG: Exception in /analyze-email endpoint:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -93,10 +115,16 @@ async def analyze_text_endpoint(request: TextAnalysisRequest):
     
     try:
         system_prompt = get_system_prompt()
-        analysis = invoke_custom_api(TKD_NAME, text_input, system_prompt)
+        analysis, screen = await screen_and_analyze_async(
+            text_input, lambda text: invoke_custom_api_batched(TKD_NAME, text, system_prompt)
+        )
         print(f"DEBUG: Custom API analysis (first 100 chars): {analysis[:100]}...")
-        result = {"analysis": analysis}
+        result = {"analysis": analysis, "prescreen": screen, "prompt_version": prompt_version()}
         print("DEBUG: Assembled result for text analysis:", result)
+    except CircuitOpenError as e:
+        # The custom API is down; fail fast instead of queueing more requests.
+        print("DEBUG: Custom API unavailable in /analyze-text endpoint:", str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print("DEBUG: Exception in /analyze-text endpoint:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -113,44 +141,90 @@ async def analyze_file_endpoint(file: UploadFile = File(..., description="Upload
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
     
     try:
-        # Save the uploaded file to a temporary file.
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp:
-            temp_file_path = tmp.name
-            content = await file.read()  # Read the file as bytes.
-            tmp.write(content)
-        print(f"DEBUG: Saved uploaded file to temporary path: {temp_file_path}")
-        
-        # Parse the temporary file.
-        email_data = parse_email(temp_file_path)
+        # Read the upload and parse it directly in memory (no temporary file).
+        content = await file.read()  # Read the file as bytes.
+        print(f"DEBUG: Read uploaded file into memory ({len(content)} bytes)")
+        email_data = parse_email(content, filename=file.filename)
         print("DEBUG: Parsed email data:", email_data)
-        email_body = email_data.get("body", "")
+        email_body, history = prepare_body(email_data.get("body", ""))
         print(f"DEBUG: Extracted email body (first 100 chars): {email_body[:100]}...")
         
         # Get the system prompt.
         system_prompt = get_system_prompt()
         
-        # Invoke the custom API.
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        # Pre-screen the body and invoke the custom API unless PRESCREEN_MODE skips it.
+        analysis, screen = await screen_and_analyze_async(
+            email_body, lambda text: invoke_custom_api_async(TKD_NAME, text, system_prompt)
+        )
         print(f"DEBUG: Custom API analysis received (first 100 chars): {analysis[:100]}...")
         
         # Assemble the result.
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history,
+            "prescreen": screen,
+            "prompt_version": prompt_version()
         }
         print("DEBUG: Assembled result for file upload:", result)
+    except CircuitOpenError as e:
+        # The custom API is down; fail fast instead of queueing more requests.
+        print("DEBUG: Custom API unavailable in /analyze-file endpoint:", str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print("DEBUG: Exception in /analyze-file endpoint:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Clean up: remove the temporary file.
-        try:
-            os.remove(temp_file_path)
-            print(f"DEBUG: Removed temporary file: {temp_file_path}")
-        except Exception as e:
-            print("DEBUG: Error removing temporary file:", str(e))
     
     return JSONResponse(content=result)
 
+# ---------------------------
+# Streaming endpoints (server-sent events)
+# ---------------------------
+# Events: "prelude" (email metadata, pre-screen, prompt version), "token" per chunk of the analysis as it arrives,
+# then "verdict" with the full analysis, the parsed verdict and the time to first byte,
+# or "error" if the analysis fails after the stream has started.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def stream_analysis(text: str, started: float, prelude: dict = None) -> StreamingResponse:
+    if get_resilience("custom_api").breaker.state == "open":
+        raise HTTPException(status_code=503, detail="Custom API is unavailable (circuit open)")
+    screen = screen_body(text)
+    if screen["sent_to_llm"]:
+        chunks = stream_custom_api(TKD_NAME, text, get_system_prompt())
+    else:
+        chunks = single_chunk(rules_verdict(screen))
+    prelude = dict(prelude or {}, prescreen=screen, prompt_version=prompt_version())
+    return StreamingResponse(sse_analysis(chunks, started, prelude), media_type="text/event-stream",
+                             headers=SSE_HEADERS)
+
+@app.post("/analyze-text/stream")
+async def analyze_text_stream_endpoint(request: TextAnalysisRequest):
+    started = time.perf_counter()
+    text_input = request.text_input
+    print(f"DEBUG: Received text input for streaming (first 100 chars): {text_input[:100]}...")
+    if not text_input or text_input.strip() == "":
+        raise HTTPException(status_code=400, detail="Text input is empty.")
+    return stream_analysis(text_input, started)
+
+@app.get("/analyze-email/stream")
+async def analyze_email_stream_endpoint(
+    filename: str = Query(..., description="Filename of the .msg email to analyze")
+):
+    started = time.perf_counter()
+    file_path = os.path.join(ARCHIVE_FOLDER, filename)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not filename.lower().endswith(".msg"):
+        raise HTTPException(status_code=400, detail="Only .msg files are supported")
+    try:
+        email_data = parse_email(file_path)
+        email_body, history = prepare_body(email_data.get("body", ""))
+    except Exception as e:
+        print("DEBUG: Exception in /analyze-email/stream endpoint:", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    if not email_body.strip():
+        raise HTTPException(status_code=400, detail="Email body is empty.")
+    return stream_analysis(email_body, started, {"metadata": email_data.get("metadata", {}), "history": history})
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
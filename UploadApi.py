@@ -1,12 +1,12 @@
 import os
 import uvicorn
-import tempfile
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse
 
 # Import custom modules
 from parser import parse_email
-from analyzer import get_system_prompt, invoke_custom_api
+from analyzer import get_system_prompt, invoke_custom_api_async
+from http_client import close_async_client
 
 # Toolkit/model identifier
 TKD_NAME = os.getenv("TKD_NAME", "EmailMonitor1")
@@ -21,6 +21,11 @@ app = FastAPI(
     version="1.0"
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    # Release the pooled connections to the custom API.
+    await close_async_client()
+
 @app.post("/upload-email")
 async def upload_email(file: UploadFile = File(...)):
     print(f"DEBUG: Received uploaded file: {file.filename}")
@@ -29,22 +34,16 @@ async def upload_email(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
 
     try:
-        # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp_file:
-            tmp_path = tmp_file.name
-            content = await file.read()
-            tmp_file.write(content)
-
-        print(f"DEBUG: Saved uploaded file to temporary path: {tmp_path}")
-
-        # Parse the saved file
-        email_data = parse_email(tmp_path)
+        # Parse the uploaded bytes directly in memory (no temporary file).
+        content = await file.read()
+        print(f"DEBUG: Read uploaded file into memory ({len(content)} bytes)")
+        email_data = parse_email(content, filename=file.filename)
         print("DEBUG: Parsed email data")
 
         # Analyze email content
         email_body = email_data.get("body", "")
         system_prompt = get_system_prompt()
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        analysis = await invoke_custom_api_async(TKD_NAME, email_body, system_prompt)
 
         result = {
             "metadata": email_data.get("metadata", {}),
@@ -1,19 +1,12 @@
 import os
 import uvicorn
-import tempfile
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from pydantic import BaseModel, ValidationError
-from typing import List, Dict, Any
-from analyzer import get_system_prompt, invoke_custom_api
+from typing import Dict, Any
+from analyzer import get_system_prompt, invoke_custom_api_async
+from http_client import close_async_client
 from parser import parse_email
-
-class AnalysisResult(BaseModel):
-    summary: str
-    red_flags: List[str]
-    violation_detected: bool
-    violation_type: str
-    explanation: str
-    recommended_action: str
+from verdict_parser import AnalysisResult, VerdictParseError, coerce_verdict, verdict_metrics
 
 class EmailAnalysisResponse(BaseModel):
     metadata: Dict[str, Any]
@@ -30,6 +23,11 @@ app = FastAPI(
     version="1.0"
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    # Release the pooled connections to the custom API.
+    await close_async_client()
+
 @app.post("/upload-email", response_model=EmailAnalysisResponse)
 async def upload_email(file: UploadFile = File(...)):
     print(f"DEBUG: Received uploaded file: {file.filename}")
@@ -38,28 +36,23 @@ async def upload_email(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
 
     try:
-        # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp_file:
-            tmp_path = tmp_file.name
-            content = await file.read()
-            tmp_file.write(content)
-
-        print(f"DEBUG: Saved uploaded file to temporary path: {tmp_path}")
-
-        # Parse the saved file
-        email_data = parse_email(tmp_path)
+        # Parse the uploaded bytes directly in memory (no temporary file).
+        content = await file.read()
+        print(f"DEBUG: Read uploaded file into memory ({len(content)} bytes)")
+        email_data = parse_email(content, filename=file.filename)
         print("DEBUG: Parsed email data")
 
         # Analyze content
         email_body = email_data.get("body", "")
         system_prompt = get_system_prompt()
-        analysis_dict = invoke_custom_api(TKD_NAME, email_body, system_prompt)
 
-        # Validate and return structured analysis
+        # Validate and return structured analysis; the analyzer already repairs fenced,
+        # prose-wrapped and label-format answers, so this fallback is the last resort.
         try:
-            analysis = AnalysisResult(**analysis_dict)
-        except ValidationError as ve:
-            print("ERROR: LLM response is not valid JSON structure:", ve)
+            analysis_dict = await invoke_custom_api_async(TKD_NAME, email_body, system_prompt)
+            analysis = coerce_verdict(analysis_dict)
+        except (VerdictParseError, ValidationError) as ve:
+            print("ERROR: LLM response could not be parsed into a verdict:", ve)
             analysis = AnalysisResult(
                 summary="LLM response could not be parsed.",
                 red_flags=[],
@@ -68,6 +61,7 @@ async def upload_email(file: UploadFile = File(...)):
                 explanation="The LLM returned an unexpected or invalid format.",
                 recommended_action="Review input and retry or escalate."
             )
+        print(f"DEBUG: Verdict parse metrics: {verdict_metrics()}")
 
         return EmailAnalysisResponse(
             metadata=email_data.get("metadata", {}),
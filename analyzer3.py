@@ -1,44 +1,72 @@
 import os
 import openai
 from dotenv import load_dotenv, find_dotenv
+from http_client import USE_MOCK_LLM, endpoint
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from rate_limiter import estimate_request_tokens, get_rate_limiter
+from prompt_registry import get_prompt
+from chunking import analyze_in_chunks, join_text_verdicts, needs_chunking
 
 # Load environment variables from .env file
 _ = load_dotenv(find_dotenv())
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# The mock server (USE_MOCK_LLM=1) accepts any key.
+openai.api_key = os.getenv("OPENAI_API_KEY") or ("mock" if USE_MOCK_LLM else None)
+openai.api_base = endpoint(os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"), "/v1")
+
+# Prompt template, loaded once (the version is selected with PROMPT_OPENAI_VERSION).
+PROMPT = get_prompt("openai")
 
 def get_completion(prompt: str, model: str = "gpt-3.5-turbo") -> str:
     """
     Calls the OpenAI API with the provided prompt and returns the analysis.
+    Results are cached by prompt and model, since the call runs at temperature 0.
+    """
+    cache = get_result_cache()
+    cache_key = cache.key_for(prompt, "", model)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    # Concurrent identical prompts share one request.
+    return get_single_flight().do(cache_key, _create_completion, prompt, model, cache_key)
+
+def _create_completion(prompt: str, model: str, cache_key: str) -> str:
+    """
+    Calls the ChatCompletion endpoint and caches the response content.
     """
     messages = [{"role": "user", "content": prompt}]
-    response = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=0
+    response = get_rate_limiter(model).call(
+        lambda: openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=0
+        ),
+        estimate_request_tokens(prompt)
     )
-    return response.choices[0].message.content
+    content = response.choices[0].message.content
+    get_result_cache().put(cache_key, content)
+    return content
 
 def build_prompt(text: str) -> str:
     """
     Constructs the prompt for the LLM instructing it to analyze the provided text
-    for potential fraudulent or non-compliant behavior.
-    """
-    return f"""
-You are a banking compliance and fraud detection expert. You are trained to detect and categorize potential fraudulent or non-compliant communications.
-Analyze the text between the triple quotes below. Your task is to determine if the content indicates:
-1. Potential fraudulent activity.
-2. Non-compliance with banking regulations (such as KYC/AML, insider trading, money laundering, misrepresentation, etc).
-
-For your output, provide the following:
-- Summary of what the text is about.
-- List of any red flags or concerning statements.
-- Whether Fraud or Compliance violation is suspected (Yes/No).
-- If yes, explain why and what rule or pattern it potentially violates.
-- Also the output with which this communication can be tagged.
-- Suggested next action (e.g. escalate to compliance team, request more info, no action needed).
-
-Be thorough, unbiased, and consider the context of the financial or banking industry.
-
-\"\"\"{text}\"\"\"
-"""
+    for potential fraudulent or non-compliant behavior. The static instructions of the
+    selected openai template come first and the text last, so prompts share a cacheable prefix.
+    """
+    return PROMPT.render(text)
+
+def prompt_version() -> str:
+    """
+    Returns the label (family/version@hash) of the prompt template, recorded with each result.
+    """
+    return PROMPT.label
+
+def analyze_text(text: str, model: str = "gpt-3.5-turbo") -> str:
+    """
+    Builds the prompt for the text and returns the LLM analysis. Texts above
+    CHUNK_THRESHOLD_TOKENS are analyzed in concurrent chunks and the answers joined per part.
+    """
+    if needs_chunking(text):
+        return analyze_in_chunks(text, lambda chunk: get_completion(build_prompt(chunk), model), join_text_verdicts)
+    return get_completion(build_prompt(text), model)
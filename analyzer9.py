@@ -1,19 +1,30 @@
 import os
 import openai
 from dotenv import load_dotenv, find_dotenv
+from http_client import endpoint
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from rate_limiter import estimate_request_tokens, get_rate_limiter
+from prompt_registry import get_prompt
+from chunking import analyze_in_chunks, join_text_verdicts, needs_chunking
 
 # Load environment variables if available.
 _ = load_dotenv(find_dotenv())
 
-# Configure Azure OpenAI connection details.
+# Configure Azure OpenAI connection details (the mock server when USE_MOCK_LLM=1).
 openai.api_type = "azure"
-openai.api_base = os.getenv("AZURE_OPENAI_API_BASE", "https://your-resource-name.openai.azure.com")
+openai.api_base = endpoint(os.getenv("AZURE_OPENAI_API_BASE", "https://your-resource-name.openai.azure.com"), "")
 openai.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 openai.api_key = os.getenv("AZURE_OPENAI_API_KEY", "your-azure-api-key")
 
+# Prompt template, loaded once (the version is selected with PROMPT_AZURE_OPENAI_VERSION).
+PROMPT = get_prompt("azure_openai")
+
 def build_prompt(text: str) -> str:
     """
-    Constructs a prompt for the language model, embedding the email content.
+    Constructs a prompt for the language model: the static instructions of the selected
+    azure_openai template, followed by the email content. Every prompt starts with the
+    same prefix, so the service can reuse it from its prompt cache.
     
     Debug:
       Logs the first 100 characters of the constructed prompt.
@@ -24,19 +35,16 @@ def build_prompt(text: str) -> str:
     Returns:
         str: The prompt to be sent to the LLM.
     """
-    prompt = f"""
-You are a banking compliance and fraud detection expert. You are trained to detect and categorize potential fraudulent or non-compliant communications.
-Analyze the following email content:
-\"\"\"{text}\"\"\"
-Provide:
-- A summary of the email content.
-- A list of red flags.
-- Whether there is evidence of fraud or compliance issues.
-- Suggested next action.
-    """
+    prompt = PROMPT.render(text)
     print(f"Debug: Built prompt (first 100 chars): {prompt[:100]}...")
     return prompt
 
+def prompt_version() -> str:
+    """
+    Returns the label (family/version@hash) of the prompt template, recorded with each result.
+    """
+    return PROMPT.label
+
 def get_completion(prompt: str, engine: str = "gpt-35-turbo") -> str:
     """
     Sends the prompt to Azure OpenAI's ChatCompletion endpoint and returns the response.
@@ -54,15 +62,53 @@ def get_completion(prompt: str, engine: str = "gpt-35-turbo") -> str:
     print("Debug: Calling Azure OpenAI with prompt:")
     print(f"Debug: {prompt[:100]}...")  # Print only the first 100 characters for brevity.
     
+    # Calls run at temperature 0, so the same prompt and deployment always give the same answer.
+    cache = get_result_cache()
+    cache_key = cache.key_for(prompt, "", engine)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print(f"Debug: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+
+    # Concurrent identical prompts (e.g. during a bulk run) share one request.
+    return get_single_flight().do(cache_key, _create_completion, prompt, engine, cache_key)
+
+def analyze_text(text: str, engine: str = "gpt-35-turbo") -> str:
+    """
+    Builds the prompt for an email body and returns the LLM analysis.
+
+    Bodies above CHUNK_THRESHOLD_TOKENS are split into paragraph chunks that are
+    analyzed concurrently; the chunk answers are joined, one part per chunk.
+
+    Args:
+        text (str): The formatted email body.
+        engine (str, optional): The deployment name; defaults to "gpt-35-turbo".
+
+    Returns:
+        str: The analysis.
+    """
+    if needs_chunking(text):
+        return analyze_in_chunks(text, lambda chunk: get_completion(build_prompt(chunk), engine), join_text_verdicts)
+    return get_completion(build_prompt(text), engine)
+
+def _create_completion(prompt: str, engine: str, cache_key: str) -> str:
+    """
+    Calls the ChatCompletion endpoint and caches the response content.
+    """
     messages = [{"role": "user", "content": prompt}]
     try:
-        response = openai.ChatCompletion.create(
-            engine=engine,  # For Azure, this is your deployment name.
-            messages=messages,
-            temperature=0
+        # Stays within the deployment's TPM/RPM quota and retries 429s (see rate_limiter.py).
+        response = get_rate_limiter(engine).call(
+            lambda: openai.ChatCompletion.create(
+                engine=engine,  # For Azure, this is your deployment name.
+                messages=messages,
+                temperature=0
+            ),
+            estimate_request_tokens(prompt)
         )
         content = response.choices[0].message.content
         print(f"Debug: Received response (first 100 chars): {content[:100]}...")
+        get_result_cache().put(cache_key, content)
         return content
     except Exception as e:
         print(f"Error in get_completion: {e}")
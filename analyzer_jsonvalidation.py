@@ -1,34 +1,55 @@
 import os
+import httpx
 import requests
-import json
 from dotenv import load_dotenv, find_dotenv
+from http_client import endpoint, get_async_client, get_session, request_timeout
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from prompt_registry import get_prompt
+from resilience import get_resilience
+from verdict_parser import VerdictParseError, parse_verdict, parse_verdict_object
+from json_projection import JsonProjector, project_chunks, project_chunks_async
+from chunking import analyze_in_chunks, analyze_in_chunks_async, needs_chunking, merge_json_verdicts
 
 _ = load_dotenv(find_dotenv())
 
-CUSTOM_API_URL = os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query")
+CUSTOM_API_URL = endpoint(os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query"), "/query")
+# Size of the pieces in which the (possibly multi-megabyte) response is read and projected.
+RESPONSE_CHUNK_SIZE = int(os.getenv("CUSTOM_API_RESPONSE_CHUNK_SIZE", str(64 * 1024)))
 
-def get_system_prompt() -> str:
-    return """
-You are a compliance analyst trained to detect and categorize potential fraudulent or non-compliant communication within a regulated banking environment.
-
-Given an email text, analyze and return your response strictly in JSON with the following fields:
+# System prompt template, loaded once (the version is selected with PROMPT_CUSTOM_API_JSON_VERSION).
+PROMPT = get_prompt("custom_api_json")
 
-{
-  "summary": "<Brief summary of the email>",
-  "red_flags": ["<list any suspicious phrases or behaviors>"],
-  "violation_detected": true | false,
-  "violation_type": "<One of: Guarantees & Assurances, Gifts & Entertainment, Front Running, or None>",
-  "explanation": "<Explain why this is a violation or not>",
-  "recommended_action": "<e.g., Escalate to compliance team, Request more info, No action needed>"
-}
+def get_system_prompt() -> str:
+    """
+    Returns the system prompt for the custom API: the selected version of the
+    custom_api_json template in prompts/, loaded and hashed once at import.
+    """
+    return PROMPT.text
 
-If no red flags are found, set violation_type to "None", violation_detected to false, and recommended_action to "No action needed".
-""".strip()
+def prompt_version() -> str:
+    """
+    Returns the label (family/version@hash) of the system prompt, recorded with each result.
+    """
+    return PROMPT.label
 
 def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> dict:
     if not input_text or input_text.strip() == "":
         raise ValueError("Input text is empty. Cannot invoke custom API without email content.")
 
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return analyze_in_chunks(input_text, lambda chunk: invoke_custom_api(tkd_name, chunk, system_prompt),
+                                 merge_json_verdicts)
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print("DEBUG: Result cache hit.")
+        return cached
+
     payload = {
         "tkd_name": tkd_name,
         "input": input_text,
@@ -36,25 +57,118 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> dic
     }
     print("DEBUG: Invoking custom API with payload:", payload)
 
+    # Concurrent identical calls share one request instead of each calling the API.
+    return get_single_flight().do(cache_key, _post_custom_api, payload, cache_key)
+
+async def invoke_custom_api_async(tkd_name: str, input_text: str, system_prompt: str) -> dict:
+    """
+    Async variant of invoke_custom_api that awaits the shared, pooled httpx.AsyncClient
+    instead of blocking the event loop.
+    """
+    if not input_text or input_text.strip() == "":
+        raise ValueError("Input text is empty. Cannot invoke custom API without email content.")
+
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return await analyze_in_chunks_async(
+            input_text, lambda chunk: invoke_custom_api_async(tkd_name, chunk, system_prompt), merge_json_verdicts
+        )
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        print("DEBUG: Result cache hit.")
+        return cached
+
+    payload = {
+        "tkd_name": tkd_name,
+        "input": input_text,
+        "system_prompt": system_prompt
+    }
+    print("DEBUG: Invoking custom API (async) with payload:", payload)
+
+    # Concurrent identical calls await one shared request instead of each calling the API.
+    return await get_single_flight().do_async(cache_key, _post_custom_api_async, payload, cache_key)
+
+def _post_custom_api(payload: dict, cache_key: str) -> dict:
+    """
+    Sends the payload to the custom API, parses the verdict into an AnalysisResult dict and caches it.
+
+    The response is read as a stream and projected on the fly: the "context" key, which
+    echoes the retrieved documents, is skipped without being decoded or held in memory.
+    A response that is not strict JSON is parsed as text with parse_verdict instead.
+    """
     headers = {"Content-Type": "application/json"}
 
+    def send(timeout: float):
+        with get_session().post(CUSTOM_API_URL, json=payload, headers=headers, timeout=request_timeout(timeout),
+                                stream=True) as response:
+            if response.status_code >= 400:
+                response.content  # Read the (small) error body for the log.
+            response.raise_for_status()  # Raise an error if HTTP error code.
+            response.encoding = response.encoding or "utf-8"
+            return project_chunks(response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE, decode_unicode=True),
+                                  lenient=True)
+
     try:
-        response = requests.post(CUSTOM_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
-
-        # Try to parse the response as JSON
-        try:
-            parsed_response = json.loads(response.text)
-            print("DEBUG: Parsed JSON response from LLM.")
-            return parsed_response
-        except json.JSONDecodeError as e:
-            print("ERROR: Invalid JSON response from LLM:", response.text)
-            raise ValueError("Custom API returned invalid JSON") from e
+        # Per-attempt timeout, retries with backoff and the circuit breaker are in resilience.py.
+        projector = get_resilience("custom_api").call(send)
+        parsed_response = _verdict_from(projector)
+        get_result_cache().put(cache_key, parsed_response)
+        return parsed_response
 
     except requests.exceptions.HTTPError as he:
         print("ERROR: HTTP error when invoking custom API:", he)
-        print("ERROR: Response Content:", response.text)
+        print("ERROR: Response Content:", he.response.text)
+        raise he
+    except Exception as e:
+        print("ERROR invoking custom API:", e)
+        raise e
+
+async def _post_custom_api_async(payload: dict, cache_key: str) -> dict:
+    """
+    Async variant of _post_custom_api using the pooled httpx.AsyncClient.
+    """
+    headers = {"Content-Type": "application/json"}
+
+    async def send(timeout: float):
+        async with get_async_client().stream("POST", CUSTOM_API_URL, json=payload, headers=headers) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            return await project_chunks_async(response.aiter_text(), lenient=True)
+
+    try:
+        projector = await get_resilience("custom_api").call_async(send)
+        parsed_response = _verdict_from(projector)
+        await get_result_cache().put_async(cache_key, parsed_response)
+        return parsed_response
+
+    except httpx.HTTPStatusError as he:
+        print("ERROR: HTTP error when invoking custom API:", he)
+        print("ERROR: Response Content:", he.response.text)
         raise he
     except Exception as e:
         print("ERROR invoking custom API:", e)
         raise e
+
+def _verdict_from(projector: JsonProjector) -> dict:
+    """
+    Parses the verdict from a projected response into an AnalysisResult dict; responses
+    that were not a well-formed JSON object are parsed from their text.
+    """
+    if projector.skipped_chars:
+        print(f"DEBUG: Skipped in custom API response (chars): {projector.skipped_chars}")
+    # Parse the verdict; fenced, prose-wrapped or label-format answers are repaired, not re-requested.
+    try:
+        if projector.is_object:
+            parsed_response = parse_verdict_object(projector.result).model_dump()
+        else:
+            parsed_response = parse_verdict(projector.text).model_dump()
+    except VerdictParseError:
+        print("ERROR: No verdict in LLM response:", projector.result if projector.is_object else projector.text)
+        raise
+    print("DEBUG: Parsed verdict from LLM response.")
+    return parsed_response
@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import asyncio
+
+from eml_stream import CHARS_PER_TOKEN
+
+# Opt-in micro-batching of short inputs (optionally set via environment variables).
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "0") == "1"
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "8"))
+LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", "2000"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "50"))
+# Inputs above this many tokens are always sent on their own.
+LLM_BATCH_SHORT_TOKENS = int(os.getenv("LLM_BATCH_SHORT_TOKENS", "256"))
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def is_short(text: str) -> bool:
+    """
+    Returns True if the input is small enough to be batched with others.
+    """
+    return estimate_tokens(text) <= LLM_BATCH_SHORT_TOKENS
+
+def batch_instructions(system_prompt: str, count: int) -> str:
+    """
+    Extends a single-message system prompt so the model analyzes `count` numbered messages
+    independently and answers with a JSON array of per-message verdicts.
+    """
+    return (
+        f"{system_prompt}\n\n"
+        f"You will receive {count} separate messages, each starting with a marker like [1]. "
+        "Analyze every message independently, exactly as if it were the only one. "
+        f"Respond ONLY with a JSON array of {count} objects, one per message, in the form "
+        '{"id": <message number>, "verdict": "<your complete response for that message>"}.'
+    )
+
+def format_batch_input(texts: list) -> str:
+    """
+    Joins the inputs into one numbered input text.
+    """
+    return "\n\n".join(f"[{number}]\n{text}" for number, text in enumerate(texts, start=1))
+
+def parse_batch_verdicts(response: str, count: int) -> list:
+    """
+    Splits a batched response back into one verdict per input, in input order.
+
+    Raises:
+        ValueError: If the response is not a JSON array with exactly one verdict per message.
+    """
+    text = _CODE_FENCE.sub("", response.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        raise ValueError("Batched response does not contain a JSON array")
+    items = json.loads(text[start:end + 1])
+    verdicts = {}
+    for position, item in enumerate(items, start=1):
+        if isinstance(item, dict):
+            number = item.get("id", position)
+            verdict = item.get("verdict")
+        else:
+            number, verdict = position, item
+        if isinstance(verdict, (dict, list)):
+            verdict = json.dumps(verdict)
+        if isinstance(number, str) and number.strip("[] ").isdigit():
+            number = int(number.strip("[] "))
+        if isinstance(number, int) and isinstance(verdict, str) and verdict.strip():
+            verdicts[number] = verdict
+    if sorted(verdicts) != list(range(1, count + 1)):
+        raise ValueError(f"Batched response has verdicts for {sorted(verdicts)}, expected 1..{count}")
+    return [verdicts[number] for number in range(1, count + 1)]
+
+class MicroBatcher:
+    """
+    Collects short inputs and sends them together in one request.
+
+    A batch is sent when it reaches `max_items` inputs or `max_tokens` estimated tokens,
+    or `max_wait` seconds after its first input arrived, whichever comes first, so the
+    added latency is bounded. If the batched call fails or its answer cannot be split
+    into one verdict per input, every input is retried on its own.
+
+    Args:
+        send_batch: async function taking a list of inputs and returning one result per input.
+        send_one: async function taking a single input and returning its result.
+    """
+
+    def __init__(self, send_batch, send_one, max_items: int = LLM_BATCH_MAX_ITEMS,
+                 max_tokens: int = LLM_BATCH_MAX_TOKENS, max_wait: float = LLM_BATCH_MAX_WAIT_MS / 1000):
+        self.send_batch = send_batch
+        self.send_one = send_one
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._pending_tokens = 0
+        self._timer = None
+        # Running batches; the event loop only keeps weak references to tasks.
+        self._tasks = set()
+
+    async def submit(self, text: str):
+        """
+        Adds an input to the current batch and waits for its own result.
+        """
+        tokens = estimate_tokens(text)
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending, self._pending_tokens = self._pending, [], 0
+        if items:
+            task = asyncio.ensure_future(self._run(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: list):
+        texts = [text for text, _ in items]
+        if len(items) == 1:
+            results = await asyncio.gather(self.send_one(texts[0]), return_exceptions=True)
+        else:
+            try:
+                results = await self.send_batch(texts)
+                if len(results) != len(texts):
+                    raise ValueError(f"Batch returned {len(results)} results for {len(texts)} inputs")
+                self.batches += 1
+                self.batched_items += len(texts)
+                print(f"DEBUG: Sent {len(texts)} inputs in one batched request")
+            except Exception as e:
+                print(f"DEBUG: Batched request failed ({e}); falling back to per-item calls")
+                self.fallbacks += 1
+                results = await asyncio.gather(*(self.send_one(text) for text in texts), return_exceptions=True)
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue  # The caller was cancelled.
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """
+        Returns how many batches were sent, how many inputs they carried and how often
+        a batch fell back to per-item calls.
+        """
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": self.batched_items / self.batches if self.batches else 0.0,
+            "fallbacks": self.fallbacks
+        }
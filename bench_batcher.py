@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import asyncio
+
+from batcher import MicroBatcher, batch_instructions, estimate_tokens, format_batch_input, parse_batch_verdicts
+
+# Mock backend: fixed round trip plus a per-token cost for the prompt and the input.
+MOCK_ROUND_TRIP = 0.15
+MOCK_SECONDS_PER_TOKEN = 0.0002
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(BASE_DIR, "prompt_new.txt"), encoding="utf-8") as f:
+    SYSTEM_PROMPT = f.read()
+SAMPLES = [
+    "Can you get me the tickets for the game on Saturday? I'll make sure your deal gets approved.",
+    "Reminder: team meeting moved to 3pm.",
+    "Buy before the announcement tomorrow, trust me.",
+    "Lunch?",
+]
+
+class MockBackend:
+    def __init__(self, malformed: bool = False):
+        self.requests = 0
+        self.tokens = 0
+        self.malformed = malformed
+
+    async def call(self, instructions: str, input_text: str) -> str:
+        self.requests += 1
+        tokens = estimate_tokens(instructions) + estimate_tokens(input_text)
+        self.tokens += tokens
+        await asyncio.sleep(MOCK_ROUND_TRIP + tokens * MOCK_SECONDS_PER_TOKEN)
+        if input_text.startswith("[1]\n"):
+            if self.malformed:
+                return "Here are the verdicts: message 1 looks fine..."
+            count = input_text.count("\n\n[") + 1
+            return json.dumps([{"id": i, "verdict": "No suspicious activity detected"} for i in range(1, count + 1)])
+        return "No suspicious activity detected"
+
+async def run(total: int, batched: bool, malformed: bool = False) -> tuple:
+    backend = MockBackend(malformed)
+
+    async def send_one(text):
+        return await backend.call(SYSTEM_PROMPT, text)
+
+    async def send_batch(texts):
+        response = await backend.call(batch_instructions(SYSTEM_PROMPT, len(texts)), format_batch_input(texts))
+        return parse_batch_verdicts(response, len(texts))
+
+    batcher = MicroBatcher(send_batch, send_one)
+    texts = [SAMPLES[i % len(SAMPLES)] for i in range(total)]
+    start = time.perf_counter()
+    if batched:
+        results = await asyncio.gather(*(batcher.submit(text) for text in texts))
+    else:
+        results = await asyncio.gather(*(send_one(text) for text in texts))
+    seconds = time.perf_counter() - start
+    assert len(results) == total and all(results)
+    return seconds, backend.requests, backend.tokens, batcher.stats()
+
+if __name__ == "__main__":
+    total = 32
+    print(f"{total} concurrent short messages, system prompt ~{estimate_tokens(SYSTEM_PROMPT)} tokens")
+    print(f"{'mode':<20} {'seconds':>8} {'requests':>9} {'tokens':>8}  batcher stats")
+    for name, batched, malformed in [("per item", False, False), ("batched", True, False),
+                                     ("batched, bad JSON", True, True)]:
+        seconds, requests, tokens, stats = asyncio.run(run(total, batched, malformed))
+        print(f"{name:<20} {seconds:>8.2f} {requests:>9} {tokens:>8}  {stats if batched else ''}")
@@ -0,0 +1,52 @@
+import os
+import time
+import random
+import asyncio
+
+from bulk import bulk_map, run_blocking, run_parse
+
+# Mock backend: simulated parse and LLM latencies, in seconds (optionally set via environment variables).
+MOCK_PARSE_SECONDS = float(os.getenv("MOCK_PARSE_SECONDS", "0.005"))
+MOCK_LLM_SECONDS = float(os.getenv("MOCK_LLM_SECONDS", "0.25"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0.02"))
+FILES = int(os.getenv("BENCH_FILES", "200"))
+CONCURRENCY_LEVELS = [1, 4, 8, 16, 32, 64]
+
+def mock_parse_email(file_path: str) -> dict:
+    time.sleep(MOCK_PARSE_SECONDS)
+    return {"metadata": {"From": "sender@example.com"}, "body": f"Body of {file_path}"}
+
+def mock_get_completion(prompt: str) -> str:
+    # Jittered latency, with occasional failures like a real backend.
+    time.sleep(random.uniform(0.5, 1.5) * MOCK_LLM_SECONDS)
+    if random.random() < MOCK_ERROR_RATE:
+        raise RuntimeError("mock backend error")
+    return f"No suspicious activity detected ({prompt})"
+
+async def analyze_file(filename: str) -> dict:
+    email_data = await run_parse(mock_parse_email, filename)
+    analysis = await run_blocking(mock_get_completion, email_data["body"])
+    return {"filename": filename, "metadata": email_data["metadata"], "analysis": analysis}
+
+def file_error(filename: str, e: Exception) -> dict:
+    return {"filename": filename, "error": f"Error processing {filename}: {str(e)}"}
+
+async def run(concurrency: int, files: list) -> tuple:
+    start = time.perf_counter()
+    results = await bulk_map(files, analyze_file, concurrency, on_error=file_error)
+    seconds = time.perf_counter() - start
+    # Results must come back in file order, with failures kept in place.
+    assert [result["filename"] for result in results] == files
+    errors = sum("error" in result for result in results)
+    return seconds, errors
+
+if __name__ == "__main__":
+    random.seed(0)
+    files = [f"email_{i:04d}.msg" for i in range(FILES)]
+    print(f"{FILES} files, mock LLM latency ~{MOCK_LLM_SECONDS * 1000:.0f} ms, parse {MOCK_PARSE_SECONDS * 1000:.0f} ms")
+    print(f"{'concurrency':>11} {'seconds':>8} {'files/s':>8} {'speedup':>8} {'errors':>7}")
+    baseline = None
+    for concurrency in CONCURRENCY_LEVELS:
+        seconds, errors = asyncio.run(run(concurrency, files))
+        baseline = baseline or seconds
+        print(f"{concurrency:>11} {seconds:>8.2f} {FILES / seconds:>8.1f} {baseline / seconds:>7.1f}x {errors:>7}")
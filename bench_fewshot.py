@@ -0,0 +1,91 @@
+import os
+import time
+import random
+
+from batcher import estimate_tokens
+from bench_prescreen import FILLER
+from fewshot import ExampleIndex, format_examples, load_examples
+from prompt_registry import get_prompt
+
+BODIES = int(os.getenv("BENCH_FEWSHOT_BODIES", "2000"))
+FLAGGED_SHARE = 0.2
+K = 3
+TOKEN_BUDGET = 400
+
+# Reworded statements (not copied from supplement.txt) and the category they belong to.
+PARAPHRASES = [
+    ("Rumors and Secrets", "Word is we're quietly negotiating with a regional bank, nothing official yet."),
+    ("Rumors and Secrets", "Keep this between us, a merger announcement could come next week."),
+    ("Rumors and Secrets", "We have to stop the news from going public until the deal is signed."),
+    ("Guarantees & Assurances", "This deal is a total slam dunk, we will make a killing on it."),
+    ("Front Running", "We are advising on a confidential takeover; get in now before it is announced."),
+    ("Gifts & Entertainment", "Code the spa and massage expense as consulting so it goes through."),
+    ("Outside Business Activity", "Flipped another house last weekend for a nice profit, check my online store too."),
+    ("Soliciting with Research", "Sending you our research write-up, it promises strong returns for your clients."),
+    ("Inappropriate Use of Discretion", "Just sell whatever you think, you decide what to liquidate."),
+    ("Customer Complaints", "I never agreed to these fees and I want my money back."),
+]
+
+def make_corpus(size: int, seed: int = 11) -> list:
+    """
+    Returns (body, category) pairs of routine messages of 10-30 sentences; a share has
+    one reworded statement inserted (category None for the others).
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        sentences = [rng.choice(FILLER) for _ in range(rng.randint(10, 30))]
+        category = None
+        if rng.random() < FLAGGED_SHARE:
+            category, statement = rng.choice(PARAPHRASES)
+            sentences.insert(rng.randrange(len(sentences)), statement)
+        corpus.append((" ".join(sentences), category))
+    return corpus
+
+def percentile(samples: list, share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    examples = load_examples()
+    load_seconds = time.perf_counter() - start
+    index = ExampleIndex(examples)
+    print(f"{len(examples)} examples in {len({e.category for e in examples})} categories; "
+          f"parsed in {load_seconds * 1000:.1f} ms, indexed in {index.build_seconds * 1000:.1f} ms, "
+          f"{len(index.postings)} n-grams")
+
+    corpus = make_corpus(BODIES)
+    lookups = []
+    selections = []
+    for body, _ in corpus:
+        start = time.perf_counter()
+        selections.append(index.select(body, k=K, token_budget=TOKEN_BUDGET))
+        lookups.append(time.perf_counter() - start)
+    # Numbered so that no sentence repeats, the worst case for the per-sentence scoring.
+    long_body = " ".join(f"{sentence[:-1]} (item {number})." for number, sentence in enumerate(FILLER * 80))
+    start = time.perf_counter()
+    index.select(long_body, k=K, token_budget=TOKEN_BUDGET)
+    long_seconds = time.perf_counter() - start
+    print(f"lookup per body ({BODIES} bodies, ~{sum(len(b) for b, _ in corpus) // BODIES} chars): "
+          f"p50 {percentile(lookups, 0.5) * 1000:.2f} ms, p95 {percentile(lookups, 0.95) * 1000:.2f} ms; "
+          f"{estimate_tokens(long_body)}-token body {long_seconds * 1000:.1f} ms")
+
+    # Tokens of the instructions sent with every body: the full guide (v2) against
+    # the instructions without it (v3) plus the selected examples.
+    full = estimate_tokens(get_prompt("custom_api", "v2").text)
+    base = estimate_tokens(get_prompt("custom_api", "v3").text)
+    print(f"\n{'prompt':<34} {'avg tokens':>10} {'vs full':>8}")
+    print(f"{'v2: full category guide':<34} {full:>10} {'':>8}")
+    for name, wanted in (("v3 + selected, all bodies", lambda c: True), ("v3 + selected, flagged bodies", lambda c: c),
+                         ("v3 + selected, routine bodies", lambda c: not c)):
+        tokens = [base + (estimate_tokens(format_examples(chosen)) if chosen else 0)
+                  for chosen, (_, category) in zip(selections, corpus) if wanted(category)]
+        average = sum(tokens) / len(tokens)
+        print(f"{name:<34} {average:>10.0f} {1 - average / full:>8.0%}")
+
+    flagged = [(chosen, category) for chosen, (_, category) in zip(selections, corpus) if category]
+    hits = sum(any(example.category == category for example in chosen) for chosen, category in flagged)
+    routine = [chosen for chosen, (_, category) in zip(selections, corpus) if not category]
+    print(f"\ncategory of the reworded statement among the top {K}: {hits}/{len(flagged)}; "
+          f"routine bodies with examples: {sum(bool(chosen) for chosen in routine)}/{len(routine)}")
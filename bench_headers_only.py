@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+from parser4 import parse_email
+
+def make_attachment_heavy_eml(attachments: int = 5, attachment_size: int = 2 * 1024 * 1024) -> bytes:
+    """
+    Builds a synthetic .eml with a short text body and several large binary attachments.
+    """
+    msg = EmailMessage()
+    msg["From"] = "trader@example.com"
+    msg["To"] = "client@example.com"
+    msg["Cc"] = "desk@example.com"
+    msg["Subject"] = "Quarterly statements"
+    msg["Date"] = "Mon, 02 Jun 2025 09:30:00 +0000"
+    msg.set_content("Please find the statements attached.\n")
+    for i in range(attachments):
+        msg.add_attachment(os.urandom(attachment_size), maintype="application", subtype="pdf",
+                           filename=f"statement_{i}.pdf")
+    return msg.as_bytes()
+
+def time_parse(source, filename: str, headers_only: bool, repeat: int) -> float:
+    """
+    Returns the average parse time in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse_email(source, filename=filename, headers_only=headers_only)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def compare(label: str, source, filename: str, repeat: int):
+    full_ms = time_parse(source, filename, False, repeat)
+    headers_ms = time_parse(source, filename, True, repeat)
+    print(f"{label:<40} full {full_ms:9.2f} ms  headers_only {headers_ms:8.2f} ms  speedup {full_ms / headers_ms:7.1f}x")
+
+if __name__ == "__main__":
+    # Usage: python bench_headers_only.py [file.msg|file.eml|file.pst ...]
+    for count, size in ((1, 256 * 1024), (5, 2 * 1024 * 1024), (10, 5 * 1024 * 1024)):
+        raw = make_attachment_heavy_eml(count, size)
+        compare(f"synthetic .eml, {count} x {size // 1024} KB", raw, "synthetic.eml", repeat=5)
+    for path in sys.argv[1:]:
+        compare(os.path.basename(path), path, path, repeat=1 if path.lower().endswith(".pst") else 5)
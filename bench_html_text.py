@@ -0,0 +1,64 @@
+import time
+
+from html_text import html_to_text, convert_html_body, html_metrics
+from normalizer import format_email_body
+
+# Rough characters-per-token ratio, as used for the .eml body budget.
+CHARS_PER_TOKEN = 4
+
+NEWSLETTER_HEAD = """<html><head><title>Weekly update</title>
+<style>td { font-family: Arial; padding: 4px; } .hidden { display: none; }</style>
+<script>var tracking = {"campaign": "weekly", "user": "12345"};</script>
+</head><body>
+<div style="display:none;max-height:0;overflow:hidden">Preview text that the reader never sees</div>
+<img src="https://track.example.com/open?id=12345" width="1" height="1" alt="">
+"""
+NEWSLETTER_ROW = """<table width="600" cellpadding="0" cellspacing="0" border="0" style="border-collapse:collapse">
+<tr><td style="font-family:Arial,sans-serif;font-size:14px;color:#333333;line-height:20px">
+<p>Your account statement is ready. Please <a href="https://bank.example.com/login?ref=mail&amp;id=12345">sign in</a>
+to review it before&nbsp;Friday.</p>
+<img src="https://cdn.example.com/banner.png" width="600" height="120" alt="Banner">
+</td></tr></table>
+"""
+NEWSLETTER_TAIL = "<p>Regards,<br>Customer Service</p></body></html>"
+
+OUTLOOK_HTML = """<html xmlns:o="urn:schemas-microsoft-com:office:office"><head>
+<meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<style><!-- p.MsoNormal { margin: 0cm; font-size: 11pt; font-family: "Calibri",sans-serif; } --></style>
+</head><body lang="EN-US"><div class="WordSection1">
+<p class="MsoNormal"><span style="font-size:11.0pt">Hi John,<o:p></o:p></span></p>
+<p class="MsoNormal"><span style="font-size:11.0pt">Can you wire the payment today? It is urgent.<o:p></o:p></span></p>
+<p class="MsoNormal"><span style="font-size:11.0pt">Thanks,<o:p></o:p></span></p>
+</div></body></html>"""
+
+def make_newsletter(rows: int) -> str:
+    return NEWSLETTER_HEAD + NEWSLETTER_ROW * rows + NEWSLETTER_TAIL
+
+def time_call(func, arg, repeat: int) -> float:
+    """
+    Returns the average duration of func(arg) in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat * 1000
+
+if __name__ == "__main__":
+    samples = {
+        "outlook": OUTLOOK_HTML,
+        "newsletter 10": make_newsletter(10),
+        "newsletter 1000": make_newsletter(1000),
+        "newsletter bytes": make_newsletter(1000).encode("utf-8"),
+    }
+    print(f"{'sample':<17} {'html chars':>10} {'text chars':>10} {'tokens before':>13} {'tokens after':>12} {'ms':>8}")
+    for name, html in samples.items():
+        text = format_email_body(html_to_text(html))
+        repeat = max(1, 2_000_000 // len(html))
+        ms = time_call(html_to_text, html, repeat)
+        print(f"{name:<17} {len(html):>10} {len(text):>10} {len(html) // CHARS_PER_TOKEN:>13} "
+              f"{len(text) // CHARS_PER_TOKEN:>12} {ms:>8.3f}")
+
+    print("\nConverted Outlook body:")
+    print(convert_html_body(OUTLOOK_HTML)[0])
+    convert_html_body(make_newsletter(10))
+    print(f"\nAggregate metrics: {html_metrics()}")
@@ -0,0 +1,138 @@
+import io
+import os
+import json
+import time
+import codecs
+import threading
+import tracemalloc
+import contextlib
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from load_test_http_client import free_port
+from json_projection import JsonProjector, project_text
+
+SIZES_MB = [int(size) for size in os.getenv("BENCH_PROJECTION_SIZES_MB", "1,10,50").split(",")]
+CHUNK = 64 * 1024
+HTTP_SIZE_MB = 20
+HTTP_RUNS = 3
+
+VERDICT = {
+    "summary": "The sender promises a guaranteed return on a deal.",
+    "red_flags": ["slam dunk", "should make killing"],
+    "violation_detected": True,
+    "violation_type": "Guarantees & Assurances",
+    "explanation": "Implies certainty about the outcome of a financial deal.",
+    "recommended_action": "Escalate to compliance team"
+}
+PASSAGE = ("Section 4.2 \"Communications with clients\": statements must be fair and balanced,\n"
+           "must not promise specific results and must disclose material risks. ") * 12
+
+def make_response(megabytes: int) -> bytes:
+    """
+    A custom API response: the verdict keys with a "context" list of retrieved documents
+    (escaped quotes and newlines included) in the middle, as the backend sends it.
+    """
+    documents = []
+    size = 0
+    while size < megabytes * 1_000_000:
+        document = {"id": f"doc-{len(documents)}", "score": 0.83, "source": "policies/communications.pdf",
+                    "text": PASSAGE}
+        documents.append(document)
+        size += len(PASSAGE) + 120
+    head = dict(list(VERDICT.items())[:3])
+    tail = dict(list(VERDICT.items())[3:])
+    return json.dumps({**head, "context": documents, **tail}).encode("utf-8")
+
+def chunks_of(body: bytes):
+    # Decoded 64 KiB at a time, like requests' iter_content(decode_unicode=True).
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(body), CHUNK):
+        yield decoder.decode(body[start:start + CHUNK])
+
+def full_parse(body: bytes) -> dict:
+    # What the client did before: read the whole response, json.loads it, drop "context".
+    text = "".join(chunks_of(body))
+    return {key: value for key, value in json.loads(text).items() if key != "context"}
+
+def text_projection(body: bytes) -> dict:
+    return project_text("".join(chunks_of(body)))
+
+def stream_projection(body: bytes) -> dict:
+    projector = JsonProjector()
+    for chunk in chunks_of(body):
+        projector.feed(chunk)
+    return projector.close()
+
+def measure(function, body: bytes) -> tuple:
+    start = time.perf_counter()
+    result = function(body)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+standin = FastAPI(title="Large-response stand-in custom API")
+_http_body = b""
+
+@standin.post("/query")
+async def query(payload: dict):
+    return Response(_http_body, media_type="application/json")
+
+def start_standin(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(standin, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def http_comparison(analyzer, url: str):
+    from http_client import get_session
+    payload = {"tkd_name": "Bench", "input": "Deal is a slam dunk.", "system_prompt": "prompt"}
+    rows = []
+    for name, call in (
+        ("response.text + json.loads", lambda: {key: value for key, value in
+                                                get_session().post(url, json=payload).json().items() if key != "context"}),
+        ("streamed projection (client)", lambda: analyzer._post_custom_api(payload, f"bench-{time.perf_counter()}")),
+    ):
+        seconds = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(HTTP_RUNS):
+                start = time.perf_counter()
+                call()
+                seconds.append(time.perf_counter() - start)
+            tracemalloc.start()
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        rows.append((name, min(seconds), peak))
+    return rows
+
+if __name__ == "__main__":
+    print(f"{'response':>9} {'method':<26} {'ms':>8} {'peak MB':>8}")
+    for megabytes in SIZES_MB:
+        body = make_response(megabytes)
+        results = []
+        for name, function in (("json.loads + drop context", full_parse), ("projection of the text", text_projection),
+                               ("streaming projection", stream_projection)):
+            result, seconds, peak = measure(function, body)
+            results.append(result)
+            print(f"{len(body) / 1_000_000:>7.1f}MB {name:<26} {seconds * 1000:>8.1f} {peak / 1_000_000:>8.1f}")
+        assert results[0] == results[1] == results[2] == VERDICT
+
+    _http_body = make_response(HTTP_SIZE_MB)
+    port = free_port()
+    os.environ["CUSTOM_API_URL"] = f"http://127.0.0.1:{port}/query"
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    server = start_standin(port)
+    import analyzer_jsonvalidation
+    try:
+        print(f"\nOver HTTP, {len(_http_body) / 1_000_000:.1f} MB response (best of {HTTP_RUNS}):")
+        for name, seconds, peak in http_comparison(analyzer_jsonvalidation, os.environ["CUSTOM_API_URL"]):
+            print(f"  {name:<30} {seconds * 1000:>8.1f} ms {peak / 1_000_000:>8.1f} MB peak")
+    finally:
+        server.should_exit = True
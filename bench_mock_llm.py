@@ -0,0 +1,112 @@
+import io
+import os
+import time
+import asyncio
+import threading
+import statistics
+import contextlib
+
+import uvicorn
+
+from load_test_http_client import free_port
+
+REQUESTS_PER_RUN = int(os.getenv("LOAD_TEST_REQUESTS", "40"))
+CONCURRENCY_LEVELS = [1, 10, 40]
+EMAILS = [
+    "Hi team, attached is the agenda for Thursday's quarterly review.",
+    "Deal is a slam dunk, we should make a killing on this one.",
+    "Our firm is advising on a confidential takeover of JKL company. If you get in now, there's big upside.",
+    "Please find the updated statement for your account enclosed.",
+]
+# Failure injection scenarios: (name, mock settings).
+SCENARIOS = [
+    ("lognormal 300 ms", {"latency": "lognormal", "latency_ms": 300, "latency_spread": 0.5, "ms_per_output_token": 10}),
+    ("+ 10% 429s", {"rate_limit_rate": 0.1, "retry_after": 0.2}),
+    ("+ 10% 500s", {"rate_limit_rate": 0.0, "error_rate": 0.1}),
+]
+
+def start_mock(port: int) -> uvicorn.Server:
+    from mock_llm_server import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run(analyzer, total: int, concurrency: int) -> tuple:
+    """
+    Sends `total` analyses with at most `concurrency` in flight; returns the wall time,
+    the per-request latencies of the successful ones and the number of failures.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+    async def handler(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await analyzer.invoke_custom_api_async("LoadTest", f"{EMAILS[i % len(EMAILS)]} ({i})", "prompt")
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(total)))
+    return time.perf_counter() - start, latencies, failures
+
+async def chat_routes(url: str) -> list:
+    """
+    One request to each chat completions route, as the openai clients send them.
+    """
+    from http_client import get_async_client
+    body = {"messages": [{"role": "user", "content": f'Analyze:\n"""{EMAILS[1]}"""'}], "temperature": 0}
+    rows = []
+    for route in ("/v1/chat/completions", "/openai/deployments/gpt-35-turbo/chat/completions?api-version=2023-03-15-preview"):
+        start = time.perf_counter()
+        response = await get_async_client().post(url + route, json={"model": "gpt-3.5-turbo", **body})
+        data = response.json()
+        rows.append((route.split("?")[0], response.status_code, time.perf_counter() - start,
+                     data["choices"][0]["message"]["content"].splitlines()[1], data["usage"]["total_tokens"]))
+    return rows
+
+async def main(analyzer, mock, url: str):
+    from http_client import close_async_client
+    print(f"{REQUESTS_PER_RUN} requests per run through invoke_custom_api_async against the mock server")
+    print(f"{'scenario':<18} {'in flight':>9} {'seconds':>8} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'failed':>6} {'429s':>5} {'500s':>5}")
+    for name, settings in SCENARIOS:
+        mock.configure(**settings)
+        for level in CONCURRENCY_LEVELS:
+            mock.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds, latencies, failures = await run(analyzer, REQUESTS_PER_RUN, level)
+            ordered = sorted(latencies) or [0.0]
+            p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+            stats = mock.metrics()
+            print(f"{name:<18} {level:>9} {seconds:>8.2f} {REQUESTS_PER_RUN / seconds:>7.1f} "
+                  f"{statistics.median(ordered) * 1000:>7.0f} {p95 * 1000:>7.0f} {failures:>6} "
+                  f"{stats['rate_limited']:>5} {stats['errors']:>5}")
+
+    mock.configure(error_rate=0.0, rate_limit_rate=0.0)
+    print("\nChat completions routes:")
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = await chat_routes(url)
+        await close_async_client()
+    for route, status, seconds, category, tokens in rows:
+        print(f"  {route:<52} {status} {seconds * 1000:>6.0f} ms  {category} ({tokens} tokens)")
+
+if __name__ == "__main__":
+    port = free_port()
+    os.environ["USE_MOCK_LLM"] = "1"
+    os.environ["MOCK_LLM_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("MOCK_LLM_SEED", "7")
+    # Every run sends the same texts; measure the HTTP path, not the result cache.
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    server = start_mock(port)
+    from mock_llm_server import get_mock
+    with contextlib.redirect_stdout(io.StringIO()):
+        import updated_text_email_analyzer
+    try:
+        asyncio.run(main(updated_text_email_analyzer, get_mock(), os.environ["MOCK_LLM_URL"]))
+    finally:
+        server.should_exit = True
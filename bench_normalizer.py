@@ -0,0 +1,53 @@
+import re
+import time
+
+from normalizer import format_email_body, format_email_bodies
+
+def legacy_format_email_body(body: str) -> str:
+    """
+    The original format_email_body, kept here as the reference implementation.
+    """
+    body = body.replace('\r\n', '\n').replace('\r', '\n')
+    body = re.sub(r'[ \t]+', ' ', body)
+    body = re.sub(r'\n\s*\n', '\n\n', body)
+    return body.strip()
+
+SAMPLES = {
+    "crlf": "Hello team,\r\n\r\nPlease find   the   attached\treport for Q3.\r\nThanks,\r\n\r\n\r\nJohn\r\n",
+    "lf": "Hello team,\n\nPlease find the attached report for Q3 and let me know about the numbers.\nThanks,\n\nJohn\n",
+}
+SIZES = {"1 KB": 1024, "100 KB": 100 * 1024, "10 MB": 10 * 1024 * 1024}
+
+def make_body(sample: str, size: int) -> str:
+    return (sample * (size // len(sample) + 1))[:size]
+
+def time_call(func, arg, repeat: int) -> float:
+    """
+    Returns the average duration of func(arg) in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat * 1000
+
+if __name__ == "__main__":
+    print(f"{'sample':<6} {'size':>7} {'legacy ms':>11} {'new ms':>9} {'speedup':>8}  identical")
+    for sample_name, sample in SAMPLES.items():
+        for size_name, size in SIZES.items():
+            body = make_body(sample, size)
+            identical = legacy_format_email_body(body) == format_email_body(body)
+            repeat = max(1, 2_000_000 // size)
+            legacy_ms = time_call(legacy_format_email_body, body, repeat)
+            new_ms = time_call(format_email_body, body, repeat)
+            print(f"{sample_name:<6} {size_name:>7} {legacy_ms:>11.3f} {new_ms:>9.3f} {legacy_ms / new_ms:>7.2f}x  {identical}")
+
+    # Batch API: many small bodies, as produced by a PST or bulk run.
+    bodies = [make_body(SAMPLES["crlf"], 1024) for _ in range(5000)]
+    assert format_email_bodies(bodies) == [legacy_format_email_body(b) for b in bodies]
+    start = time.perf_counter()
+    [legacy_format_email_body(b) for b in bodies]
+    legacy_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    format_email_bodies(bodies)
+    batch_ms = (time.perf_counter() - start) * 1000
+    print(f"batch  5000 x 1 KB: legacy {legacy_ms:.1f} ms, format_email_bodies {batch_ms:.1f} ms")
@@ -0,0 +1,94 @@
+import os
+import re
+import time
+import random
+
+from prescreen import Prescreener, load_rules, rules_verdict, _phrase_pattern, _words, PRESCREEN_MODES
+
+CORPUS_SIZE = int(os.getenv("BENCH_PRESCREEN_BODIES", "5000"))
+# Share of synthetic bodies that contain a sample statement from supplement.txt.
+FLAGGED_SHARE = 0.05
+
+FILLER = [
+    "Please find attached the quarterly statement for your review.",
+    "The meeting has been moved to Thursday at 10am in room 4B.",
+    "Let me know if you have any questions about the onboarding forms.",
+    "The client asked for an updated copy of the fee schedule.",
+    "We are still waiting on the signed documents from legal.",
+    "Thanks for the quick turnaround on the portfolio summary.",
+    "Reminder: the compliance training is due by the end of the month.",
+    "I have forwarded the request to the operations team.",
+    "Can you confirm the settlement date for the bond trade?",
+    "The system maintenance window is Saturday from 2am to 6am.",
+]
+SAMPLE_STATEMENTS = [
+    "There's a rumor we are negotiating with LMN holdings - nothing confirmed yet.",
+    "A source telling me we might see a big merger next week—keep this between us for now.",
+    "Deal is a slam dunk, should make killing.",
+    "Our firm is advising on a confidential take over of JKL company. If you get in now, there's likely big upside.",
+    "The massage parlour expense was coded as consulting.",
+    "Just closed another deal last weekend. Flipped it for a decent profit.",
+    "Just sent you a research write-up promising strong returns.",
+    "You decide what to liquidate—we just need the funds today.",
+    "I never agreed to this fee. I want my money back.",
+    "Just got the word—our client is placing a massive buy order for DEF Corp tomorrow.",
+]
+
+def make_corpus(size: int, seed: int = 7) -> list:
+    """
+    Returns (body, flagged) pairs of routine messages of 10-30 sentences, a share of
+    which has one sample statement inserted at a random position.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        sentences = [rng.choice(FILLER) for _ in range(rng.randint(10, 30))]
+        flagged = rng.random() < FLAGGED_SHARE
+        if flagged:
+            sentences.insert(rng.randrange(len(sentences)), rng.choice(SAMPLE_STATEMENTS))
+        corpus.append((" ".join(sentences), flagged))
+    return corpus
+
+def naive_scan(patterns: list, text: str) -> bool:
+    # One search per phrase, the straightforward alternative to the combined pattern.
+    return any(pattern.search(text) for pattern in patterns)
+
+if __name__ == "__main__":
+    rules = load_rules()
+    prescreener = Prescreener(rules, seed=1)
+    patterns = [re.compile(rf"\b{_phrase_pattern(_words(phrase))}\b", re.IGNORECASE)
+                for phrases in rules.values() for phrase in phrases]
+    corpus = make_corpus(CORPUS_SIZE)
+    megabytes = sum(len(body) for body, _ in corpus) / 1_000_000
+    print(f"{len(patterns)} phrases, {len(corpus)} bodies, {megabytes:.1f} MB, "
+          f"{sum(flagged for _, flagged in corpus)} with a sample statement")
+
+    start = time.perf_counter()
+    naive = [naive_scan(patterns, body) for body, _ in corpus]
+    naive_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    combined = [bool(prescreener._pattern.search(body)) for body, _ in corpus]
+    combined_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    screens = [prescreener.score(body) for body, _ in corpus]
+    screen_seconds = time.perf_counter() - start
+
+    print(f"{'matcher':<28} {'seconds':>8} {'us/body':>8} {'MB/s':>8}")
+    for name, seconds in (("per-phrase regex", naive_seconds), ("combined regex", combined_seconds),
+                          ("word sets + regex (score)", screen_seconds)):
+        print(f"{name:<28} {seconds:>8.3f} {seconds / len(corpus) * 1_000_000:>8.1f} {megabytes / seconds:>8.1f}")
+
+    assert naive == combined == [screen["matched"] for screen in screens]
+    found = sum(screen["matched"] and flagged for screen, (_, flagged) in zip(screens, corpus))
+    false_hits = sum(screen["matched"] and not flagged for screen, (_, flagged) in zip(screens, corpus))
+    flagged_total = sum(flagged for _, flagged in corpus)
+    print(f"recall on inserted statements: {found}/{flagged_total}, matches in routine bodies: {false_hits}")
+
+    print(f"\n{'mode':<10} {'LLM calls':>9} {'share':>6}")
+    for mode in PRESCREEN_MODES:
+        calls = sum(prescreener.route(dict(screen), mode)["sent_to_llm"] for screen in screens)
+        print(f"{mode:<10} {calls:>9} {calls / len(corpus):>6.1%}")
+
+    example = next(screen for screen in screens if screen["matched"])
+    print("\nExample match spans:", [(m["category"], m["start"], m["end"], m["text"]) for m in example["matches"]])
+    print(rules_verdict(example))
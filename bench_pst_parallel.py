@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+from parser4 import iter_pst, iter_pst_parallel
+
+def run(label: str, emails) -> float:
+    """
+    Drains an email iterator and prints the extraction rate.
+
+    Returns:
+        float: Messages per second.
+    """
+    start = time.perf_counter()
+    count = sum(1 for _ in emails)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0.0
+    print(f"{label:<12} {count:>8} msgs  {elapsed:8.2f} s  {rate:10.1f} msgs/sec")
+    return rate
+
+if __name__ == "__main__":
+    # Usage: python bench_pst_parallel.py <mailbox.pst> [chunk_size]
+    if len(sys.argv) < 2:
+        print("Usage: python bench_pst_parallel.py <mailbox.pst> [chunk_size]")
+        sys.exit(1)
+    pst_path = sys.argv[1]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    baseline = run("sequential", iter_pst(pst_path))
+    cores = os.cpu_count() or 1
+    worker_counts = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores]
+    for workers in worker_counts:
+        rate = run(f"{workers} workers", iter_pst_parallel(pst_path, workers=workers, chunk_size=chunk_size))
+        if baseline:
+            print(f"{'':<12} speedup vs sequential: {rate / baseline:.2f}x")
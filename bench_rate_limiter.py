@@ -0,0 +1,97 @@
+import io
+import time
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from batcher import estimate_tokens
+from rate_limiter import RateLimiter, estimate_request_tokens
+
+# A deployment quota scaled up so the run takes seconds: 600k TPM is 10k tokens per second.
+TPM = 600_000
+RPM = 3_600
+LATENCY = 0.2
+COMPLETION_TOKENS = 150
+REQUESTS = 60
+THREADS = 16
+PROMPT = "Please review the attached statement and confirm the settlement instructions. " * 50
+
+class RateLimitError(Exception):
+    """
+    Stand-in for openai.error.RateLimitError.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("Requests to the deployment have exceeded the rate limit.")
+        self.http_status = 429
+        self.headers = {"Retry-After": str(retry_after)}
+
+class FakeDeployment:
+    """
+    Enforces a TPM and RPM quota like Azure OpenAI, as buckets holding one second of
+    quota, and answers 429 with Retry-After when a request does not fit.
+    """
+
+    def __init__(self, tpm: int, rpm: int):
+        self.tokens_per_second = tpm / 60
+        self.requests_per_second = rpm / 60
+        self.tokens = self.tokens_per_second
+        self.requests = self.requests_per_second
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def create(self, prompt: str) -> dict:
+        tokens = estimate_tokens(prompt) + COMPLETION_TOKENS
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self.updated = now - self.updated, now
+            self.tokens = min(self.tokens_per_second, self.tokens + elapsed * self.tokens_per_second)
+            self.requests = min(self.requests_per_second, self.requests + elapsed * self.requests_per_second)
+            if tokens > self.tokens or self.requests < 1:
+                self.rejected += 1
+                raise RateLimitError(retry_after=round((tokens - self.tokens) / self.tokens_per_second + 0.05, 2))
+            self.tokens -= tokens
+            self.requests -= 1
+        time.sleep(LATENCY)
+        return {"choices": [{"message": {"content": "No suspicious activity detected"}}],
+                "usage": {"total_tokens": tokens}}
+
+def run(limiter, deployment: FakeDeployment) -> tuple:
+    failures = 0
+
+    def one(_):
+        nonlocal failures
+        try:
+            if limiter is None:
+                deployment.create(PROMPT)
+            else:
+                limiter.call(lambda: deployment.create(PROMPT), estimate_request_tokens(PROMPT))
+        except RateLimitError:
+            failures += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(one, range(REQUESTS)))
+    return time.perf_counter() - start, failures
+
+if __name__ == "__main__":
+    tokens = estimate_request_tokens(PROMPT)
+    print(f"{REQUESTS} requests of ~{tokens} reserved tokens from {THREADS} threads; "
+          f"quota {TPM // 60} tokens/s, {RPM // 60} requests/s, latency {LATENCY * 1000:.0f} ms")
+    print(f"{'mode':<22} {'seconds':>8} {'ok req/s':>9} {'failed':>7} {'429s':>6}")
+
+    deployment = FakeDeployment(TPM, RPM)
+    seconds, failures = run(None, deployment)
+    print(f"{'no limiter':<22} {seconds:>8.2f} {(REQUESTS - failures) / seconds:>9.1f} {failures:>7} {deployment.rejected:>6}")
+
+    # The second deployment is shared with another client and only has 60% of the configured quota left.
+    for name, share in (("limiter", 1.0), ("limiter, shared quota", 0.6)):
+        time.sleep(1.1)
+        deployment = FakeDeployment(int(TPM * share), int(RPM * share))
+        limiter = RateLimiter("bench", tpm=TPM, rpm=RPM, max_concurrency=THREADS, burst_seconds=1, enabled=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, failures = run(limiter, deployment)
+        print(f"{name:<22} {seconds:>8.2f} {(REQUESTS - failures) / seconds:>9.1f} {failures:>7} {deployment.rejected:>6}")
+        print(f"  budget snapshot: {limiter.snapshot()}")
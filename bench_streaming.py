@@ -0,0 +1,78 @@
+import io
+import os
+import time
+import asyncio
+import threading
+import contextlib
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from load_test_http_client import free_port
+from streaming import sse_analysis, stream_metrics
+
+# The stand-in API sends the answer word by word, like an LLM generating tokens.
+TOKEN_DELAY = float(os.getenv("STANDIN_TOKEN_DELAY", "0.03"))
+FIRST_TOKEN_DELAY = float(os.getenv("STANDIN_FIRST_TOKEN_DELAY", "0.3"))
+ANSWER = ("Classification: Suspicious activity detected\nCategory: Guarantees & Assurances\n"
+          "Explanation: The sender promises a certain outcome of the deal, calling it a slam dunk, "
+          "which may mislead clients about the risk of the investment.")
+RUNS = 5
+
+standin = FastAPI(title="Streaming stand-in custom API")
+
+@standin.post("/query")
+async def query(payload: dict):
+    async def tokens():
+        await asyncio.sleep(FIRST_TOKEN_DELAY)
+        for word in ANSWER.split(" "):
+            yield word + " "
+            await asyncio.sleep(TOKEN_DELAY)
+    return StreamingResponse(tokens(), media_type="text/plain")
+
+def start_standin(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(standin, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def main(analyzer):
+    from http_client import close_async_client
+    blocking, streamed = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for run in range(RUNS):
+            text = f"Deal is a slam dunk, should make killing ({run})."
+            start = time.perf_counter()
+            await analyzer.invoke_custom_api_async("Bench", text, "prompt")
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            first_event = None
+            async for event in sse_analysis(analyzer.stream_custom_api("Bench", text + " ", "prompt"), start):
+                if first_event is None and event.startswith("event: token"):
+                    first_event = time.perf_counter() - start
+                last = event
+            streamed.append((first_event, time.perf_counter() - start))
+        await close_async_client()
+
+    print(f"{RUNS} runs, first token after {FIRST_TOKEN_DELAY * 1000:.0f} ms, then {TOKEN_DELAY * 1000:.0f} ms per word")
+    print(f"{'mode':<20} {'first byte ms':>13} {'complete ms':>12}")
+    average = sum(blocking) / RUNS * 1000
+    print(f"{'JSON (blocking)':<20} {average:>13.0f} {average:>12.0f}")
+    print(f"{'SSE (streaming)':<20} {sum(f for f, _ in streamed) / RUNS * 1000:>13.0f} "
+          f"{sum(t for _, t in streamed) / RUNS * 1000:>12.0f}")
+    print(f"\nFinal event: {last.strip()}")
+    print(f"Streaming metrics: {stream_metrics()}")
+
+if __name__ == "__main__":
+    port = free_port()
+    os.environ["CUSTOM_API_URL"] = f"http://127.0.0.1:{port}/query"
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    server = start_standin(port)
+    import updated_text_email_analyzer
+    try:
+        asyncio.run(main(updated_text_email_analyzer))
+    finally:
+        server.should_exit = True
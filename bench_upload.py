@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from parser4 import parse_email
+
+def parse_via_tempfile(content: bytes, filename: str) -> dict:
+    """
+    The previous upload path: write the upload to a NamedTemporaryFile, parse it, delete it.
+    """
+    suffix = os.path.splitext(filename)[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    try:
+        return parse_email(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+def parse_in_memory(content: bytes, filename: str) -> dict:
+    """
+    The current upload path: parse the uploaded bytes directly.
+    """
+    return parse_email(content, filename=filename)
+
+def bench_parse(content: bytes, filename: str, iterations: int):
+    for label, func in (("tempfile", parse_via_tempfile), ("in-memory", parse_in_memory)):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func(content, filename)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} {iterations / elapsed:10.1f} uploads/sec  ({elapsed / iterations * 1000:.2f} ms each)")
+
+def bench_endpoint(url: str, content: bytes, filename: str, iterations: int, concurrency: int):
+    """
+    Posts the file to a running upload endpoint; run once against the old build and once
+    against the new one to compare end-to-end throughput.
+    """
+    import requests
+
+    session = requests.Session()
+
+    def upload(_):
+        response = session.post(url, files={"file": (filename, content, "application/octet-stream")})
+        return response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(upload, range(iterations)))
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for status in statuses if status == 200)
+    print(f"{url}: {iterations / elapsed:.1f} req/sec, {ok}/{iterations} OK, concurrency {concurrency}")
+
+if __name__ == "__main__":
+    # Usage: python bench_upload.py <email.msg|email.eml> [iterations] [endpoint_url] [concurrency]
+    if len(sys.argv) < 2:
+        print("Usage: python bench_upload.py <email.msg|email.eml> [iterations] [endpoint_url] [concurrency]")
+        sys.exit(1)
+    path = sys.argv[1]
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with open(path, "rb") as f:
+        content = f.read()
+    filename = os.path.basename(path)
+
+    bench_parse(content, filename, iterations)
+    if len(sys.argv) > 3:
+        concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+        bench_endpoint(sys.argv[3], content, filename, iterations, concurrency)
@@ -0,0 +1,47 @@
+import json
+import time
+
+from verdict_parser import VerdictParseError, parse_verdict, verdict_metrics
+
+RUNS = 20000
+
+VERDICT = {
+    "summary": "The sender promises a guaranteed return on a deal.",
+    "red_flags": ["slam dunk", "should make killing"],
+    "violation_detected": True,
+    "violation_type": "Guarantees & Assurances",
+    "explanation": "Implies certainty about the outcome of a financial deal.",
+    "recommended_action": "Escalate to compliance team"
+}
+PRETTY = json.dumps(VERDICT, indent=2)
+
+# Shapes of answers seen from the custom API; only the first one passes json.loads.
+RESPONSES = {
+    "well-formed JSON": json.dumps(VERDICT),
+    "JSON in code fence": f"```json\n{PRETTY}\n```",
+    "JSON in prose": f"Here is my analysis of the email:\n{PRETTY}\nLet me know if you need more detail.",
+    "trailing commas": PRETTY.replace('"\n}', '",\n}').replace('killing"\n  ]', 'killing",\n  ]'),
+    "label format": ("Classification: Suspicious activity detected\nCategory: Gaurantees & Assurances\n"
+                     "Explanation: Implies certainty about the outcome of a financial deal."),
+    "free text": ("Suspicious Activity detected. The message calls the deal a slam dunk, "
+                  "which falls under Guarantees & Assurances."),
+}
+
+if __name__ == "__main__":
+    print(f"{'response':<22} {'json.loads':>10} {'parse_verdict':>13} {'us/parse':>9} {'violation_type':>24}")
+    for name, text in RESPONSES.items():
+        try:
+            json.loads(text)
+            plain = "ok"
+        except ValueError:
+            plain = "fails"
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            result = parse_verdict(text)
+        micros = (time.perf_counter() - start) / RUNS * 1_000_000
+        print(f"{name:<22} {plain:>10} {'ok':>13} {micros:>9.1f} {result.violation_type:>24}")
+    try:
+        parse_verdict("I'm sorry, I can't help with that.")
+    except VerdictParseError:
+        print("refusal: VerdictParseError")
+    print(f"\nMetrics: {verdict_metrics()}")
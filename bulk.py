@@ -0,0 +1,121 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Default and maximum number of emails analyzed at once in bulk mode (optionally set via environment variables).
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "64"))
+# Number of worker threads that parse email files.
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_DONE = object()
+
+_parse_executor = None
+_io_executor = None
+
+def _get_parse_executor() -> ThreadPoolExecutor:
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ThreadPoolExecutor(max_workers=BULK_PARSE_WORKERS, thread_name_prefix="bulk-parse")
+    return _parse_executor
+
+def _get_io_executor() -> ThreadPoolExecutor:
+    # Sized for the largest allowed in-flight limit, so blocking LLM and database calls
+    # are never capped by asyncio's default executor.
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=BULK_MAX_CONCURRENCY, thread_name_prefix="bulk-io")
+    return _io_executor
+
+async def run_parse(func, *args, **kwargs):
+    """
+    Runs a parse function (e.g. parse_email) in the parse worker pool and awaits its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_parse_executor(), functools.partial(func, *args, **kwargs))
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking call (e.g. get_completion or a DynamoDB put) in a worker thread and awaits it.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_io_executor(), functools.partial(func, *args, **kwargs))
+
+def _close_after(fetch, close):
+    # Waits for an in-flight next() on a generator, then closes it.
+    wait([fetch])
+    close()
+
+def clamp_concurrency(concurrency: int = None) -> int:
+    """
+    Returns the in-flight limit to use: the given value (or BULK_CONCURRENCY) clamped to [1, BULK_MAX_CONCURRENCY].
+    """
+    concurrency = BULK_CONCURRENCY if concurrency is None else concurrency
+    return max(1, min(concurrency, BULK_MAX_CONCURRENCY))
+
+async def bulk_map(items, process, concurrency: int = None, on_error=None) -> list:
+    """
+    Awaits process(item) for every item with at most `concurrency` calls in flight.
+
+    Items are pulled from the iterable only when a slot is free (in a worker thread, so
+    a blocking generator such as a PST prefetch never stalls the event loop), which keeps
+    memory bounded for large archives. Results are returned in the original item order.
+
+    Args:
+        items: Any iterable of work items, e.g. file names or PST email dicts.
+        process: An async function taking one item and returning its result.
+        concurrency (int, optional): In-flight limit; defaults to BULK_CONCURRENCY.
+        on_error (callable, optional): on_error(item, exception) returns the result to
+            record for a failed item. Without it, the first error cancels the remaining
+            work and is raised.
+
+    Returns:
+        list: One result per item, in input order.
+    """
+    concurrency = clamp_concurrency(concurrency)
+    iterator = iter(items)
+    results = {}
+    pending = set()
+    count = 0
+    fetch = None
+
+    async def run(index, item):
+        try:
+            return index, await process(item)
+        except Exception as e:
+            if on_error is None:
+                raise
+            return index, on_error(item, e)
+
+    try:
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) < concurrency:
+                fetch = _get_io_executor().submit(next, iterator, _DONE)
+                item = await asyncio.wrap_future(fetch)
+                if item is _DONE:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(run(count, item)))
+                    count += 1
+            if pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, result = task.result()
+                    results[index] = result
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    finally:
+        # Closing a generator runs its cleanup, e.g. stopping a PST prefetch thread.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            if fetch is not None and not fetch.done():
+                # Cancelled while next() runs in a worker thread: a running generator cannot
+                # be closed, so close it in a worker thread once next() has returned.
+                await asyncio.shield(run_blocking(_close_after, fetch, close))
+            else:
+                close()
+    return [results[index] for index in range(count)]
@@ -0,0 +1,259 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from eml_stream import CHARS_PER_TOKEN
+from batcher import estimate_tokens
+from bulk import bulk_map
+
+# Bodies above this many tokens are analyzed in chunks; 0 disables chunking (optionally set via environment variables).
+CHUNK_THRESHOLD_TOKENS = int(os.getenv("CHUNK_THRESHOLD_TOKENS", "6000"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "3000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+
+# Categories from the most to the least severe; the most severe one found in any chunk wins.
+CATEGORY_SEVERITY = [
+    "Insider Trading",
+    "Front Running",
+    "Rumors and Secrets",
+    "Guarantees & Assurances",
+    "Soliciting with Research",
+    "Inappropriate Use of Discretion",
+    "Customer Complaints",
+    "Gifts & Entertainment",
+    "Outside Business Activity",
+]
+# Spellings used in supplement.txt and by the model.
+_CATEGORY_ALIASES = {
+    "gaurantees & assurances": "Guarantees & Assurances",
+    "guarantees and assurances": "Guarantees & Assurances",
+    "gifts and entertainment": "Gifts & Entertainment",
+    "customer compliants": "Customer Complaints",
+    "rumors & secrets": "Rumors and Secrets",
+}
+_ACTION_SEVERITY = ["escalate", "request more info", "no action"]
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_EXPLANATION = re.compile(r"Explanation:\s*(.*)", re.IGNORECASE | re.DOTALL)
+# The Yes/No answer of the openai prompt, e.g. "Fraud or compliance violation suspected: Yes - ...".
+_SUSPECTED = re.compile(r"\b(?:fraud|compliance|violation)\b[^\n:]*?\bsuspected\b\W*(yes|no)\b", re.IGNORECASE)
+
+def needs_chunking(text: str, threshold_tokens: int = None) -> bool:
+    """
+    Returns True if the text is above the chunking threshold.
+    """
+    threshold_tokens = CHUNK_THRESHOLD_TOKENS if threshold_tokens is None else threshold_tokens
+    return bool(text) and threshold_tokens > 0 and estimate_tokens(text) > threshold_tokens
+
+def _split_oversized(text: str, max_chars: int) -> list:
+    # Split a paragraph that is too large on line, then sentence, then word boundaries.
+    for split, joiner in ((lambda t: t.split("\n"), "\n"), (_SENTENCE_END.split, " "), (lambda t: t.split(" "), " ")):
+        parts = split(text)
+        if len(parts) < 2:
+            continue
+        pieces = []
+        current = ""
+        for part in parts:
+            candidate = f"{current}{joiner}{part}" if current else part
+            if len(candidate) <= max_chars:
+                current = candidate
+                continue
+            if current:
+                pieces.append(current)
+            if len(part) <= max_chars:
+                current = part
+            else:
+                pieces.extend(_split_oversized(part, max_chars))
+                current = ""
+        if current:
+            pieces.append(current)
+        return pieces
+    # A single word longer than a chunk.
+    return [text[start:start + max_chars] for start in range(0, len(text), max_chars)]
+
+def _overlap_tail(chunk: str, overlap_chars: int) -> str:
+    # The end of the previous chunk, starting at a word boundary.
+    if overlap_chars <= 0 or len(chunk) <= overlap_chars:
+        return chunk if overlap_chars > 0 else ""
+    tail = chunk[-overlap_chars:]
+    boundary = tail.find(" ")
+    return tail[boundary + 1:] if boundary >= 0 else tail
+
+def split_into_chunks(text: str, max_tokens: int = None, overlap_tokens: int = None) -> list:
+    """
+    Splits a long body into chunks of at most max_tokens (estimated) on paragraph
+    boundaries. Paragraphs larger than a chunk are split on lines, sentences and words.
+    Each chunk after the first starts with the last overlap_tokens of the previous one,
+    so a statement cut at a boundary is still seen whole.
+
+    Args:
+        text (str): The formatted email body.
+        max_tokens (int, optional): Chunk size; defaults to CHUNK_MAX_TOKENS.
+        overlap_tokens (int, optional): Overlap between chunks; defaults to CHUNK_OVERLAP_TOKENS.
+
+    Returns:
+        list: The chunks, in order.
+    """
+    max_tokens = CHUNK_MAX_TOKENS if max_tokens is None else max_tokens
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # Leave room for the overlap and the paragraph break in front of it.
+        room = max(1, max_chars - overlap_chars - 2)
+        if len(paragraph) <= room:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_split_oversized(paragraph, room))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        chunks.append(current)
+        overlap = _overlap_tail(current, overlap_chars)
+        current = f"{overlap}\n\n{piece}" if overlap else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def canonical_category(name: str) -> str:
+    """
+    Returns the CATEGORY_SEVERITY spelling of a category name (e.g. "Gaurantees & Assurances"
+    -> "Guarantees & Assurances"); unknown names are returned stripped.
+    """
+    name = str(name).strip()
+    name = _CATEGORY_ALIASES.get(name.lower(), name)
+    for known in CATEGORY_SEVERITY:
+        if known.lower() == name.lower():
+            return known
+    return name
+
+def _category_rank(category) -> int:
+    if not category or str(category).strip().lower() in ("none", "n/a", ""):
+        return len(CATEGORY_SEVERITY) + 1
+    name = canonical_category(category)
+    for rank, known in enumerate(CATEGORY_SEVERITY):
+        if known.lower() == name.lower():
+            return rank
+    # Unknown categories rank below the known ones but above "None".
+    return len(CATEGORY_SEVERITY)
+
+def categories_in(text: str) -> list:
+    """
+    Returns the categories named in a free-text verdict (any spelling), in CATEGORY_SEVERITY order.
+    """
+    lower = text.lower()
+    found = [category for category in CATEGORY_SEVERITY if category.lower() in lower]
+    found += [category for alias, category in _CATEGORY_ALIASES.items() if alias in lower]
+    return found
+
+def _is_suspicious(verdict: str) -> bool:
+    # An explicit Yes/No answer wins over the wording around it.
+    answer = _SUSPECTED.search(verdict)
+    if answer:
+        return answer.group(1).lower() == "yes"
+    lower = verdict.lower()
+    if "no suspicious activity" in lower:
+        return False
+    return "suspicious activity" in lower or bool(categories_in(verdict))
+
+def merge_text_verdicts(verdicts: list) -> str:
+    """
+    Merges plain text verdicts of the chunks of one body into a single verdict in the
+    Classification/Category/Explanation format. The body is suspicious if any chunk
+    is, the most severe category found wins and the explanations are kept per part.
+    """
+    flagged = [verdict for verdict in verdicts if _is_suspicious(verdict)]
+    categories = [category for verdict in flagged for category in categories_in(verdict)]
+    category = min(categories, key=_category_rank) if categories else "None"
+    explanations = []
+    for number, verdict in enumerate(verdicts, start=1):
+        if flagged and verdict not in flagged:
+            continue
+        match = _EXPLANATION.search(verdict)
+        explanation = (match.group(1) if match else verdict).strip()
+        explanations.append(f"Part {number}/{len(verdicts)}: {explanation}")
+    classification = "Suspicious activity detected" if flagged else "No suspicious activity detected"
+    return f"Classification: {classification}\nCategory: {category}\nExplanation: {' '.join(explanations)}"
+
+def join_text_verdicts(verdicts: list) -> str:
+    """
+    Joins the free-form answers of the chunks of one body (the openai and azure_openai
+    prompts ask for a summary, red flags and next action, not a classification) without
+    relabelling them, so a violation reported for any chunk stays in the answer.
+    """
+    return "\n\n".join(f"Part {number}/{len(verdicts)}:\n{verdict.strip()}"
+                         for number, verdict in enumerate(verdicts, start=1))
+
+def merge_json_verdicts(verdicts: list) -> dict:
+    """
+    Merges structured (dict) verdicts of the chunks of one body: red flags are unioned,
+    a violation in any chunk is a violation, the most severe violation type wins and
+    the most urgent recommended action is kept.
+    """
+    flagged = [verdict for verdict in verdicts if verdict.get("violation_detected")]
+    red_flags = []
+    for verdict in verdicts:
+        for flag in verdict.get("red_flags") or []:
+            if flag not in red_flags:
+                red_flags.append(flag)
+    relevant = flagged or verdicts
+    violation_type = min((verdict.get("violation_type") for verdict in flagged), key=_category_rank, default="None")
+
+    def action_rank(action) -> int:
+        lower = str(action or "").lower()
+        return next((rank for rank, name in enumerate(_ACTION_SEVERITY) if name in lower), len(_ACTION_SEVERITY))
+
+    return {
+        "summary": " ".join(str(verdict.get("summary", "")).strip() for verdict in verdicts if verdict.get("summary")),
+        "red_flags": red_flags,
+        "violation_detected": bool(flagged),
+        "violation_type": violation_type or "None",
+        "explanation": " ".join(str(verdict.get("explanation", "")).strip() for verdict in relevant if verdict.get("explanation")),
+        "recommended_action": min((verdict.get("recommended_action") for verdict in verdicts), key=action_rank,
+                                  default="No action needed") or "No action needed"
+    }
+
+def _chunk_tokens(max_tokens: int = None) -> int:
+    # Chunks must stay under the threshold, or analyzing a chunk would chunk it again.
+    max_tokens = CHUNK_MAX_TOKENS if max_tokens is None else max_tokens
+    if CHUNK_THRESHOLD_TOKENS > 1:
+        max_tokens = min(max_tokens, CHUNK_THRESHOLD_TOKENS - 1)
+    return max_tokens
+
+def analyze_in_chunks(text: str, analyze_chunk, merge, max_tokens: int = None, overlap_tokens: int = None,
+                      concurrency: int = None):
+    """
+    Splits the text into chunks, analyzes them concurrently in worker threads with
+    analyze_chunk(chunk) and returns merge(verdicts), with verdicts in chunk order.
+    """
+    chunks = split_into_chunks(text, _chunk_tokens(max_tokens), overlap_tokens)
+    print(f"DEBUG: Analyzing body of ~{estimate_tokens(text)} tokens in {len(chunks)} chunks")
+    if len(chunks) == 1:
+        return analyze_chunk(chunks[0])
+    with ThreadPoolExecutor(max_workers=concurrency or CHUNK_CONCURRENCY) as executor:
+        verdicts = list(executor.map(analyze_chunk, chunks))
+    return merge(verdicts)
+
+async def analyze_in_chunks_async(text: str, analyze_chunk, merge, max_tokens: int = None,
+                                  overlap_tokens: int = None, concurrency: int = None):
+    """
+    Async variant of analyze_in_chunks; analyze_chunk is an async function.
+    """
+    chunks = split_into_chunks(text, _chunk_tokens(max_tokens), overlap_tokens)
+    print(f"DEBUG: Analyzing body of ~{estimate_tokens(text)} tokens in {len(chunks)} chunks")
+    if len(chunks) == 1:
+        return await analyze_chunk(chunks[0])
+    verdicts = await bulk_map(chunks, analyze_chunk, concurrency or CHUNK_CONCURRENCY)
+    return merge(verdicts)
@@ -1,28 +1,25 @@
-import json
-from json import JSONDecodeError
+from json_projection import CONTEXT_KEYS, project_text
 
 # … inside your try: after
 analysis_raw = invoke_custom_api(TKD_NAME, email_body, system_prompt)
 logger.debug(f"Raw custom API response (first 200 chars): {analysis_raw[:200]}…")
 
-# Attempt to parse it as JSON:
+# Keep every top-level key except "context". The echoed documents under "context" are
+# skipped without being decoded into Python objects, which is where most of the memory
+# of json.loads went. (analyzer_jsonvalidation goes further and projects the response
+# while it streams in, so the context is never held at all.)
 try:
-    analysis_obj = json.loads(analysis_raw)
-    # Remove the "context" key if present:
-    filtered_analysis = {
-        k: v for k, v in analysis_obj.items() if k != "context"
-    }
-except JSONDecodeError:
-    # If it wasn’t JSON, just log the raw string
+    filtered_analysis = project_text(analysis_raw, skip=CONTEXT_KEYS)  # dict, or the text if not a JSON object
+except ValueError:
+    # If it wasn’t valid JSON, just log the raw string
     filtered_analysis = analysis_raw
 
 logger.debug(f"Filtered analysis (no context): {filtered_analysis}")
 
-# Then when you assemble the result to return, you can still use the full analysis_obj
-# or just re‑embed filtered_analysis, depending on whether you want to send context
-# back to the client or not.
+# The context is not sent back to the client; pass keys=... to project_text to keep
+# only specific top-level keys instead.
 result = {
     "metadata": email_data.get("metadata", {}),
-    "analysis": analysis_obj  # or filtered_analysis
+    "analysis": filtered_analysis
 }
-logger.debug(f"Assembled result: {{'metadata': …, 'analysis': { {k:v for k,v in result['analysis'].items() if k!='context'} } }}")
+logger.debug(f"Assembled result: {result}")
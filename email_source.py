@@ -0,0 +1,66 @@
+import io
+import os
+from contextlib import contextmanager
+
+def is_path(source) -> bool:
+    """
+    Returns True if the source is a filesystem path rather than in-memory content.
+    """
+    return isinstance(source, (str, os.PathLike))
+
+def source_filename(source, filename: str = None) -> str:
+    """
+    Returns the name used to detect the email format of a source.
+
+    Paths carry their own name; bytes, memoryview and file-like sources need the
+    original filename (e.g. UploadFile.filename) to be passed explicitly.
+
+    Raises:
+        ValueError: If the source is in memory and no filename was given.
+    """
+    if filename:
+        return filename
+    if is_path(source):
+        return os.fspath(source)
+    name = getattr(source, "name", None)
+    if isinstance(name, str):
+        return name
+    raise ValueError("A filename is required to detect the format of an in-memory email.")
+
+@contextmanager
+def open_binary(source):
+    """
+    Yields a binary file-like object for a path, bytes, bytearray, memoryview or file-like source.
+    Files opened here are closed on exit; caller-provided file objects are left open.
+    """
+    if is_path(source):
+        with open(source, "rb") as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO shares the buffer of immutable bytes instead of copying it.
+        yield io.BytesIO(source)
+    else:
+        yield source
+
+def msg_source(source):
+    """
+    Returns the source in a form extract_msg.Message accepts: a path or the raw .msg bytes.
+    The OLE reader parses raw bytes directly, so in-memory uploads never touch the disk.
+    """
+    if is_path(source):
+        return os.fspath(source)
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    return source.read()
+
+def describe_source(source) -> str:
+    """
+    Returns a short description of a source for log messages.
+    """
+    if is_path(source):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<in-memory, {len(source)} bytes>"
+    return getattr(source, "name", None) or "<file object>"
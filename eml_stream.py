@@ -0,0 +1,128 @@
+import os
+from io import TextIOWrapper
+from email import policy
+from email.feedparser import FeedParser
+from email.message import EmailMessage
+
+from email_source import open_binary
+
+# Default body budget for .eml parsing; 0 means unlimited (optionally set via environment variables).
+EML_MAX_CHARS = int(os.getenv("EML_MAX_CHARS", "0"))
+EML_MAX_TOKENS = int(os.getenv("EML_MAX_TOKENS", "0"))
+EML_CHUNK_SIZE = int(os.getenv("EML_CHUNK_SIZE", str(64 * 1024)))
+
+# Rough characters-per-token ratio used to turn a token budget into a character budget.
+CHARS_PER_TOKEN = 4
+
+class _PartRecorder:
+    """
+    Message factory for the feed parser that remembers every part it creates, in
+    creation order (which is the same order as msg.walk()). A leaf part is complete
+    once its payload has been set.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.recording = False
+
+    def __call__(self, policy=None):
+        part = EmailMessage(policy=policy) if policy is not None else EmailMessage()
+        # The feed parser calls the factory once while probing its signature; skip that one.
+        if self.recording:
+            self.parts.append(part)
+        return part
+
+def char_budget(max_chars: int = None, max_tokens: int = None) -> int:
+    """
+    Returns the character budget (0 for unlimited) from explicit or default limits.
+    """
+    max_chars = EML_MAX_CHARS if max_chars is None else max_chars
+    max_tokens = EML_MAX_TOKENS if max_tokens is None else max_tokens
+    budgets = [limit for limit in (max_chars, max_tokens * CHARS_PER_TOKEN) if limit and limit > 0]
+    return min(budgets) if budgets else 0
+
+def read_eml_body(source, max_chars: int = None, max_tokens: int = None, chunk_size: int = EML_CHUNK_SIZE) -> tuple:
+    """
+    Incrementally parses a .eml file and collects its body text up to a budget.
+
+    The file is fed to a FeedParser in chunks, through the same ASCII/surrogateescape
+    text wrapper BytesParser uses (so line endings are normalized exactly as before).
+    After every chunk, the text/plain
+    parts that are complete (and not attachments) are decoded and appended to a list
+    buffer. Reading stops as soon as the budget is exceeded, so the rest of the file is
+    never read or decoded. Without a budget the result is the same body as the previous
+    `body += part.get_content()` loop.
+
+    Args:
+        source: A file path, bytes, memoryview or binary file-like object.
+        max_chars (int, optional): Character budget; defaults to EML_MAX_CHARS (0 = unlimited).
+        max_tokens (int, optional): Token budget, converted with CHARS_PER_TOKEN; defaults to EML_MAX_TOKENS.
+        chunk_size (int, optional): Number of characters read per chunk.
+
+    Returns:
+        tuple: (message, body, truncated), where message holds the top-level headers,
+               body is the collected text and truncated tells whether the budget cut it.
+    """
+    budget = char_budget(max_chars, max_tokens)
+    recorder = _PartRecorder()
+    parser = FeedParser(_factory=recorder, policy=policy.default)
+    recorder.recording = True
+
+    pieces = []
+    collected = 0
+    next_part = 0
+
+    def collect_completed_parts(final: bool = False) -> bool:
+        # Consumes completed parts in order; returns True once the budget is exceeded.
+        nonlocal collected, next_part
+        while next_part < len(recorder.parts):
+            part = recorder.parts[next_part]
+            if part.is_multipart():
+                # Containers (multipart/*, message/rfc822) hold no text of their own.
+                next_part += 1
+                continue
+            if part.get_payload() is None:
+                if final:
+                    # Left empty by a malformed message.
+                    next_part += 1
+                    continue
+                # Still being parsed; later parts cannot be complete either.
+                return False
+            if next_part == 0:
+                # A non-multipart message: its whole content is the body, if it is text.
+                text = part.get_content() if part.get_content_maintype() == "text" else ""
+            elif part.get_content_type() == "text/plain" and "attachment" not in part.get("Content-Disposition", ""):
+                text = part.get_content()
+            else:
+                text = ""
+            next_part += 1
+            if text:
+                pieces.append(text)
+                collected += len(text)
+                if budget and collected > budget:
+                    return True
+        return False
+
+    truncated = False
+    with open_binary(source) as f:
+        text_stream = TextIOWrapper(f, encoding="ascii", errors="surrogateescape")
+        try:
+            for chunk in iter(lambda: text_stream.read(chunk_size), ""):
+                parser.feed(chunk)
+                if collect_completed_parts():
+                    truncated = True
+                    break
+        finally:
+            # Leave the underlying binary file open; open_binary closes it if it owns it.
+            text_stream.detach()
+
+    if truncated:
+        message = recorder.parts[0]
+    else:
+        message = parser.close()
+        truncated = collect_completed_parts(final=True)
+
+    body = "".join(pieces)
+    if truncated:
+        body = body[:budget]
+    return message, body, truncated
@@ -0,0 +1,245 @@
+import os
+import re
+import math
+import time
+import threading
+from functools import lru_cache
+from collections import Counter
+
+from batcher import estimate_tokens
+from bulk import run_parse
+from chunking import canonical_category
+
+# Few-shot example selection from the category guide (optionally set via environment variables).
+# FEWSHOT_K = 0 disables it; use it with a prompt version without the full guide (custom_api v1 or v3).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEWSHOT_CORPUS_PATH = os.getenv("FEWSHOT_CORPUS_PATH", os.path.join(BASE_DIR, "supplement.txt"))
+FEWSHOT_K = int(os.getenv("FEWSHOT_K", "0"))
+FEWSHOT_TOKEN_BUDGET = int(os.getenv("FEWSHOT_TOKEN_BUDGET", "400"))
+# Examples less similar than this (best cosine of the TF-IDF vectors with any sentence) are never
+# included; routine business sentences score about 0.15 against the guide.
+FEWSHOT_MIN_SCORE = float(os.getenv("FEWSHOT_MIN_SCORE", "0.25"))
+
+# Character n-gram sizes; n-grams are taken inside words padded with spaces, so word
+# stems match ("negotiating" / "negotiations") and punctuation does not matter.
+NGRAM_SIZES = (3, 4, 5)
+# Longer inputs are scored in the parse worker pool by with_examples_async (about 15 ms per 1000 tokens).
+_INLINE_TOKENS = 256
+
+_WORD = re.compile(r"\w+")
+_CATEGORY_HEADER = re.compile(r"^\s*\d+\s*\.\s*(?:Category\s*:\s*)?([A-Za-z].*?)\s*:?\s*$", re.IGNORECASE)
+_STATEMENTS = re.compile(r"^\s*(?:sample statements\s*:|[a-z]\s*\.)\s*(.*)$", re.IGNORECASE)
+_EXPLANATION = re.compile(r"^\s*Explanation\s*:\s*(.*)$", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_QUOTED = re.compile(r"[\"“]([^\"“”]{10,})[\"”]")
+
+# Aggregate counters across all selections of this process.
+FEWSHOT_METRICS = {"selections": 0, "examples": 0, "tokens": 0, "lookup_seconds": 0.0}
+_metrics_lock = threading.Lock()
+
+class Example:
+    """
+    One sample statement of the category guide with its category and explanation.
+    """
+
+    def __init__(self, category: str, statement: str, explanation: str):
+        self.category = category
+        self.statement = statement
+        self.explanation = explanation
+        self.text = f'Message: "{statement}"\nCategory: {category}\nExplanation: {explanation}'
+        self.tokens = estimate_tokens(self.text)
+
+def load_examples(path: str = FEWSHOT_CORPUS_PATH) -> list:
+    """
+    Reads the category guide (supplement.txt): numbered category headings, sample
+    statement lines (quoted statements, or the whole line) and "Explanation:" paragraphs
+    that apply to the statements listed since the previous explanation.
+
+    Returns:
+        list: Example objects, in file order.
+    """
+    examples = []
+    category = None
+    pending = []
+    explanation = None
+
+    def flush():
+        nonlocal explanation
+        if explanation is not None:
+            text = " ".join(explanation.split()).strip('"')
+            examples.extend(Example(category, statement, text) for statement in pending)
+            pending.clear()
+        explanation = None
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            header = _CATEGORY_HEADER.match(line)
+            statements = _STATEMENTS.match(line)
+            described = _EXPLANATION.match(line)
+            if header:
+                flush()
+                pending.clear()
+                category = canonical_category(header.group(1))
+            elif category is None or not line.strip():
+                continue
+            elif statements:
+                flush()
+                quoted = _QUOTED.findall(statements.group(1))
+                pending.extend(quoted or [statements.group(1).strip()])
+            elif described:
+                explanation = described.group(1)
+            elif explanation is not None:
+                explanation = f"{explanation} {line.strip()}"
+        flush()
+    return [example for example in examples if len(example.statement) >= 10]
+
+@lru_cache(maxsize=65536)
+def _word_ngrams(word: str) -> tuple:
+    padded = f" {word} "
+    return tuple(padded[start:start + size] for size in NGRAM_SIZES for start in range(len(padded) - size + 1))
+
+def _ngrams(text: str) -> Counter:
+    # Character n-grams counted once per distinct word, weighted by the word's frequency.
+    counts = Counter()
+    for word, frequency in Counter(_WORD.findall(text.lower())).items():
+        for gram in _word_ngrams(word):
+            counts[gram] += frequency
+    return counts
+
+def _sentences(text: str) -> list:
+    return [sentence for sentence in _SENTENCE_END.split(text) if _WORD.search(sentence)]
+
+class ExampleIndex:
+    """
+    TF-IDF index (sublinear tf, character n-grams) over the sample statements, with
+    an inverted index from n-gram to the examples containing it.
+
+    Args:
+        examples (list): Example objects, e.g. from load_examples().
+    """
+
+    def __init__(self, examples: list):
+        start = time.perf_counter()
+        self.examples = examples
+        grams = [_ngrams(example.statement) for example in examples]
+        document_frequency = Counter(gram for counts in grams for gram in counts)
+        total = len(examples)
+        self.idf = {gram: math.log((1 + total) / (1 + frequency)) + 1 for gram, frequency in document_frequency.items()}
+        self.postings = {}
+        for number, counts in enumerate(grams):
+            vector = {gram: (1 + math.log(count)) * self.idf[gram] for gram, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            for gram, weight in vector.items():
+                self.postings.setdefault(gram, []).append((number, weight / norm))
+        self.build_seconds = time.perf_counter() - start
+
+    def similar(self, text: str) -> list:
+        """
+        Returns (score, example) pairs with a positive similarity, best first. Each
+        sentence of the text is compared on its own and an example scores its best
+        cosine similarity with any sentence, so one suspicious line in a long email
+        is not diluted by the rest.
+        """
+        best = [0.0] * len(self.examples)
+        unknown_idf = math.log(1 + len(self.examples)) + 1
+        # Repeated sentences (signatures, disclaimers, quoted lines) are scored once.
+        for sentence in dict.fromkeys(_sentences(text)):
+            scores = [0.0] * len(self.examples)
+            norm = 0.0
+            for gram, count in _ngrams(sentence).items():
+                # N-grams unknown to the index get the largest idf for the norm.
+                weight = (1 + math.log(count)) * self.idf.get(gram, unknown_idf)
+                norm += weight * weight
+                for number, example_weight in self.postings.get(gram, ()):
+                    scores[number] += weight * example_weight
+            norm = math.sqrt(norm) or 1.0
+            for number, score in enumerate(scores):
+                if score / norm > best[number]:
+                    best[number] = score / norm
+        ranked = sorted(((score, number) for number, score in enumerate(best) if score > 0), reverse=True)
+        return [(score, self.examples[number]) for score, number in ranked]
+
+    def select(self, text: str, k: int = None, token_budget: int = None, min_score: float = None) -> list:
+        """
+        Returns the up to k most similar examples whose formatted text fits in the token
+        budget together, best first. A too-long example is skipped, not truncated.
+
+        Args:
+            text (str): The email body or chunk.
+            k (int, optional): Maximum number of examples (default FEWSHOT_K).
+            token_budget (int, optional): Maximum estimated tokens of all examples (default FEWSHOT_TOKEN_BUDGET).
+            min_score (float, optional): Minimum cosine similarity (default FEWSHOT_MIN_SCORE).
+        """
+        k = FEWSHOT_K if k is None else k
+        token_budget = FEWSHOT_TOKEN_BUDGET if token_budget is None else token_budget
+        min_score = FEWSHOT_MIN_SCORE if min_score is None else min_score
+        start = time.perf_counter()
+        chosen = []
+        used = 0
+        for score, example in self.similar(text):
+            if len(chosen) >= k or score < min_score:
+                break
+            if used + example.tokens <= token_budget:
+                chosen.append(example)
+                used += example.tokens
+        with _metrics_lock:
+            FEWSHOT_METRICS["selections"] += 1
+            FEWSHOT_METRICS["examples"] += len(chosen)
+            FEWSHOT_METRICS["tokens"] += used
+            FEWSHOT_METRICS["lookup_seconds"] += time.perf_counter() - start
+        return chosen
+
+def format_examples(examples: list) -> str:
+    """
+    Formats the selected examples as a reference section appended to the system prompt.
+    """
+    if not examples:
+        return ""
+    body = "\n\n".join(example.text for example in examples)
+    return f"### Reference examples (the most similar sample statements from the category guide)\n{body}"
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_example_index() -> ExampleIndex:
+    """
+    Returns the process-wide ExampleIndex built from FEWSHOT_CORPUS_PATH, creating it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ExampleIndex(load_examples())
+            print(f"DEBUG: Indexed {len(_index.examples)} few-shot examples from {FEWSHOT_CORPUS_PATH} "
+                  f"in {_index.build_seconds * 1000:.1f} ms")
+        return _index
+
+def with_examples(system_prompt: str, text: str) -> str:
+    """
+    Appends the examples most similar to the text to the system prompt, which stays the
+    static prefix. Returns the system prompt unchanged when FEWSHOT_K is 0 or nothing is similar.
+    """
+    if FEWSHOT_K <= 0:
+        return system_prompt
+    section = format_examples(get_example_index().select(text))
+    return f"{system_prompt}\n\n{section}" if section else system_prompt
+
+async def with_examples_async(system_prompt: str, text: str) -> str:
+    """
+    Async variant of with_examples; long inputs are scored in a worker thread so the
+    event loop keeps serving other requests.
+    """
+    if FEWSHOT_K <= 0 or estimate_tokens(text) <= _INLINE_TOKENS:
+        return with_examples(system_prompt, text)
+    return await run_parse(with_examples, system_prompt, text)
+
+def fewshot_metrics() -> dict:
+    """
+    Returns the selection counters with the average examples, tokens and lookup time per selection.
+    """
+    with _metrics_lock:
+        metrics = dict(FEWSHOT_METRICS)
+    selections = metrics["selections"] or 1
+    metrics["avg_examples"] = round(metrics["examples"] / selections, 2)
+    metrics["avg_tokens"] = round(metrics["tokens"] / selections, 1)
+    metrics["avg_lookup_ms"] = round(metrics.pop("lookup_seconds") / selections * 1000, 3)
+    return metrics
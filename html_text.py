@@ -0,0 +1,173 @@
+import re
+import codecs
+import threading
+from html.parser import HTMLParser
+
+# Elements whose content is never shown to a reader.
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript", "template", "iframe", "object", "svg"}
+# Elements that start a new line of text.
+BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "blockquote", "section", "article", "header", "footer", "pre", "dl", "dt", "dd"
+}
+# Elements without a closing tag; they never go on the open-element stack.
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\r\n\f\v]+")
+
+_FEED_CHUNK_SIZE = 64 * 1024
+
+# Aggregate conversion metrics across all messages handled by this process.
+HTML_METRICS = {"messages": 0, "html_chars": 0, "text_chars": 0}
+_metrics_lock = threading.Lock()
+
+def _is_hidden(tag: str, attrs: dict) -> bool:
+    if tag in SKIPPED_TAGS:
+        return True
+    if "hidden" in attrs or attrs.get("aria-hidden", "").lower() == "true":
+        return True
+    return bool(_HIDDEN_STYLE.search(attrs.get("style") or ""))
+
+class HtmlToText(HTMLParser):
+    """
+    Streaming HTML-to-text converter.
+
+    Feed it HTML in chunks and read the plain text with text(). Scripts, styles and
+    hidden elements are dropped, images (including tracking pixels) are removed, and
+    links are kept as "text (url)".
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._pieces = []
+        self._stack = []  # (tag, hidden) for every open non-void element
+        self._hidden_depth = 0
+        self._link_href = None
+        self._link_text_start = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        hidden = _is_hidden(tag, attrs)
+        if tag not in VOID_TAGS:
+            self._stack.append((tag, hidden))
+            if hidden:
+                self._hidden_depth += 1
+        if self._hidden_depth or hidden:
+            return
+        if tag in BLOCK_TAGS:
+            self._pieces.append("\n")
+        if tag == "li":
+            self._pieces.append("- ")
+        elif tag in ("td", "th"):
+            self._pieces.append(" ")
+        elif tag == "a":
+            self._link_href = attrs.get("href", "").strip()
+            self._link_text_start = len(self._pieces)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags like <br/> never have content.
+        attrs = {name: value or "" for name, value in attrs}
+        if not self._hidden_depth and not _is_hidden(tag, attrs) and tag in BLOCK_TAGS:
+            self._pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return  # Stray closing tag.
+        while self._stack:
+            open_tag, hidden = self._stack.pop()
+            if hidden:
+                self._hidden_depth -= 1
+            if open_tag == tag:
+                break
+        if self._hidden_depth:
+            return
+        if tag == "a" and self._link_href is not None:
+            link_text = "".join(self._pieces[self._link_text_start:]).strip()
+            href = self._link_href
+            if href and not href.lower().startswith(("javascript:", "#")) and href != link_text:
+                self._pieces.append(f" ({href})" if link_text else href)
+            self._link_href = None
+        elif tag in BLOCK_TAGS:
+            self._pieces.append("\n")
+
+    def handle_data(self, data):
+        if self._hidden_depth:
+            return
+        text = _SPACES.sub(" ", data)
+        if text.strip():
+            self._pieces.append(text)
+        elif text and self._pieces and not self._pieces[-1].endswith((" ", "\n")):
+            self._pieces.append(" ")
+
+    def text(self) -> str:
+        """
+        Returns the text collected so far, one block per line and trimmed.
+        """
+        lines = (line.strip() for line in "".join(self._pieces).split("\n"))
+        text = "\n".join(lines)
+        return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def _decode_chunks(html, chunk_size: int = _FEED_CHUNK_SIZE):
+    """
+    Yields text chunks from a str or bytes HTML body. Bytes are decoded incrementally
+    as UTF-8, falling back to Windows-1252 (common for Outlook HTML) if that fails.
+    """
+    if isinstance(html, str):
+        for start in range(0, len(html), chunk_size):
+            yield html[start:start + chunk_size]
+        return
+    try:
+        html.decode("utf-8")
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "cp1252"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for start in range(0, len(html), chunk_size):
+        yield decoder.decode(html[start:start + chunk_size])
+    yield decoder.decode(b"", final=True)
+
+def html_to_text(html) -> str:
+    """
+    Converts an HTML body (str or bytes) to readable plain text.
+    """
+    converter = HtmlToText()
+    for chunk in _decode_chunks(html):
+        converter.feed(chunk)
+    converter.close()
+    return converter.text()
+
+def convert_html_body(html) -> tuple:
+    """
+    Converts an HTML email body to text and records how much it shrank.
+
+    Args:
+        html (str or bytes): The HTML body, e.g. msg.htmlBody or a PST html_body.
+
+    Returns:
+        tuple: (text, stats) where stats has "html_chars", "text_chars" and
+               "reduction" (the fraction of characters removed).
+    """
+    text = html_to_text(html)
+    html_chars = len(html)
+    stats = {
+        "html_chars": html_chars,
+        "text_chars": len(text),
+        "reduction": round(1 - len(text) / html_chars, 4) if html_chars else 0.0
+    }
+    with _metrics_lock:
+        HTML_METRICS["messages"] += 1
+        HTML_METRICS["html_chars"] += html_chars
+        HTML_METRICS["text_chars"] += len(text)
+    print(f"DEBUG: HTML body converted to text: {html_chars} -> {len(text)} chars "
+          f"({stats['reduction']:.1%} smaller)")
+    return text, stats
+
+def html_metrics() -> dict:
+    """
+    Returns the aggregate HTML-to-text metrics for this process.
+    """
+    with _metrics_lock:
+        metrics = dict(HTML_METRICS)
+    metrics["reduction"] = (1 - metrics["text_chars"] / metrics["html_chars"]) if metrics["html_chars"] else 0.0
+    return metrics
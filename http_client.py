@@ -0,0 +1,87 @@
+import os
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pool and timeout settings for calls to the custom API (optionally set via environment variables).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", str(HTTP_MAX_CONNECTIONS)))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))
+
+# Send custom API and OpenAI calls to the local mock server (mock_llm_server.py) instead,
+# for offline load and latency tests (optionally set via environment variables).
+USE_MOCK_LLM = os.getenv("USE_MOCK_LLM", "0") == "1"
+MOCK_LLM_URL = os.getenv("MOCK_LLM_URL", "http://127.0.0.1:8900").rstrip("/")
+
+_async_client = None
+_session = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client, creating it on first use.
+
+    The client keeps connections alive and reuses them across requests, with at most
+    HTTP_MAX_CONNECTIONS open at once; callers beyond that wait up to HTTP_POOL_TIMEOUT
+    for a free connection. Close it with close_async_client() on application shutdown.
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=HTTP_CONNECT_TIMEOUT,
+                read=HTTP_READ_TIMEOUT,
+                write=HTTP_WRITE_TIMEOUT,
+                pool=HTTP_POOL_TIMEOUT
+            )
+        )
+        print(f"DEBUG: Created pooled async HTTP client (max {HTTP_MAX_CONNECTIONS} connections)")
+    return _async_client
+
+async def close_async_client():
+    """
+    Closes the shared async HTTP client and its pooled connections.
+    """
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+        print("DEBUG: Closed pooled async HTTP client")
+
+def get_session() -> requests.Session:
+    """
+    Returns a shared requests.Session with a connection pool of HTTP_MAX_CONNECTIONS,
+    used by the synchronous invoke_custom_api so it reuses connections as well.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_MAX_CONNECTIONS, pool_maxsize=HTTP_MAX_CONNECTIONS)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+def request_timeout(read: float = None) -> tuple:
+    """
+    Returns the (connect, read) timeout for synchronous requests; `read` overrides HTTP_READ_TIMEOUT.
+    """
+    return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT if read is None else read)
+
+def endpoint(url: str, mock_path: str) -> str:
+    """
+    Returns `url`, or the matching route of the mock server (MOCK_LLM_URL + mock_path)
+    when USE_MOCK_LLM=1.
+    """
+    if USE_MOCK_LLM:
+        print(f"DEBUG: USE_MOCK_LLM=1, using {MOCK_LLM_URL}{mock_path} instead of {url}")
+        return f"{MOCK_LLM_URL}{mock_path}"
+    return url
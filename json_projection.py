@@ -0,0 +1,310 @@
+import re
+import json
+
+# Keys the custom API adds next to the verdict; they echo the retrieved documents and can
+# be megabytes per response.
+CONTEXT_KEYS = ("context",)
+
+_NON_WHITESPACE = re.compile(r"\S")
+# Characters that matter outside and inside a JSON string.
+_STRUCTURAL = re.compile(r'["{}\[\],]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# The rest of a string up to its closing quote (or a lone backslash at the end of the chunk),
+# escapes included, in one match.
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+_START, _KEY_OR_END, _KEY, _COLON, _VALUE_START, _VALUE, _AFTER_VALUE, _DONE, _RAW = range(9)
+
+class JsonProjector:
+    """
+    Incremental parser that keeps only some top-level keys of a JSON object.
+
+    Chunks of the response are fed as they arrive. Values of wanted keys are collected
+    and decoded; all other values are skipped by jumping from one quote, bracket or
+    comma to the next with a regex, so they are never built as Python objects nor held
+    in memory beyond the current chunk. A response that is not a JSON object (plain
+    text, fenced JSON) is kept as text instead.
+
+    A lenient projector does not raise on a malformed object (Python literals, smart
+    quotes, prose after the closing brace, a truncated response): it falls back to text,
+    with the values skipped so far replaced by null, and reads the rest of the response
+    as text, so a tolerant parser such as verdict_parser.parse_verdict can repair it.
+
+    Args:
+        keys (iterable, optional): The top-level keys to keep; None keeps all keys not skipped.
+        skip (iterable): Keys that are always dropped (default: CONTEXT_KEYS).
+        lenient (bool, optional): Fall back to text instead of raising on a malformed object.
+    """
+
+    def __init__(self, keys=None, skip=CONTEXT_KEYS, lenient=False):
+        self.keys = set(keys) if keys is not None else None
+        self.skip = set(skip)
+        self.lenient = lenient
+        self.error = None
+        self.result = {}
+        self.skipped_chars = {}
+        self._state = _START
+        self._raw = []
+        self._key_parts = []
+        self._key = None
+        self._capturing = False
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._skipped = 0
+        # The response so far without the skipped values, to fall back to (lenient only).
+        self._transcript = [] if lenient else None
+        self._mark = 0
+
+    @property
+    def is_object(self) -> bool:
+        return self._state != _RAW
+
+    @property
+    def text(self) -> str:
+        """
+        The full response, when it is not a JSON object (None otherwise).
+        """
+        return "".join(self._raw) if self._state == _RAW else None
+
+    def _wanted(self, key: str) -> bool:
+        return key not in self.skip and (self.keys is None or key in self.keys)
+
+    def feed(self, chunk: str):
+        """
+        Processes the next chunk of the response.
+
+        Raises:
+            ValueError: If the object is malformed (outside of skipped values) and the
+                projector is not lenient.
+        """
+        if self._state == _RAW:
+            self._raw.append(chunk)
+            return
+        if self._transcript is None:
+            self._feed(chunk)
+            return
+        self._mark = 0
+        try:
+            self._feed(chunk)
+        except ValueError as e:
+            # Errors never occur inside a skipped value, so the chunk from the end of the
+            # last one on is kept as text.
+            self._fall_back(chunk[self._mark:], e)
+            return
+        if self._state != _RAW and not (self._state == _VALUE and not self._capturing):
+            self._transcript.append(chunk[self._mark:])
+
+    def _fall_back(self, rest: str, error: ValueError):
+        print(f"DEBUG: Malformed JSON response ({error}), falling back to text")
+        self.error = str(error)
+        self._raw = self._transcript + [rest]
+        self._transcript = None
+        self._state = _RAW
+
+    def _feed(self, chunk: str):
+        i, n = 0, len(chunk)
+        while i < n:
+            state = self._state
+            if state == _VALUE:
+                i = self._scan_value(chunk, i, n)
+                continue
+            if state == _KEY:
+                i = self._scan_key(chunk, i)
+                continue
+            match = _NON_WHITESPACE.search(chunk, i)
+            if match is None:
+                return
+            i = match.start()
+            char = chunk[i]
+            if state == _START:
+                if char != "{":
+                    self._state = _RAW
+                    self._raw.append(chunk[i:])
+                    return
+                self._state = _KEY_OR_END
+            elif state == _KEY_OR_END:
+                if char == '"':
+                    self._state = _KEY
+                    self._key_parts = []
+                elif char == "}":
+                    # Also accepts a trailing comma before the closing brace.
+                    self._state = _DONE
+                else:
+                    raise ValueError(f"Expected a key in JSON object, got {char!r}")
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError(f"Expected ':' after key {self._key!r}, got {char!r}")
+                self._state = _VALUE_START
+            elif state == _VALUE_START:
+                self._capturing = self._wanted(self._key)
+                self._parts = []
+                self._depth = 0
+                self._in_string = False
+                self._escape = False
+                self._skipped = 0
+                self._state = _VALUE
+                continue
+            elif state == _AFTER_VALUE:
+                if char == ",":
+                    self._state = _KEY_OR_END
+                elif char == "}":
+                    self._state = _DONE
+                else:
+                    raise ValueError(f"Expected ',' or '}}' after the value of {self._key!r}, got {char!r}")
+            else:
+                raise ValueError("Unexpected data after the end of the JSON object")
+            i += 1
+
+    def _scan_key(self, chunk: str, i: int) -> int:
+        n = len(chunk)
+        while i < n:
+            if self._escape:
+                # The character after a backslash belongs to the key, even a quote.
+                self._key_parts.append(chunk[i])
+                self._escape = False
+                i += 1
+                continue
+            match = _STRING_SPECIAL.search(chunk, i)
+            if match is None:
+                self._key_parts.append(chunk[i:])
+                return n
+            self._key_parts.append(chunk[i:match.start()])
+            if match.group() == "\\":
+                self._key_parts.append("\\")
+                self._escape = True
+                i = match.end()
+                continue
+            self._key = json.loads('"' + "".join(self._key_parts) + '"')
+            self._state = _COLON
+            return match.end()
+        return n
+
+    def _scan_value(self, chunk: str, start: int, n: int) -> int:
+        i = start
+        depth = self._depth
+        in_string = self._in_string
+        end = None
+        while i < n:
+            if in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                i = _STRING_REST.match(chunk, i).end()
+                if i >= n:
+                    break
+                if chunk[i] == "\\":
+                    # A backslash as the last character of the chunk escapes the next one.
+                    self._escape = True
+                    i = n
+                    break
+                i += 1
+                in_string = False
+                if depth == 0:
+                    end = i
+                    break
+                continue
+            match = _STRUCTURAL.search(chunk, i)
+            if match is None:
+                i = n
+                break
+            char = match.group()
+            if char == '"':
+                in_string = True
+                i = match.end()
+            elif char in "{[":
+                depth += 1
+                i = match.end()
+            elif depth == 0:
+                # "," or a closing bracket ends a number, true, false or null.
+                end = match.start()
+                break
+            elif char == ",":
+                i = match.end()
+            else:
+                depth -= 1
+                i = match.end()
+                if depth == 0:
+                    end = i
+                    break
+        self._depth = depth
+        self._in_string = in_string
+        stop = n if end is None else end
+        if self._capturing:
+            self._parts.append(chunk[start:stop])
+        else:
+            if self._transcript is not None:
+                if self._skipped == 0:
+                    # The text before the value is kept, the value itself replaced by null.
+                    self._transcript.append(chunk[self._mark:start] + "null")
+                self._mark = stop
+            self._skipped += stop - start
+        if end is not None:
+            self._finish_value()
+        return stop
+
+    def _finish_value(self):
+        if self._capturing:
+            source = "".join(self._parts)
+            try:
+                value = json.loads(source)
+            except ValueError:
+                value = json.loads(_TRAILING_COMMA.sub(r"\1", source))
+            self.result[self._key] = value
+            self._parts = []
+        else:
+            self.skipped_chars[self._key] = self.skipped_chars.get(self._key, 0) + self._skipped
+        self._state = _AFTER_VALUE
+
+    def close(self):
+        """
+        Returns the kept keys as a dict, or None if the response was not a JSON object
+        (see `text`).
+
+        Raises:
+            ValueError: If the response ended inside the object and the projector is not lenient.
+        """
+        if self._state == _RAW:
+            return None
+        if self._state == _START:
+            self._state = _RAW
+            return None
+        if self._state != _DONE:
+            error = ValueError("JSON response ended before the end of the object")
+            if self._transcript is None:
+                raise error
+            self._fall_back("", error)
+            return None
+        return self.result
+
+def project_chunks(chunks, keys=None, skip=CONTEXT_KEYS, lenient=False) -> JsonProjector:
+    """
+    Feeds an iterable of text chunks (e.g. requests' iter_content) to a JsonProjector
+    and returns it closed; read `.result`, or `.text` if it was not a JSON object.
+    """
+    projector = JsonProjector(keys, skip, lenient)
+    for chunk in chunks:
+        projector.feed(chunk)
+    projector.close()
+    return projector
+
+async def project_chunks_async(chunks, keys=None, skip=CONTEXT_KEYS, lenient=False) -> JsonProjector:
+    """
+    Async variant of project_chunks for an async iterator (e.g. httpx's aiter_text).
+    """
+    projector = JsonProjector(keys, skip, lenient)
+    async for chunk in chunks:
+        projector.feed(chunk)
+    projector.close()
+    return projector
+
+def project_text(text: str, keys=None, skip=CONTEXT_KEYS):
+    """
+    Projects a response that is already in memory; skipped values are still never decoded.
+    Returns the kept keys as a dict, or the text unchanged if it is not a JSON object.
+    """
+    projector = project_chunks((text,), keys, skip)
+    return projector.result if projector.is_object else text
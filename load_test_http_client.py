@@ -0,0 +1,97 @@
+import os
+import io
+import time
+import socket
+import asyncio
+import threading
+import contextlib
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+# Simulated LLM round trip of the stand-in API, in seconds.
+STANDIN_LATENCY = float(os.getenv("STANDIN_LATENCY", "0.2"))
+REQUESTS_PER_RUN = int(os.getenv("LOAD_TEST_REQUESTS", "40"))
+CONCURRENCY_LEVELS = [1, 5, 10, 20, 40]
+
+standin = FastAPI(title="Stand-in custom API")
+
+@standin.post("/query", response_class=PlainTextResponse)
+async def query(payload: dict):
+    await asyncio.sleep(STANDIN_LATENCY)
+    return "No suspicious activity detected. The message is a routine update."
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_standin(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(standin, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run_blocking(analyzer, total: int) -> float:
+    """
+    The previous behavior: async handlers calling the blocking invoke_custom_api,
+    which holds the event loop for the whole round trip.
+    """
+    async def handler(i):
+        return analyzer.invoke_custom_api("LoadTest", f"Please review the attached statement {i}.", "prompt")
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(total)))
+    return time.perf_counter() - start
+
+async def run_async(analyzer, total: int, concurrency: int) -> float:
+    """
+    Async handlers awaiting invoke_custom_api_async, with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    async def handler(i):
+        async with semaphore:
+            return await analyzer.invoke_custom_api_async("LoadTest", f"Please review the attached statement {i}.", "prompt")
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(total)))
+    return time.perf_counter() - start
+
+async def run_identical(analyzer, total: int) -> tuple:
+    """
+    A burst of identical requests (a mass-mailed message), which single-flight coalesces.
+    """
+    from singleflight import get_single_flight
+    before = get_single_flight().stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(analyzer.invoke_custom_api_async("LoadTest", "Mass-mailed notice.", "prompt") for _ in range(total)))
+    seconds = time.perf_counter() - start
+    after = get_single_flight().stats()
+    return seconds, after["calls"] - before["calls"], after["coalesced"] - before["coalesced"]
+
+async def main(analyzer):
+    from http_client import close_async_client
+    with contextlib.redirect_stdout(io.StringIO()):
+        blocking = await run_blocking(analyzer, REQUESTS_PER_RUN)
+        timings = {level: await run_async(analyzer, REQUESTS_PER_RUN, level) for level in CONCURRENCY_LEVELS}
+        identical_seconds, calls, coalesced = await run_identical(analyzer, REQUESTS_PER_RUN)
+        await close_async_client()
+    print(f"{REQUESTS_PER_RUN} requests, stand-in latency {STANDIN_LATENCY * 1000:.0f} ms")
+    print(f"{'mode':<22} {'seconds':>8} {'req/s':>8}")
+    print(f"{'blocking (requests)':<22} {blocking:>8.2f} {REQUESTS_PER_RUN / blocking:>8.1f}")
+    for level, seconds in timings.items():
+        print(f"{f'async, {level} in flight':<22} {seconds:>8.2f} {REQUESTS_PER_RUN / seconds:>8.1f}")
+    print(f"identical burst: {REQUESTS_PER_RUN} requests in {identical_seconds:.2f} s, "
+          f"{calls} API call(s), {coalesced} coalesced")
+
+if __name__ == "__main__":
+    port = free_port()
+    os.environ["CUSTOM_API_URL"] = f"http://127.0.0.1:{port}/query"
+    # Every request sends the same text; measure the HTTP path, not the result cache.
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    server = start_standin(port)
+    import updated_text_email_analyzer
+    try:
+        asyncio.run(main(updated_text_email_analyzer))
+    finally:
+        server.should_exit = True
@@ -12,7 +12,7 @@ ARCHIVE_FOLDER = os.getenv("ARCHIVE_FOLDER", "./emails")
 
 # Import our custom modules
 from email_parser import parse_email
-from analyzer import build_prompt, get_completion
+from analyzer import analyze_text
 
 app = FastAPI(
     title="Email Compliance Analyzer API",
@@ -33,8 +33,7 @@ async def analyze_email(filename: str = Query(..., description="Filename of the
     try:
         email_data = parse_email(file_path)
         email_body = email_data.get("body", "")
-        prompt = build_prompt(email_body)
-        analysis = get_completion(prompt)
+        analysis = analyze_text(email_body)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -56,9 +55,8 @@ async def analyze_all_emails():
                 file_path = os.path.join(ARCHIVE_FOLDER, filename)
                 email_data = parse_email(file_path)
                 email_body = email_data.get("body", "")
-                prompt = build_prompt(email_body)
                 try:
-                    analysis = get_completion(prompt)
+                    analysis = analyze_text(email_body)
                 except Exception as e:
                     analysis = f"Error during analysis: {str(e)}"
                 results.append({
@@ -1,4 +1,5 @@
 import os
+import asyncio
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv, find_dotenv
@@ -10,9 +11,16 @@ _ = load_dotenv(find_dotenv())
 # Set the path for the email archive folder (default is "./emails")
 ARCHIVE_FOLDER = os.getenv("ARCHIVE_FOLDER", "./emails")
 
+# Number of PST messages extracted ahead of the one currently being analyzed.
+PST_PREFETCH = int(os.getenv("PST_PREFETCH", "8"))
+# Number of worker processes used to extract PST files (0 or 1 extracts in-process).
+PST_WORKERS = int(os.getenv("PST_WORKERS", "0"))
+
 # Import custom modules
 from email_parser import parse_email
-from analyzer import build_prompt, get_completion
+from prefetch import prefetch
+from bulk import BULK_CONCURRENCY, BULK_MAX_CONCURRENCY, bulk_map, run_blocking, run_parse
+from analyzer import analyze_text
 
 app = FastAPI(
     title="Email Compliance Analyzer API",
@@ -31,15 +39,17 @@ async def analyze_email_endpoint(filename: str = Query(..., description="Filenam
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        email_data = parse_email(file_path)
+        email_data = parse_email(file_path, lazy=True, workers=PST_WORKERS)
         # Check if the result is a PST file that contains multiple emails.
         if "emails" in email_data:
             analysis_results = []
-            for email_item in email_data["emails"]:
+            # Messages are extracted lazily so analysis overlaps with extraction.
+            for email_item in prefetch(email_data["emails"], PST_PREFETCH):
                 email_body = email_item.get("body", "")
-                prompt = build_prompt(email_body)
-                analysis = get_completion(prompt)
+                analysis = analyze_text(email_body)
                 analysis_results.append({
+                    "folder": email_item.get("folder"),
+                    "index": email_item.get("index"),
                     "metadata": email_item.get("metadata", {}),
                     "analysis": analysis
                 })
@@ -47,8 +57,7 @@ async def analyze_email_endpoint(filename: str = Query(..., description="Filenam
         else:
             # For .eml or .msg files
             email_body = email_data.get("body", "")
-            prompt = build_prompt(email_body)
-            analysis = get_completion(prompt)
+            analysis = analyze_text(email_body)
             result = {
                 "file_type": "eml/msg",
                 "metadata": email_data.get("metadata", {}),
@@ -60,51 +69,58 @@ async def analyze_email_endpoint(filename: str = Query(..., description="Filenam
     return JSONResponse(content=result)
 
 @app.get("/analyze-all-emails")
-async def analyze_all_emails():
+async def analyze_all_emails(
+    concurrency: int = Query(BULK_CONCURRENCY, ge=1, le=BULK_MAX_CONCURRENCY, description="Number of emails analyzed at once")
+):
     """
     Analyze all email files (.eml, .msg, and .pst) in the archive folder.
     For PST files, each contained email is processed.
+    Up to `concurrency` files are parsed and analyzed at once, and at most `concurrency`
+    LLM calls are in flight across all files (including the messages of PST files).
+    Results are returned in directory order.
     """
-    results = []
+    llm_slots = asyncio.Semaphore(concurrency)
+
+    async def analyze_body(email_body: str) -> str:
+        try:
+            async with llm_slots:
+                return await run_blocking(analyze_text, email_body)
+        except Exception as e:
+            return f"Error during analysis: {str(e)}"
+
+    async def analyze_pst_email(email_item: dict) -> dict:
+        analysis = await analyze_body(email_item.get("body", ""))
+        return {
+            "folder": email_item.get("folder"),
+            "index": email_item.get("index"),
+            "metadata": email_item.get("metadata", {}),
+            "analysis": analysis
+        }
+
+    async def analyze_file(filename: str) -> dict:
+        file_path = os.path.join(ARCHIVE_FOLDER, filename)
+        email_data = await run_parse(parse_email, file_path, lazy=True, workers=PST_WORKERS)
+        if "emails" in email_data:
+            # PST file: its messages are analyzed concurrently, in mailbox order.
+            pst_results = await bulk_map(prefetch(email_data["emails"], PST_PREFETCH), analyze_pst_email, concurrency)
+            return {
+                "filename": filename,
+                "file_type": "pst",
+                "emails": pst_results
+            }
+        # .eml or .msg file.
+        analysis = await analyze_body(email_data.get("body", ""))
+        return {
+            "filename": filename,
+            "file_type": "eml/msg",
+            "metadata": email_data.get("metadata", {}),
+            "analysis": analysis
+        }
+
     try:
-        for filename in os.listdir(ARCHIVE_FOLDER):
-            # Process files with supported extensions.
-            if filename.lower().endswith((".eml", ".msg", ".pst")):
-                file_path = os.path.join(ARCHIVE_FOLDER, filename)
-                email_data = parse_email(file_path)
-                if "emails" in email_data:
-                    # PST file: process each email message.
-                    pst_results = []
-                    for email_item in email_data["emails"]:
-                        email_body = email_item.get("body", "")
-                        prompt = build_prompt(email_body)
-                        try:
-                            analysis = get_completion(prompt)
-                        except Exception as e:
-                            analysis = f"Error during analysis: {str(e)}"
-                        pst_results.append({
-                            "metadata": email_item.get("metadata", {}),
-                            "analysis": analysis
-                        })
-                    results.append({
-                        "filename": filename,
-                        "file_type": "pst",
-                        "emails": pst_results
-                    })
-                else:
-                    # .eml or .msg file.
-                    email_body = email_data.get("body", "")
-                    prompt = build_prompt(email_body)
-                    try:
-                        analysis = get_completion(prompt)
-                    except Exception as e:
-                        analysis = f"Error during analysis: {str(e)}"
-                    results.append({
-                        "filename": filename,
-                        "file_type": "eml/msg",
-                        "metadata": email_data.get("metadata", {}),
-                        "analysis": analysis
-                    })
+        # Process files with supported extensions.
+        files = [filename for filename in os.listdir(ARCHIVE_FOLDER) if filename.lower().endswith((".eml", ".msg", ".pst"))]
+        results = await bulk_map(files, analyze_file, concurrency)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
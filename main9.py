@@ -13,7 +13,8 @@ if not os.path.isdir(ARCHIVE_FOLDER):
 
 # Import custom modules.
 from parser import parse_email  # Now exclusively for .msg files
-from analyzer import build_prompt, get_completion
+from analyzer import analyze_text
+from reply_history import prepare_body
 
 app = FastAPI(
     title="Msg Email Compliance Analyzer API",
@@ -36,14 +37,13 @@ async def analyze_email_endpoint(
         # Parse the email (.msg) file.
         email_data = parse_email(file_path)
         # email_data is a dict with keys "metadata" and "body"
-        body = email_data.get("body", "")
-        # Build the prompt to send to the LLM.
-        prompt = build_prompt(body)
-        # Get the analysis from the LLM.
-        analysis = get_completion(prompt)
+        body, history = prepare_body(email_data.get("body", ""))
+        # Get the analysis from the LLM (long bodies are analyzed in chunks).
+        analysis = analyze_text(body)
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -61,16 +61,16 @@ async def analyze_all_emails():
                 file_path = os.path.join(ARCHIVE_FOLDER, filename)
                 print(f"Debug: Processing file: {filename}")
                 email_data = parse_email(file_path)
-                body = email_data.get("body", "")
-                prompt = build_prompt(body)
+                body, history = prepare_body(email_data.get("body", ""))
                 try:
-                    analysis = get_completion(prompt)
+                    analysis = analyze_text(body)
                 except Exception as e:
                     analysis = f"Error during analysis: {str(e)}"
                 results.append({
                     "filename": filename,
                     "metadata": email_data.get("metadata", {}),
-                    "analysis": analysis
+                    "analysis": analysis,
+                    "history": history
                 })
             else:
                 print(f"Debug: Skipping non-.msg file: {filename}")
@@ -14,7 +14,9 @@ if not os.path.isdir(ARCHIVE_FOLDER):
 
 # Import custom modules.
 from parser import parse_email  # This handles only .msg files now.
-from analyzer import build_prompt, get_completion
+from analyzer import analyze_text
+from reply_history import prepare_body
+from bulk import BULK_CONCURRENCY, BULK_MAX_CONCURRENCY, bulk_map, run_blocking, run_parse
 
 app = FastAPI(
     title="Msg Email Compliance Analyzer API",
@@ -40,18 +42,16 @@ async def analyze_email_endpoint(
         email_data = parse_email(file_path)
         print("DEBUG: Parsed email data:", email_data)
         
-        body = email_data.get("body", "")
+        body, history = prepare_body(email_data.get("body", ""))
         print(f"DEBUG: Extracted email body (first 100 chars): {body[:100]}...")
         
-        prompt = build_prompt(body)
-        print(f"DEBUG: Built prompt (first 100 chars): {prompt[:100]}...")
-        
-        analysis = get_completion(prompt)
+        analysis = analyze_text(body)
         print(f"DEBUG: LLM analysis received (first 100 chars): {analysis[:100]}...")
         
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history
         }
         print("DEBUG: Assembled result:", result)
         
@@ -69,42 +69,47 @@ async def analyze_email_endpoint(
     return JSONResponse(content=result)
 
 @app.get("/analyze-all-emails")
-async def analyze_all_emails():
-    results = []
+async def analyze_all_emails(
+    concurrency: int = Query(BULK_CONCURRENCY, ge=1, le=BULK_MAX_CONCURRENCY, description="Number of emails analyzed at once")
+):
+    async def analyze_file(filename: str) -> dict:
+        file_path = os.path.join(ARCHIVE_FOLDER, filename)
+        print(f"DEBUG: Processing file: {filename} at path: {file_path}")
+        email_data = await run_parse(parse_email, file_path)
+        print(f"DEBUG: Parsed data for {filename}:", email_data)
+        
+        body, history = prepare_body(email_data.get("body", ""))
+        print(f"DEBUG: Email body for {filename} (first 100 chars): {body[:100]}...")
+        
+        analysis = await run_blocking(analyze_text, body)
+        print(f"DEBUG: LLM analysis for {filename} (first 100 chars): {analysis[:100]}...")
+        
+        result = {
+            "filename": filename,
+            "metadata": email_data.get("metadata", {}),
+            "analysis": analysis,
+            "history": history
+        }
+        print(f"DEBUG: Assembled result for {filename}:", result)
+        return result
+
+    def file_error(filename: str, e: Exception) -> dict:
+        error_message = f"Error processing {filename}: {str(e)}"
+        print("DEBUG:", error_message)
+        return {"filename": filename, "error": error_message}
+
     try:
         files = os.listdir(ARCHIVE_FOLDER)
         print(f"DEBUG: Files in archive folder: {files}")
         
+        msg_files = []
         for filename in files:
             if filename.lower().endswith(".msg"):
-                file_path = os.path.join(ARCHIVE_FOLDER, filename)
-                print(f"DEBUG: Processing file: {filename} at path: {file_path}")
-                try:
-                    email_data = parse_email(file_path)
-                    print(f"DEBUG: Parsed data for {filename}:", email_data)
-                    
-                    body = email_data.get("body", "")
-                    print(f"DEBUG: Email body for {filename} (first 100 chars): {body[:100]}...")
-                    
-                    prompt = build_prompt(body)
-                    print(f"DEBUG: Built prompt for {filename} (first 100 chars): {prompt[:100]}...")
-                    
-                    analysis = get_completion(prompt)
-                    print(f"DEBUG: LLM analysis for {filename} (first 100 chars): {analysis[:100]}...")
-                    
-                    result = {
-                        "filename": filename,
-                        "metadata": email_data.get("metadata", {}),
-                        "analysis": analysis
-                    }
-                    print(f"DEBUG: Assembled result for {filename}:", result)
-                    results.append(result)
-                except Exception as e:
-                    error_message = f"Error processing {filename}: {str(e)}"
-                    print("DEBUG:", error_message)
-                    results.append({"filename": filename, "error": error_message})
+                msg_files.append(filename)
             else:
                 print(f"DEBUG: Skipping non-.msg file: {filename}")
+        # Up to `concurrency` files are parsed and analyzed at once; results keep the directory order.
+        results = await bulk_map(msg_files, analyze_file, concurrency, on_error=file_error)
     except Exception as e:
         print("DEBUG: Exception in /analyze-all-emails:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
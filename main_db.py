@@ -18,7 +18,14 @@ if not os.path.isdir(ARCHIVE_FOLDER):
 
 # Import custom modules.
 from parser import parse_email  # This now handles only .msg files.
-from analyzer import build_prompt, get_completion
+from parse_cache import get_parse_cache
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from analyzer import analyze_text, prompt_version
+from reply_history import prepare_body, reply_metrics
+from prescreen import PRESCREEN_MODES, prescreen_metrics, screen_and_analyze
+from rate_limiter import rate_limit_snapshot
+from bulk import BULK_CONCURRENCY, BULK_MAX_CONCURRENCY, bulk_map, run_blocking, run_parse
 
 # Setup DynamoDB connection.
 # If running locally or in an environment with proper IAM roles, boto3 will load your credentials.
@@ -42,6 +49,7 @@ def persist_result_to_dynamodb(filename: str, email_data: dict, analysis: str):
         "metadata": email_data.get("metadata", {}),
         "body": email_data.get("body", ""),
         "analysis": analysis,
+        "prompt_version": prompt_version(),
         "timestamp": datetime.datetime.utcnow().isoformat()  # ISO formatted timestamp.
     }
     print("DEBUG: Persisting record to DynamoDB:", record)
@@ -55,7 +63,8 @@ app = FastAPI(
 
 @app.get("/analyze-email")
 async def analyze_email_endpoint(
-    filename: str = Query(..., description="Filename of the .msg email to analyze")
+    filename: str = Query(..., description="Filename of the .msg email to analyze"),
+    mode: str = Query(None, description=f"Pre-screen mode, one of {', '.join(PRESCREEN_MODES)} (default PRESCREEN_MODE)")
 ):
     # Build the full file path.
     file_path = os.path.join(ARCHIVE_FOLDER, filename)
@@ -67,28 +76,30 @@ async def analyze_email_endpoint(
     if not filename.lower().endswith(".msg"):
         print("DEBUG: File is not a .msg file, raising 400.")
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
+    if mode is not None and mode.lower() not in PRESCREEN_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PRESCREEN_MODES)}")
     
     try:
-        # Parse the .msg file.
-        email_data = parse_email(file_path)
+        # Parse the .msg file (served from the parse cache when the content is unchanged).
+        email_data = get_parse_cache().parse(parse_email, file_path)
         print("DEBUG: Parsed email data:", email_data)
         
         # Extract the formatted email body.
-        body = email_data.get("body", "")
+        body, history = prepare_body(email_data.get("body", ""))
         print(f"DEBUG: Extracted email body (first 100 chars): {body[:100]}...")
         
-        # Build the prompt for LLM analysis.
-        prompt = build_prompt(body)
-        print(f"DEBUG: Built prompt (first 100 chars): {prompt[:100]}...")
-        
-        # Get the analysis from LLM.
-        analysis = get_completion(prompt)
+        # Pre-screen the body and, depending on the mode, get the analysis from the LLM
+        # (long bodies are analyzed in chunks).
+        analysis, screen = screen_and_analyze(body, analyze_text, mode)
         print(f"DEBUG: LLM analysis received (first 100 chars): {analysis[:100]}...")
         
         # Assemble the result.
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history,
+            "prescreen": screen,
+            "prompt_version": prompt_version()
         }
         print("DEBUG: Assembled result:", result)
         
@@ -111,46 +122,62 @@ async def analyze_email_endpoint(
     return JSONResponse(content=result)
 
 @app.get("/analyze-all-emails")
-async def analyze_all_emails():
-    results = []
+async def analyze_all_emails(
+    concurrency: int = Query(BULK_CONCURRENCY, ge=1, le=BULK_MAX_CONCURRENCY, description="Number of emails analyzed at once"),
+    mode: str = Query(None, description=f"Pre-screen mode, one of {', '.join(PRESCREEN_MODES)} (default PRESCREEN_MODE)")
+):
+    if mode is not None and mode.lower() not in PRESCREEN_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PRESCREEN_MODES)}")
+
+    async def analyze_file(filename: str) -> dict:
+        file_path = os.path.join(ARCHIVE_FOLDER, filename)
+        print(f"DEBUG: Processing file: {filename} at path: {file_path}")
+        email_data = await run_parse(get_parse_cache().parse, parse_email, file_path)
+        print(f"DEBUG: Parsed data for {filename}:", email_data)
+        
+        body, history = prepare_body(email_data.get("body", ""))
+        print(f"DEBUG: Email body for {filename} (first 100 chars): {body[:100]}...")
+        
+        analysis, screen = await run_blocking(screen_and_analyze, body, analyze_text, mode)
+        print(f"DEBUG: LLM analysis for {filename} (first 100 chars): {analysis[:100]}...")
+        
+        result = {
+            "filename": filename,
+            "metadata": email_data.get("metadata", {}),
+            "analysis": analysis,
+            "history": history,
+            "prescreen": screen,
+            "prompt_version": prompt_version()
+        }
+        print(f"DEBUG: Assembled result for {filename}:", result)
+        
+        # Persist each result to DynamoDB.
+        await run_blocking(persist_result_to_dynamodb, filename, email_data, analysis)
+        return result
+
+    def file_error(filename: str, e: Exception) -> dict:
+        error_message = f"Error processing {filename}: {str(e)}"
+        print("DEBUG:", error_message)
+        return {"filename": filename, "error": error_message}
+
     try:
         files = os.listdir(ARCHIVE_FOLDER)
         print(f"DEBUG: Files in archive folder: {files}")
         
+        msg_files = []
         for filename in files:
             if filename.lower().endswith(".msg"):
-                file_path = os.path.join(ARCHIVE_FOLDER, filename)
-                print(f"DEBUG: Processing file: {filename} at path: {file_path}")
-                try:
-                    email_data = parse_email(file_path)
-                    print(f"DEBUG: Parsed data for {filename}:", email_data)
-                    
-                    body = email_data.get("body", "")
-                    print(f"DEBUG: Email body for {filename} (first 100 chars): {body[:100]}...")
-                    
-                    prompt = build_prompt(body)
-                    print(f"DEBUG: Built prompt for {filename} (first 100 chars): {prompt[:100]}...")
-                    
-                    analysis = get_completion(prompt)
-                    print(f"DEBUG: LLM analysis for {filename} (first 100 chars): {analysis[:100]}...")
-                    
-                    result = {
-                        "filename": filename,
-                        "metadata": email_data.get("metadata", {}),
-                        "analysis": analysis
-                    }
-                    print(f"DEBUG: Assembled result for {filename}:", result)
-                    results.append(result)
-                    
-                    # Persist each result to DynamoDB.
-                    persist_result_to_dynamodb(filename, email_data, analysis)
-                    
-                except Exception as e:
-                    error_message = f"Error processing {filename}: {str(e)}"
-                    print("DEBUG:", error_message)
-                    results.append({"filename": filename, "error": error_message})
+                msg_files.append(filename)
             else:
                 print(f"DEBUG: Skipping non-.msg file: {filename}")
+        # Up to `concurrency` files are parsed and analyzed at once; results keep the directory order.
+        results = await bulk_map(msg_files, analyze_file, concurrency, on_error=file_error)
+        print("DEBUG: Parse cache stats:", get_parse_cache().stats())
+        print("DEBUG: Result cache stats:", get_result_cache().stats())
+        print("DEBUG: Single-flight stats:", get_single_flight().stats())
+        print("DEBUG: Reply history savings:", reply_metrics())
+        print("DEBUG: Pre-screen stats:", prescreen_metrics())
+        print("DEBUG: LLM budget use:", rate_limit_snapshot())
     except Exception as e:
         print("DEBUG: Exception in /analyze-all-emails endpoint:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -165,5 +192,10 @@ async def analyze_all_emails():
     print("DEBUG: Returning JSONResponse for /analyze-all-emails endpoint.")
     return JSONResponse(content=results)
 
+@app.get("/llm-budget")
+async def llm_budget():
+    # Current TPM/RPM use and adaptive concurrency per deployment, for sizing bulk runs.
+    return JSONResponse(content=rate_limit_snapshot())
+
 if __name__ == '__main__':
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
@@ -0,0 +1,377 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import collections
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from batcher import estimate_tokens
+from chunking import CATEGORY_SEVERITY
+from prescreen import get_prescreener
+
+# Address of the mock server (optionally set via environment variables).
+MOCK_LLM_HOST = os.getenv("MOCK_LLM_HOST", "127.0.0.1")
+MOCK_LLM_PORT = int(os.getenv("MOCK_LLM_PORT", "8900"))
+
+# Time to first token: "fixed", "uniform", "normal", "lognormal" or "exponential" around
+# MOCK_LLM_LATENCY_MS (the median for lognormal). The spread is relative: +/- for uniform,
+# the standard deviation as a share of the mean for normal, sigma for lognormal.
+MOCK_LLM_LATENCY = os.getenv("MOCK_LLM_LATENCY", "lognormal").lower()
+MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "400"))
+MOCK_LLM_LATENCY_SPREAD = float(os.getenv("MOCK_LLM_LATENCY_SPREAD", "0.5"))
+# Token-proportional delays: reading the prompt before the first token, then generating the answer.
+MOCK_LLM_MS_PER_PROMPT_TOKEN = float(os.getenv("MOCK_LLM_MS_PER_PROMPT_TOKEN", "0.05"))
+MOCK_LLM_MS_PER_OUTPUT_TOKEN = float(os.getenv("MOCK_LLM_MS_PER_OUTPUT_TOKEN", "20"))
+
+# Failure injection: share of requests answered with a 500 or a 429, the Retry-After sent
+# with a 429, and a requests-per-minute quota beyond which every request gets a 429 (0 = none).
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_LLM_429_RATE = float(os.getenv("MOCK_LLM_429_RATE", "0"))
+MOCK_LLM_RETRY_AFTER = float(os.getenv("MOCK_LLM_RETRY_AFTER", "1"))
+MOCK_LLM_RPM = int(os.getenv("MOCK_LLM_RPM", "0"))
+
+# Answers of /query: "auto" (JSON when the system prompt asks for JSON), "text" or "json",
+# optionally with a "context" key of this many KB of echoed documents, like the real backend.
+MOCK_LLM_RESPONSE_FORMAT = os.getenv("MOCK_LLM_RESPONSE_FORMAT", "auto").lower()
+MOCK_LLM_CONTEXT_KB = int(os.getenv("MOCK_LLM_CONTEXT_KB", "0"))
+MOCK_LLM_SEED = os.getenv("MOCK_LLM_SEED")
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+RESPONSE_FORMATS = ("auto", "text", "json")
+
+_BATCH_MARKER = re.compile(r"^\[(\d+)\]\n", re.MULTILINE)
+_BATCH_COUNT = re.compile(r"You will receive (\d+) separate messages")
+_QUOTED_EMAIL = re.compile(r'"""(.*)"""', re.DOTALL)
+_CONTEXT_PASSAGE = ("Section 4.2 \"Communications with clients\": statements must be fair and balanced, "
+                    "must not promise specific results and must disclose material risks.\n")
+
+class MockLLM:
+    """
+    Behaviour and counters of the mock server.
+
+    Verdicts are deterministic: the input is scanned with the pre-screen rules and the
+    most severe matched category becomes the answer, so a load test gets realistic
+    answers for the same emails on every run. Latency, failures and 429s are drawn at
+    random (seeded with MOCK_LLM_SEED) and can be changed at runtime with configure()
+    or PUT /mock/config.
+    """
+
+    def __init__(self, seed=MOCK_LLM_SEED):
+        self.config = {
+            "latency": MOCK_LLM_LATENCY,
+            "latency_ms": MOCK_LLM_LATENCY_MS,
+            "latency_spread": MOCK_LLM_LATENCY_SPREAD,
+            "ms_per_prompt_token": MOCK_LLM_MS_PER_PROMPT_TOKEN,
+            "ms_per_output_token": MOCK_LLM_MS_PER_OUTPUT_TOKEN,
+            "error_rate": MOCK_LLM_ERROR_RATE,
+            "rate_limit_rate": MOCK_LLM_429_RATE,
+            "retry_after": MOCK_LLM_RETRY_AFTER,
+            "rpm": MOCK_LLM_RPM,
+            "response_format": MOCK_LLM_RESPONSE_FORMAT,
+            "context_kb": MOCK_LLM_CONTEXT_KB
+        }
+        self._random = random.Random(seed)
+        self._window = collections.deque()
+        self.reset()
+
+    def reset(self):
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "in_flight": 0,
+                      "max_in_flight": 0, "first_token_seconds": 0.0}
+        self._window.clear()
+
+    def configure(self, **changes) -> dict:
+        """
+        Updates settings by name (the keys of `config`), converted to the type of the current value.
+        The changes are checked together on a copy and applied only if all are valid.
+
+        Raises:
+            ValueError: For an unknown setting or value, distribution or response format.
+        """
+        config = dict(self.config)
+        for name, value in changes.items():
+            if name not in config:
+                raise ValueError(f"Unknown mock setting {name!r}; expected one of {', '.join(config)}")
+            config[name] = type(config[name])(value)
+        if config["latency"] not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {config['latency']!r}; "
+                             f"expected one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        if config["response_format"] not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown response format {config['response_format']!r}; "
+                             f"expected one of {', '.join(RESPONSE_FORMATS)}")
+        # Replaced in one step, so requests in flight never see a half-applied update.
+        self.config = config
+        return dict(config)
+
+    def sample_latency(self) -> float:
+        """
+        Draws a time to first token, in seconds, from the configured distribution.
+        """
+        mean = self.config["latency_ms"] / 1000
+        spread = self.config["latency_spread"]
+        kind = self.config["latency"]
+        if kind == "uniform":
+            delay = self._random.uniform(mean * (1 - spread), mean * (1 + spread))
+        elif kind == "normal":
+            delay = self._random.gauss(mean, mean * spread)
+        elif kind == "lognormal":
+            delay = mean * self._random.lognormvariate(0, spread)
+        elif kind == "exponential":
+            delay = self._random.expovariate(1 / mean) if mean > 0 else 0.0
+        else:
+            delay = mean
+        return max(delay, 0.0)
+
+    def admit(self):
+        """
+        Decides the fate of a new request: None to answer it, or (status, retry_after)
+        for an injected 429 (quota or random) or 500.
+        """
+        self.stats["requests"] += 1
+        now = time.monotonic()
+        rpm = self.config["rpm"]
+        if rpm > 0:
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            if len(self._window) >= rpm:
+                self.stats["rate_limited"] += 1
+                return 429, max(60 - (now - self._window[0]), 0.001)
+            self._window.append(now)
+        if self._random.random() < self.config["rate_limit_rate"]:
+            self.stats["rate_limited"] += 1
+            return 429, self.config["retry_after"]
+        if self._random.random() < self.config["error_rate"]:
+            self.stats["errors"] += 1
+            return 500, None
+        return None
+
+    def answer(self, text: str, system_prompt: str = "") -> str:
+        """
+        Returns the answer to an email: a JSON array for a micro-batched input, JSON when
+        the response format asks for it, the Classification/Category/Explanation text otherwise.
+        """
+        batch = _BATCH_COUNT.search(system_prompt)
+        if batch:
+            parts = _BATCH_MARKER.split(text)[1:]
+            messages = dict(zip((int(number) for number in parts[0::2]), parts[1::2]))
+            return json.dumps([{"id": number, "verdict": self.answer(messages.get(number, ""), system_prompt[:batch.start()])}
+                               for number in range(1, int(batch.group(1)) + 1)])
+        verdict = mock_verdict(text)
+        response_format = self.config["response_format"]
+        if response_format == "auto":
+            response_format = "json" if '"violation_detected"' in system_prompt else "text"
+        if response_format == "text":
+            return verdict_text(verdict)
+        if self.config["context_kb"] > 0:
+            verdict["context"] = mock_context(self.config["context_kb"])
+        return json.dumps(verdict)
+
+    async def respond(self, prompt_tokens: int, pieces: list):
+        """
+        Waits for the time to first token plus the prompt-proportional delay, then yields
+        the pieces of the answer paced at MOCK_LLM_MS_PER_OUTPUT_TOKEN.
+        """
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            first_token = self.sample_latency() + prompt_tokens * self.config["ms_per_prompt_token"] / 1000
+            self.stats["first_token_seconds"] += first_token
+            await asyncio.sleep(first_token)
+            per_token = self.config["ms_per_output_token"] / 1000
+            for piece in pieces:
+                yield piece
+                await asyncio.sleep(estimate_tokens(piece) * per_token)
+            self.stats["ok"] += 1
+        finally:
+            self.stats["in_flight"] -= 1
+
+    def metrics(self) -> dict:
+        """
+        Returns the counters with the mean time to first token, in milliseconds.
+        """
+        metrics = dict(self.stats)
+        answered = metrics.pop("first_token_seconds")
+        metrics["mean_first_token_ms"] = round(answered / metrics["ok"] * 1000, 1) if metrics["ok"] else None
+        return metrics
+
+def _severity_rank(category: str) -> int:
+    return CATEGORY_SEVERITY.index(category) if category in CATEGORY_SEVERITY else len(CATEGORY_SEVERITY)
+
+def mock_verdict(text: str) -> dict:
+    """
+    Builds an AnalysisResult-shaped verdict from the pre-screen phrases found in the text.
+    """
+    matches = get_prescreener().scan(text or "")
+    if not matches:
+        return {
+            "summary": "Routine business communication.",
+            "red_flags": [],
+            "violation_detected": False,
+            "violation_type": "None",
+            "explanation": "No statements suggesting fraud or a compliance violation were found.",
+            "recommended_action": "No action needed"
+        }
+    category = min((match["category"] for match in matches), key=_severity_rank)
+    red_flags = list(dict.fromkeys(match["text"] for match in matches))
+    return {
+        "summary": f"The message contains statements associated with {category}.",
+        "red_flags": red_flags,
+        "violation_detected": True,
+        "violation_type": category,
+        "explanation": f"The statements {', '.join(repr(flag) for flag in red_flags)} indicate {category}.",
+        "recommended_action": "Escalate to compliance team"
+    }
+
+def verdict_text(verdict: dict) -> str:
+    classification = "Suspicious activity detected" if verdict["violation_detected"] else "No suspicious activity detected"
+    return (f"Classification: {classification}\nCategory: {verdict['violation_type']}\n"
+            f"Explanation: {verdict['explanation']}")
+
+def mock_context(kilobytes: int) -> list:
+    """
+    Retrieved documents echoed under "context", about `kilobytes` KB in total.
+    """
+    count = max(kilobytes * 1000 // (len(_CONTEXT_PASSAGE) * 8 + 100), 1)
+    return [{"id": f"doc-{number}", "score": 0.83, "source": "policies/communications.pdf",
+             "text": _CONTEXT_PASSAGE * 8} for number in range(count)]
+
+def _words(text: str) -> list:
+    # The answer in word-sized pieces, each keeping its trailing whitespace, like streamed tokens.
+    return re.findall(r"\S+\s*", text) or [text]
+
+_mock = None
+
+def get_mock() -> MockLLM:
+    """
+    Returns the process-wide MockLLM, creating it on first use.
+    """
+    global _mock
+    if _mock is None:
+        _mock = MockLLM()
+    return _mock
+
+app = FastAPI(title="Mock LLM and custom API")
+
+def _rejection(status: int, retry_after, message: str) -> JSONResponse:
+    headers = {}
+    if retry_after is not None:
+        seconds = max(math.ceil(retry_after), 1)
+        headers = {"Retry-After": str(seconds), "retry-after-ms": str(int(retry_after * 1000))}
+        message = f"{message} Please retry after {seconds} seconds."
+    return JSONResponse({"error": {"code": str(status), "message": message}}, status_code=status, headers=headers)
+
+async def _admit_or_reject(mock: MockLLM):
+    rejection = mock.admit()
+    if rejection is None:
+        return None
+    status, retry_after = rejection
+    if status == 429:
+        return _rejection(429, retry_after, "Requests to the mock deployment have exceeded the rate limit.")
+    # An internal error surfaces after the model has been working for a while.
+    await asyncio.sleep(mock.sample_latency())
+    return _rejection(500, None, "The mock model failed to process the request.")
+
+@app.post("/query")
+async def query(payload: dict):
+    """
+    The custom API contract: {"tkd_name", "input", "system_prompt"} in, the answer out as
+    text or JSON, streamed word by word.
+    """
+    missing = [key for key in ("tkd_name", "input", "system_prompt") if key not in payload]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing required keys: {', '.join(missing)}")
+    mock = get_mock()
+    rejection = await _admit_or_reject(mock)
+    if rejection is not None:
+        return rejection
+    answer = mock.answer(str(payload["input"]), str(payload["system_prompt"]))
+    prompt_tokens = estimate_tokens(str(payload["input"])) + estimate_tokens(str(payload["system_prompt"]))
+    media_type = "application/json" if answer.startswith(("{", "[")) else "text/plain"
+    return StreamingResponse(mock.respond(prompt_tokens, _words(answer)), media_type=media_type)
+
+def _message_text(content) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+async def _chat_completion(request: Request, model: str):
+    body = await request.json()
+    messages = body.get("messages") or []
+    if not messages:
+        raise HTTPException(status_code=400, detail="'messages' must be a non-empty list")
+    mock = get_mock()
+    rejection = await _admit_or_reject(mock)
+    if rejection is not None:
+        return rejection
+    system_prompt = "\n".join(_message_text(m.get("content")) for m in messages if m.get("role") == "system")
+    user_text = _message_text(messages[-1].get("content"))
+    # The prompt templates end with the email between triple quotes; score only the email.
+    quoted = _QUOTED_EMAIL.search(user_text)
+    prompt = system_prompt + "\n" + user_text
+    answer = mock.answer(quoted.group(1) if quoted else user_text, prompt)
+    prompt_tokens = sum(estimate_tokens(_message_text(m.get("content"))) for m in messages)
+    completion_tokens = estimate_tokens(answer)
+    completion_id = f"chatcmpl-mock-{mock.stats['requests']}"
+    model = body.get("model") or model
+    pieces = mock.respond(prompt_tokens, _words(answer))
+
+    if body.get("stream"):
+        async def events():
+            async for piece in pieces:
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    content = "".join([piece async for piece in pieces])
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    """
+    OpenAI-compatible chat completions (openai.api_base / base_url = MOCK_LLM_URL + "/v1").
+    """
+    return await _chat_completion(request, "gpt-3.5-turbo")
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def azure_chat_completions(deployment: str, request: Request):
+    """
+    Azure OpenAI chat completions for any deployment name (api_base = MOCK_LLM_URL).
+    """
+    return await _chat_completion(request, deployment)
+
+@app.get("/mock/stats")
+async def mock_stats():
+    return {"config": get_mock().config, "stats": get_mock().metrics()}
+
+@app.put("/mock/config")
+async def mock_config(changes: dict):
+    try:
+        return get_mock().configure(**changes)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/mock/reset")
+async def mock_reset():
+    get_mock().reset()
+    return get_mock().metrics()
+
+if __name__ == "__main__":
+    # Point the analyzers at it with USE_MOCK_LLM=1 (and MOCK_LLM_URL if not on the default address).
+    uvicorn.run(app, host=MOCK_LLM_HOST, port=MOCK_LLM_PORT)
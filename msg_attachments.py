@@ -0,0 +1,119 @@
+import os
+import hashlib
+
+# Largest attachment that read_attachment will load into memory (optionally set via environment variable).
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))
+
+# OLE storages and streams of the attachments inside a .msg file.
+_ATTACHMENT_STORAGE_PREFIX = "__attach_version1.0_#"
+_ATTACHMENT_DATA_STREAM = "__substg1.0_37010102"
+_EMBEDDED_MESSAGE_STORAGE = "__substg1.0_3701000D"
+# Long filename, short filename and display name, as Unicode (001F) or 8-bit (001E) strings.
+_NAME_PROPERTIES = ("3707", "3704", "3001")
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+def _open_ole(source):
+    """
+    Opens the OLE container of a .msg file: a path, the raw bytes or a binary file-like object.
+    Only the directory is parsed; no stream is read until it is opened.
+    """
+    try:
+        import olefile
+    except ImportError:
+        raise ImportError("The olefile package (installed with extract_msg) is required to read .msg attachments. "
+                          "Install it via 'pip install extract_msg'.")
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    elif hasattr(source, "seek"):
+        source.seek(0)
+    return olefile.OleFileIO(source)
+
+def _attachment_storages(ole) -> list:
+    """
+    Returns the attachment storage names of the top-level message, in attachment order.
+    """
+    storages = {entry[0] for entry in ole.listdir(streams=False, storages=True)
+                if entry[0].startswith(_ATTACHMENT_STORAGE_PREFIX)}
+    return sorted(storages)
+
+def _attachment_name(ole, storage: str) -> str:
+    for prop in _NAME_PROPERTIES:
+        for suffix, encoding in (("001F", "utf-16-le"), ("001E", "cp1252")):
+            path = f"{storage}/__substg1.0_{prop}{suffix}"
+            if ole.exists(path):
+                name = ole.openstream(path).read().decode(encoding, errors="replace").rstrip("\x00")
+                if name:
+                    return name
+    return ""
+
+def _attachment_info(ole, storage: str, index: int, include_hashes: bool) -> dict:
+    info = {"index": index, "name": _attachment_name(ole, storage), "size": None, "sha256": None}
+    stream_path = f"{storage}/{_ATTACHMENT_DATA_STREAM}"
+    if ole.exists(stream_path):
+        info["size"] = ole.get_size(stream_path)
+        if include_hashes:
+            digest = hashlib.sha256()
+            stream = ole.openstream(stream_path)
+            for block in iter(lambda: stream.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+            info["sha256"] = digest.hexdigest()
+    return info
+
+def list_attachments(source, include_hashes: bool = True) -> list:
+    """
+    Lists the attachments of a .msg file without writing anything to disk.
+
+    The OLE directory of the file is read directly: sizes come from the directory
+    entries and hashes are computed by streaming the attachment data in blocks, so no
+    attachment is held in memory as a whole. Open the message with
+    extract_msg.Message(..., delayAttachments=True) alongside, otherwise extract_msg
+    loads every attachment itself. Embedded messages (attachments that are .msg files
+    themselves) are listed with their name only.
+
+    Args:
+        source: The .msg file as a path, bytes or a binary file-like object.
+        include_hashes (bool, optional): Whether to compute the SHA-256 of each attachment.
+
+    Returns:
+        list: One dict per attachment with keys "index", "name", "size" and "sha256".
+    """
+    ole = _open_ole(source)
+    try:
+        return [_attachment_info(ole, storage, index, include_hashes)
+                for index, storage in enumerate(_attachment_storages(ole))]
+    finally:
+        ole.close()
+
+def read_attachment(source, index: int, max_bytes: int = ATTACHMENT_MAX_BYTES) -> bytes:
+    """
+    Reads the bytes of a single attachment of a .msg file into memory, on demand.
+    The size is checked in the OLE directory before any data is read.
+
+    Args:
+        source: The .msg file as a path, bytes or a binary file-like object.
+        index (int): The attachment index as returned by list_attachments.
+        max_bytes (int, optional): Refuse to load attachments larger than this.
+
+    Returns:
+        bytes: The attachment data.
+
+    Raises:
+        IndexError: If the message has no attachment with that index.
+        ValueError: If the attachment is larger than max_bytes or is an embedded message.
+    """
+    ole = _open_ole(source)
+    try:
+        storages = _attachment_storages(ole)
+        if index < 0 or index >= len(storages):
+            raise IndexError(f"Attachment index {index} out of range ({len(storages)} attachments)")
+        stream_path = f"{storages[index]}/{_ATTACHMENT_DATA_STREAM}"
+        if not ole.exists(stream_path):
+            if ole.exists(f"{storages[index]}/{_EMBEDDED_MESSAGE_STORAGE}"):
+                raise ValueError(f"Attachment {index} is an embedded message, not binary data")
+            return b""
+        size = ole.get_size(stream_path)
+        if size > max_bytes:
+            raise ValueError(f"Attachment {index} is {size} bytes, above the {max_bytes} byte limit")
+        return ole.openstream(stream_path).read()
+    finally:
+        ole.close()
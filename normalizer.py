@@ -0,0 +1,60 @@
+import re
+
+# Runs of two or more spaces (tabs are turned into spaces first).
+_MULTI_SPACE = re.compile(r' {2,}')
+# A newline, optional whitespace, and another newline: one blank line.
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+# Separator used by format_email_bodies; it is not whitespace, so it never merges runs.
+_BATCH_SEPARATOR = '\x00'
+
+def format_email_body(body: str) -> str:
+    """
+    Formats an email body by normalizing newline characters,
+    collapsing extra spaces and newlines, and ensuring clean, human-readable text.
+
+    Steps:
+    1. Convert Windows-style newlines (\\r\\n) and stray carriage returns (\\r) into Unix-style newlines (\\n).
+    2. Collapse multiple spaces or tab characters into a single space.
+    3. Collapse multiple consecutive newline sequences into a single blank line.
+    4. Trim leading and trailing whitespace.
+
+    The output is identical to the previous format_email_body copies, but every step
+    is skipped when the body does not need it, and the remaining steps use str.replace
+    or regexes with a literal prefix, which scan in C instead of matching every space.
+
+    Args:
+        body (str): The raw email body text.
+
+    Returns:
+        str: The formatted email body.
+    """
+    if '\r' in body:
+        body = body.replace('\r\n', '\n').replace('\r', '\n')
+    if '\t' in body:
+        body = body.replace('\t', ' ')
+    if '  ' in body:
+        body = _MULTI_SPACE.sub(' ', body)
+    if '\n' in body:
+        body = _BLANK_LINES.sub('\n\n', body)
+    return body.strip()
+
+def format_email_bodies(bodies: list) -> list:
+    """
+    Formats a list of email bodies at once, e.g. all messages of a PST file.
+
+    The bodies are joined with a separator that is not whitespace, formatted in one
+    call and split again, which removes the per-call overhead for many small bodies.
+    Empty or None bodies become "".
+
+    Args:
+        bodies (list): The raw email body texts.
+
+    Returns:
+        list: The formatted bodies, in the same order.
+    """
+    texts = [body or "" for body in bodies]
+    if any(_BATCH_SEPARATOR in text for text in texts):
+        return [format_email_body(text) for text in texts]
+    joined = format_email_body(_BATCH_SEPARATOR.join(texts))
+    return [text.strip() for text in joined.split(_BATCH_SEPARATOR)]
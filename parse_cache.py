@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from eml_stream import char_budget
+
+# Location and size limit of the on-disk parse cache (optionally set via environment variables).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", os.path.join(BASE_DIR, ".cache", "parse_cache.sqlite3"))
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Bump this whenever the parser output changes so stale entries are never served.
+# 2: .msg results list their "attachments". 3: budgeted .eml bodies with a "truncated" flag.
+# 4: HTML-only bodies converted to text, with "html" conversion stats.
+PARSER_VERSION = os.getenv("PARSER_VERSION", "4")
+
+class ParseCache:
+    """
+    Persistent cache of parsed emails stored in SQLite.
+
+    Entries are keyed by the SHA-256 of the file bytes plus the parser version, the .eml
+    body budget and the parse function, so a renamed or re-uploaded file with the same
+    content is still a hit, parser modules with different output shapes never share
+    entries, and a parser upgrade or budget change invalidates everything. Once the stored payloads exceed `max_bytes`, the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = PARSE_CACHE_PATH, max_bytes: int = PARSE_CACHE_MAX_BYTES,
+                 parser_version: str = PARSER_VERSION):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.parser_version = parser_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parsed_emails ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON parsed_emails (last_access)")
+        self._conn.commit()
+
+    def key_for(self, file_path: str, parser: str = "") -> str:
+        """
+        Returns the cache key for a file: SHA-256 of its bytes plus the parser version, the
+        effective EML_MAX_CHARS/EML_MAX_TOKENS budget (bodies are cut at it) and the name of
+        the parse function (e.g. "parser4.parse_email").
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return f"{self.parser_version}:{char_budget()}:{parser}:{digest.hexdigest()}"
+
+    def get(self, key: str):
+        """
+        Returns the cached {"metadata", "body"} dict for the key, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM parsed_emails WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE parsed_emails SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, email_data: dict) -> str:
+        """
+        Stores a parsed email and evicts least recently used entries above the size limit.
+        Values that are not JSON serializable (e.g. datetime dates) are stored as strings.
+
+        Returns:
+            str: The stored JSON payload, which is what get() will return decoded.
+        """
+        payload = json.dumps(email_data, default=str)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return payload
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed_emails (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+        return payload
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parsed_emails").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM parsed_emails ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM parsed_emails WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def parse(self, parse_fn, file_path: str) -> dict:
+        """
+        Returns the parsed email for file_path, calling parse_fn(file_path) only on a miss.
+
+        Only single-email results ({"metadata", "body"}) are cached; multi-email results
+        such as PST files are passed through unchanged. A cached result is returned as
+        decoded from JSON on a miss too (dates as strings), so both paths give the same types.
+        """
+        key = self.key_for(file_path, f"{parse_fn.__module__}.{parse_fn.__qualname__}")
+        cached = self.get(key)
+        if cached is not None:
+            print(f"DEBUG: Parse cache hit for file: {file_path}")
+            return cached
+        email_data = parse_fn(file_path)
+        if isinstance(email_data, dict) and "emails" not in email_data:
+            return json.loads(self.put(key, email_data))
+        return email_data
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parsed_emails"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "parser_version": self.parser_version
+        }
+
+_parse_cache = None
+
+def get_parse_cache() -> ParseCache:
+    """
+    Returns the process-wide ParseCache, creating it on first use.
+    """
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache()
+    return _parse_cache
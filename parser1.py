@@ -1,10 +1,13 @@
 import email
-from email import policy
-from email.parser import BytesParser
+from eml_stream import read_eml_body
+from msg_attachments import list_attachments
+from html_text import convert_html_body
 
-def parse_email(file_path: str) -> dict:
+def parse_email(file_path: str, extract_attachments: bool = False) -> dict:
     """
     Parses an email file (either Outlook .msg or MIME .eml format) and extracts metadata and text content.
+    For .msg files, attachments are only listed (name, size, SHA-256); they are written to the
+    current working directory only when extract_attachments=True.
     """
     if file_path.lower().endswith(".msg"):
         try:
@@ -12,9 +15,10 @@ def parse_email(file_path: str) -> dict:
         except ImportError:
             raise ImportError("The extract_msg package is required to parse Outlook .msg files. Install it via 'pip install extract_msg'.")
         
-        # Parse the Outlook .msg file
-        msg = extract_msg.Message(file_path)
-        msg.extract()  # Optionally extract attachments or additional content.
+        # Parse the Outlook .msg file; attachments are not loaded until extracted.
+        msg = extract_msg.Message(file_path, delayAttachments=True)
+        if extract_attachments:
+            msg.extract()  # Writes attachments to the current working directory.
         metadata = {
             "From": msg.sender,
             "To": msg.to,
@@ -22,15 +26,15 @@ def parse_email(file_path: str) -> dict:
             "Bcc": "",  # Bcc is generally not available in .msg files.
             "Date": msg.date
         }
-        # Prefer the plain text body; fall back to HTML if necessary.
+        # Prefer the plain text body; fall back to the text of the HTML body if necessary.
         body = msg.body
+        html_stats = None
         if not body and msg.htmlBody:
-            body = msg.htmlBody
-        return {"metadata": metadata, "body": body}
+            body, html_stats = convert_html_body(msg.htmlBody)
+        return {"metadata": metadata, "body": body, "html": html_stats, "attachments": list_attachments(file_path)}
     else:
         # Assume it's a MIME formatted (.eml) file.
-        with open(file_path, 'rb') as f:
-            msg = BytesParser(policy=policy.default).parse(f)
+        msg, body, truncated = read_eml_body(file_path)
         
         metadata = {
             "From": msg.get("From", ""),
@@ -40,14 +44,4 @@ def parse_email(file_path: str) -> dict:
             "Date": msg.get("Date", "")
         }
         
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_disposition = part.get("Content-Disposition", "")
-                # Only extract text if it is not an attachment.
-                if part.get_content_type() == "text/plain" and "attachment" not in content_disposition:
-                    body += part.get_content()
-        else:
-            body = msg.get_content()
-        
-        return {"metadata": metadata, "body": body}
+        return {"metadata": metadata, "body": body, "truncated": truncated}
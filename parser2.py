@@ -1,15 +1,17 @@
-from email import policy
-from email.parser import BytesParser
+from eml_stream import read_eml_body
 import os
+from msg_attachments import list_attachments
+from html_text import convert_html_body
 
-def parse_email(file_path: str) -> dict:
+def parse_email(file_path: str, extract_attachments: bool = False) -> dict:
     file_path = os.path.abspath(file_path)
     file_lower = file_path.lower()
 
     if file_lower.endswith(".msg"):
         import extract_msg
-        msg = extract_msg.Message(file_path)
-        msg.extract()
+        msg = extract_msg.Message(file_path, delayAttachments=True)
+        if extract_attachments:
+            msg.extract()
 
         metadata = {
             "From": msg.sender,
@@ -19,12 +21,16 @@ def parse_email(file_path: str) -> dict:
             "Subject": msg.subject,
             "Date": msg.date
         }
-        body = msg.body or msg.htmlBody or ""
-        return {"metadata": metadata, "body": body.strip()}
+        body = msg.body
+        html_stats = None
+        if not body and msg.htmlBody:
+            body, html_stats = convert_html_body(msg.htmlBody)
+        body = body or ""
+        return {"metadata": metadata, "body": body.strip(), "html": html_stats,
+                "attachments": list_attachments(file_path)}
 
     elif file_lower.endswith(".eml"):
-        with open(file_path, 'rb') as f:
-            msg = BytesParser(policy=policy.default).parse(f)
+        msg, body, truncated = read_eml_body(file_path)
 
         metadata = {
             "From": msg.get("From", ""),
@@ -35,16 +41,7 @@ def parse_email(file_path: str) -> dict:
             "Date": msg.get("Date", "")
         }
 
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_disposition = part.get("Content-Disposition", "")
-                if part.get_content_type() == "text/plain" and "attachment" not in content_disposition:
-                    body += part.get_content()
-        else:
-            body = msg.get_content()
-
-        return {"metadata": metadata, "body": body.strip()}
+        return {"metadata": metadata, "body": body.strip(), "truncated": truncated}
 
     else:
         raise ValueError("Unsupported file type. Supported: .eml, .msg")
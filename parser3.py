@@ -1,13 +1,13 @@
 import email
-from email import policy
-from email.parser import BytesParser
+from eml_stream import read_eml_body
+from html_text import convert_html_body
 
-def parse_eml(file_path: str) -> dict:
+def parse_eml(file_path: str, max_chars: int = None, max_tokens: int = None) -> dict:
     """
-    Parses a MIME-formatted email (.eml) and returns a dictionary with metadata and body.
+    Parses a MIME-formatted email (.eml) and returns a dictionary with metadata, body and
+    a "truncated" flag. The body is read incrementally up to the max_chars / max_tokens budget.
     """
-    with open(file_path, 'rb') as f:
-        msg = BytesParser(policy=policy.default).parse(f)
+    msg, body, truncated = read_eml_body(file_path, max_chars=max_chars, max_tokens=max_tokens)
 
     metadata = {
         "From": msg.get("From", ""),
@@ -16,19 +16,12 @@ def parse_eml(file_path: str) -> dict:
         "Bcc": msg.get("Bcc", ""),
         "Date": msg.get("Date", "")
     }
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_disposition = part.get("Content-Disposition", "")
-            if part.get_content_type() == "text/plain" and "attachment" not in content_disposition:
-                body += part.get_content()
-    else:
-        body = msg.get_content()
-    return {"metadata": metadata, "body": body}
+    return {"metadata": metadata, "body": body, "truncated": truncated}
 
-def parse_pst(file_path: str) -> list:
+def iter_pst(file_path: str):
     """
-    Parses a PST file and returns a list of email dictionaries (each with metadata and body).
+    Lazily walks a PST file and yields one email dictionary at a time (with "folder",
+    "index", "metadata" and "body" keys) instead of building the full list in memory.
     Requires the pypff module (Python bindings for libpff).
     """
     try:
@@ -38,13 +31,13 @@ def parse_pst(file_path: str) -> list:
 
     pst_file = pypff.file()
     pst_file.open(file_path)
-    emails = []
 
-    def recursive_folder(folder):
+    def walk_folder(folder, folder_path):
         # Process any sub-folders first.
         for i in range(folder.number_of_sub_folders):
             sub_folder = folder.get_sub_folder(i)
-            recursive_folder(sub_folder)
+            sub_name = getattr(sub_folder, "name", None) or str(i)
+            yield from walk_folder(sub_folder, f"{folder_path}/{sub_name}")
         # Process emails in this folder.
         for j in range(folder.number_of_sub_messages):
             message = folder.get_sub_message(j)
@@ -58,25 +51,36 @@ def parse_pst(file_path: str) -> list:
             }
             # Attempt to obtain the plain text body.
             body = ""
+            html_stats = None
             if hasattr(message, "plain_text_body") and message.plain_text_body:
                 body = message.plain_text_body
             elif hasattr(message, "html_body") and message.html_body:
-                body = message.html_body
-            emails.append({"metadata": metadata, "body": body})
+                body, html_stats = convert_html_body(message.html_body)
+            yield {"folder": folder_path or "/", "index": j, "metadata": metadata, "body": body, "html": html_stats}
+
+    try:
+        yield from walk_folder(pst_file.get_root_folder(), "")
+    finally:
+        pst_file.close()
 
-    root_folder = pst_file.get_root_folder()
-    recursive_folder(root_folder)
-    pst_file.close()
-    return emails
+def parse_pst(file_path: str) -> list:
+    """
+    Parses a PST file and returns a list of email dictionaries (each with metadata and body).
+    Requires the pypff module (Python bindings for libpff). Use iter_pst for large mailboxes.
+    """
+    return list(iter_pst(file_path))
 
-def parse_email(file_path: str) -> dict:
+def parse_email(file_path: str, lazy: bool = False) -> dict:
     """
     Dispatch function: Parses the provided file based on extension.
       - For .eml files, returns a dict with keys "metadata" and "body".
       - For .pst files, returns a dict with key "emails" containing a list of email dicts.
+        With lazy=True, "emails" is an iterator from iter_pst instead of a list.
     """
     lower_path = file_path.lower()
     if lower_path.endswith(".pst"):
+        if lazy:
+            return {"emails": iter_pst(file_path)}
         return {"emails": parse_pst(file_path)}
     elif lower_path.endswith(".eml"):
         return parse_eml(file_path)
@@ -1,13 +1,45 @@
 import email
 from email import policy
-from email.parser import BytesParser
+from email.parser import BytesHeaderParser
+from msg_attachments import list_attachments
+from email_source import is_path, msg_source, open_binary, source_filename
+from eml_stream import read_eml_body
+from html_text import convert_html_body
 
-def parse_eml(file_path: str) -> dict:
+def _read_eml_headers(source) -> dict:
     """
-    Parses a MIME formatted email (.eml) and returns a dict with metadata and body.
+    Reads only the header block of a .eml file (up to the first blank line) and returns
+    the header metadata, without reading or decoding any MIME part.
     """
-    with open(file_path, 'rb') as f:
-        msg = BytesParser(policy=policy.default).parse(f)
+    header_lines = []
+    with open_binary(source) as f:
+        for line in f:
+            if line in (b"\r\n", b"\n"):
+                break
+            header_lines.append(line)
+    msg = BytesHeaderParser(policy=policy.default).parsebytes(b"".join(header_lines))
+    return {
+        "From": msg.get("From", ""),
+        "To": msg.get("To", ""),
+        "Cc": msg.get("Cc", ""),
+        "Bcc": msg.get("Bcc", ""),
+        "Date": msg.get("Date", ""),
+        "Subject": msg.get("Subject", "")
+    }
+
+def parse_eml(source, headers_only: bool = False, max_chars: int = None, max_tokens: int = None) -> dict:
+    """
+    Parses a MIME formatted email (.eml) and returns a dict with metadata, body and a
+    "truncated" flag. The source can be a file path, bytes, a memoryview or a binary
+    file-like object. The body is read incrementally and stops at the max_chars /
+    max_tokens budget (see eml_stream.read_eml_body).
+    With headers_only=True, only the header block is parsed and a dict with just
+    "metadata" (including "Subject") is returned.
+    """
+    if headers_only:
+        return {"metadata": _read_eml_headers(source)}
+
+    msg, body, truncated = read_eml_body(source, max_chars=max_chars, max_tokens=max_tokens)
 
     metadata = {
         "From": msg.get("From", ""),
@@ -17,20 +49,19 @@ def parse_eml(file_path: str) -> dict:
         "Date": msg.get("Date", "")
     }
 
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_disposition = part.get("Content-Disposition", "")
-            if part.get_content_type() == "text/plain" and "attachment" not in content_disposition:
-                body += part.get_content()
-    else:
-        body = msg.get_content()
+    return {"metadata": metadata, "body": body, "truncated": truncated}
 
-    return {"metadata": metadata, "body": body}
-
-def parse_msg(file_path: str) -> dict:
+def parse_msg(source, extract_attachments: bool = False, headers_only: bool = False) -> dict:
     """
-    Parses an Outlook email (.msg) and returns a dict with metadata and body.
+    Parses an Outlook email (.msg) and returns a dict with metadata, body and attachments,
+    plus "html": the convert_html_body stats when the body came from the HTML part (else None).
+    The source can be a file path, bytes, a memoryview or a binary file-like object;
+    in-memory sources are read by the OLE parser directly, without a temporary file.
+    Attachments are listed (name, size, SHA-256) without touching the filesystem; use
+    msg_attachments.read_attachment to load one on demand, or extract_attachments=True
+    to write them all to the current working directory.
+    With headers_only=True, only the header property streams are read (attachments are
+    not loaded and the body is never decoded) and a dict with just "metadata" is returned.
     Requires the extract_msg package.
     """
     try:
@@ -38,8 +69,22 @@ def parse_msg(file_path: str) -> dict:
     except ImportError:
         raise ImportError("The extract_msg package is required to parse .msg files. Install it via 'pip install extract_msg'.")
 
-    msg = extract_msg.Message(file_path)
-    msg.extract()  # Optional: extracts attachments if needed.
+    if headers_only:
+        msg = extract_msg.Message(msg_source(source), delayAttachments=True)
+        return {"metadata": {
+            "From": msg.sender,
+            "To": msg.to,
+            "Cc": msg.cc,
+            "Bcc": "",  # .msg files typically do not include Bcc information.
+            "Date": msg.date,
+            "Subject": msg.subject
+        }}
+
+    # Attachments are only listed from the OLE directory; extract_msg loads them only if extracted.
+    source = msg_source(source)
+    msg = extract_msg.Message(source, delayAttachments=True)
+    if extract_attachments:
+        msg.extract()  # Writes attachments to the current working directory.
     metadata = {
         "From": msg.sender,
         "To": msg.to,
@@ -48,15 +93,49 @@ def parse_msg(file_path: str) -> dict:
         "Date": msg.date
     }
     body = msg.body
-    # If plain text body is empty, fallback to the HTML body.
+    html_stats = None
+    # If plain text body is empty, fall back to the text of the HTML body.
     if not body and msg.htmlBody:
-        body = msg.htmlBody
-    return {"metadata": metadata, "body": body}
+        body, html_stats = convert_html_body(msg.htmlBody)
+    return {"metadata": metadata, "body": body, "html": html_stats, "attachments": list_attachments(source)}
 
-def parse_pst(file_path: str) -> list:
+def _pst_message_to_dict(message, headers_only: bool = False) -> dict:
     """
-    Parses a PST file and returns a list of email dictionaries (each with metadata and body).
+    Converts a single pypff message into a dict with metadata, body and "html" (the
+    convert_html_body stats when the body came from the HTML part, else None).
+    With headers_only=True, only the header properties are fetched (plus "Subject")
+    and the dict has no "body" key.
+    """
+    metadata = {
+        "From": getattr(message, "sender_name", ""),
+        "To": getattr(message, "display_to", ""),
+        "Cc": getattr(message, "display_cc", ""),
+        "Bcc": "",  # Bcc is generally not available.
+        "Date": str(message.client_submit_time) if hasattr(message, "client_submit_time") and message.client_submit_time else ""
+    }
+    if headers_only:
+        metadata["Subject"] = getattr(message, "subject", "") or ""
+        return {"metadata": metadata}
+    body = ""
+    html_stats = None
+    if hasattr(message, "plain_text_body") and message.plain_text_body:
+        body = message.plain_text_body
+    elif hasattr(message, "html_body") and message.html_body:
+        body, html_stats = convert_html_body(message.html_body)
+    return {"metadata": metadata, "body": body, "html": html_stats}
+
+def iter_pst(file_path: str, headers_only: bool = False):
+    """
+    Lazily walks a PST file and yields one email dict at a time, so the whole
+    mailbox never has to be held in memory. Folders are visited in the same
+    order as parse_pst (sub-folders first, then the folder's own messages).
     Requires the pypff module.
+
+    Each yielded dict has the keys:
+      - "folder": The folder path inside the PST, e.g. "/Top of Personal Folders/Inbox".
+      - "index": The index of the message within its folder.
+      - "metadata" and "body": As returned by parse_eml/parse_msg.
+    With headers_only=True, message bodies are never fetched (see _pst_message_to_dict).
     """
     try:
         import pypff
@@ -65,48 +144,183 @@ def parse_pst(file_path: str) -> list:
 
     pst_file = pypff.file()
     pst_file.open(file_path)
-    emails = []
 
-    def recursive_folder(folder):
-        # Process sub-folders recursively.
+    def walk_folder(folder, folder_path):
+        # Walk sub-folders first, then yield the messages of this folder.
         for i in range(folder.number_of_sub_folders):
             sub_folder = folder.get_sub_folder(i)
-            recursive_folder(sub_folder)
-        # Process messages in the current folder.
+            sub_name = getattr(sub_folder, "name", None) or str(i)
+            yield from walk_folder(sub_folder, f"{folder_path}/{sub_name}")
         for j in range(folder.number_of_sub_messages):
-            message = folder.get_sub_message(j)
-            metadata = {
-                "From": getattr(message, "sender_name", ""),
-                "To": getattr(message, "display_to", ""),
-                "Cc": getattr(message, "display_cc", ""),
-                "Bcc": "",  # Bcc is generally not available.
-                "Date": str(message.client_submit_time) if hasattr(message, "client_submit_time") and message.client_submit_time else ""
-            }
-            body = ""
-            if hasattr(message, "plain_text_body") and message.plain_text_body:
-                body = message.plain_text_body
-            elif hasattr(message, "html_body") and message.html_body:
-                body = message.html_body
-            emails.append({"metadata": metadata, "body": body})
-
-    root_folder = pst_file.get_root_folder()
-    recursive_folder(root_folder)
-    pst_file.close()
+            email_item = _pst_message_to_dict(folder.get_sub_message(j), headers_only)
+            email_item["folder"] = folder_path or "/"
+            email_item["index"] = j
+            yield email_item
+
+    try:
+        yield from walk_folder(pst_file.get_root_folder(), "")
+    finally:
+        pst_file.close()
+
+def list_pst_folders(file_path: str) -> list:
+    """
+    Enumerates the folder tree of a PST file once and returns one entry per folder,
+    in the same order iter_pst visits them. Each entry is a tuple of
+    (index_path, folder_path, message_count), where index_path is the sequence of
+    sub-folder indexes leading from the root folder to that folder.
+    Requires the pypff module.
+    """
+    try:
+        import pypff
+    except ImportError:
+        raise ImportError("The pypff module is required to parse PST files. Please install it.")
+
+    pst_file = pypff.file()
+    pst_file.open(file_path)
+    folders = []
+
+    def walk_folder(folder, index_path, folder_path):
+        for i in range(folder.number_of_sub_folders):
+            sub_folder = folder.get_sub_folder(i)
+            sub_name = getattr(sub_folder, "name", None) or str(i)
+            walk_folder(sub_folder, index_path + (i,), f"{folder_path}/{sub_name}")
+        folders.append((index_path, folder_path or "/", folder.number_of_sub_messages))
+
+    try:
+        walk_folder(pst_file.get_root_folder(), (), "")
+    finally:
+        pst_file.close()
+    return folders
+
+# Per-process PST handle used by the parallel extraction workers.
+_worker_pst_file = None
+
+def _open_pst_worker(file_path: str):
+    """
+    Process pool initializer: every worker opens its own pypff.file handle,
+    since pypff handles cannot be shared between processes. The handle is closed
+    when the worker exits.
+    """
+    global _worker_pst_file
+    import pypff
+    from multiprocessing import util
+    _worker_pst_file = pypff.file()
+    _worker_pst_file.open(file_path)
+    # atexit handlers do not run in forked pool workers (they end with os._exit);
+    # multiprocessing finalizers with an exit priority run with every start method.
+    util.Finalize(None, _close_pst_worker, exitpriority=10)
+
+def _close_pst_worker():
+    global _worker_pst_file
+    if _worker_pst_file is not None:
+        _worker_pst_file.close()
+        _worker_pst_file = None
+
+def _extract_pst_range(work_item: tuple) -> list:
+    """
+    Extracts messages [start, stop) of one folder using the worker's own PST handle.
+    """
+    index_path, folder_path, start, stop, headers_only = work_item
+    folder = _worker_pst_file.get_root_folder()
+    for i in index_path:
+        folder = folder.get_sub_folder(i)
+    emails = []
+    for j in range(start, stop):
+        email_item = _pst_message_to_dict(folder.get_sub_message(j), headers_only)
+        email_item["folder"] = folder_path
+        email_item["index"] = j
+        emails.append(email_item)
     return emails
 
-def parse_email(file_path: str) -> dict:
+def iter_pst_parallel(file_path: str, workers: int = None, chunk_size: int = 200, headers_only: bool = False):
+    """
+    Extracts a PST file with a pool of worker processes and yields the emails in the
+    same deterministic order as iter_pst.
+
+    The folder tree is enumerated once, then every folder is split into message
+    index ranges of at most `chunk_size` messages, so a single huge folder is
+    spread across workers just like many small ones.
+
+    Args:
+        file_path (str): The path to the .pst file.
+        workers (int, optional): Number of worker processes; defaults to os.cpu_count().
+        chunk_size (int, optional): Maximum number of messages per work item.
+        headers_only (bool, optional): Fetch only the header properties of each message.
+
+    Yields:
+        dict: Email dicts with "folder", "index", "metadata" and "body" keys.
+    """
+    import os
+    import itertools
+    import collections
+    from concurrent.futures import ProcessPoolExecutor
+
+    work_items = []
+    for index_path, folder_path, message_count in list_pst_folders(file_path):
+        for start in range(0, message_count, chunk_size):
+            work_items.append((index_path, folder_path, start, min(start + chunk_size, message_count), headers_only))
+    if not work_items:
+        return
+
+    workers = min(workers or os.cpu_count() or 1, len(work_items))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_pst_worker, initargs=(file_path,)) as executor:
+        # At most 2 x workers ranges are submitted ahead of the consumer, so finished ranges
+        # cannot pile up in memory while a slow consumer is still at the first ones.
+        # Results are yielded oldest first, which keeps the output deterministic.
+        remaining = iter(work_items)
+        window = collections.deque(executor.submit(_extract_pst_range, item)
+                                   for item in itertools.islice(remaining, 2 * workers))
+        while window:
+            emails = window.popleft().result()
+            next_item = next(remaining, None)
+            if next_item is not None:
+                window.append(executor.submit(_extract_pst_range, next_item))
+            yield from emails
+
+def parse_pst_parallel(file_path: str, workers: int = None, chunk_size: int = 200, headers_only: bool = False) -> list:
+    """
+    Parses a PST file with multiple worker processes and returns the same list as parse_pst.
+    """
+    return list(iter_pst_parallel(file_path, workers=workers, chunk_size=chunk_size, headers_only=headers_only))
+
+def parse_pst(file_path: str, headers_only: bool = False) -> list:
+    """
+    Parses a PST file and returns a list of email dictionaries (each with metadata and body).
+    Requires the pypff module. Use iter_pst for large mailboxes.
+    """
+    return list(iter_pst(file_path, headers_only=headers_only))
+
+def parse_email(source, lazy: bool = False, workers: int = 0, filename: str = None,
+                headers_only: bool = False) -> dict:
     """
     Dispatch function that inspects the file extension and calls the appropriate parsing function:
       - For .eml, returns a dict with metadata and body.
       - For .msg, returns a dict with metadata and body.
       - For .pst, returns a dict with key "emails" containing a list of email dicts.
+        With lazy=True, "emails" is an iterator from iter_pst instead of a list.
+        With workers > 1, the PST is extracted by that many worker processes.
+
+    The source is usually a file path. .eml and .msg files can also be parsed straight
+    from memory (bytes, memoryview or a file-like object), e.g. an uploaded file, in
+    which case `filename` is used to detect the format.
+
+    With headers_only=True, only From/To/Cc/Date/Subject are read, which is much faster
+    for listing and triage of large, attachment-heavy messages.
     """
-    lower_path = file_path.lower()
+    lower_path = source_filename(source, filename).lower()
     if lower_path.endswith(".pst"):
-        return {"emails": parse_pst(file_path)}
+        if not is_path(source):
+            raise ValueError("PST files can only be parsed from a file path.")
+        file_path = source
+        if workers and workers > 1:
+            emails = iter_pst_parallel(file_path, workers=workers, headers_only=headers_only)
+            return {"emails": emails if lazy else list(emails)}
+        if lazy:
+            return {"emails": iter_pst(file_path, headers_only=headers_only)}
+        return {"emails": parse_pst(file_path, headers_only=headers_only)}
     elif lower_path.endswith(".eml"):
-        return parse_eml(file_path)
+        return parse_eml(source, headers_only=headers_only)
     elif lower_path.endswith(".msg"):
-        return parse_msg(file_path)
+        return parse_msg(source, headers_only=headers_only)
     else:
         raise ValueError("Unsupported file format. Only .eml, .msg, and .pst files are supported.")
@@ -1,25 +1,14 @@
-import re
 import datetime
+from normalizer import format_email_body
+from email_source import describe_source, msg_source, source_filename
+from html_text import convert_html_body
 
-def format_email_body(body: str) -> str:
-    """
-    Formats an email body by normalizing newline characters,
-    collapsing extra spaces and newlines, and ensuring clean, human-readable text.
-    """
-    # Normalize newlines to Unix-style.
-    body = body.replace('\r\n', '\n').replace('\r', '\n')
-    # Collapse multiple spaces or tabs into a single space.
-    body = re.sub(r'[ \t]+', ' ', body)
-    # Collapse multiple newlines into a single blank line.
-    body = re.sub(r'\n\s*\n', '\n\n', body)
-    return body.strip()
-
-def parse_msg(file_path: str) -> dict:
+def parse_msg(source) -> dict:
     """
     Parses an Outlook .msg file using the extract_msg package and returns a dictionary
     with the extracted metadata and the formatted email body.
     """
-    print(f"DEBUG: Starting parse_msg for file: {file_path}")
+    print(f"DEBUG: Starting parse_msg for file: {describe_source(source)}")
     
     try:
         import extract_msg
@@ -29,7 +18,7 @@ def parse_msg(file_path: str) -> dict:
         raise ImportError(error_msg) from e
 
     try:
-        msg = extract_msg.Message(file_path)
+        msg = extract_msg.Message(msg_source(source), delayAttachments=True)
     except Exception as e:
         print(f"ERROR reading .msg file: {e}")
         raise e
@@ -53,25 +42,26 @@ def parse_msg(file_path: str) -> dict:
     print(f"DEBUG: Final metadata: {metadata}")
 
     body = msg.body
-    if not body and hasattr(msg, "htmlBody"):
-        body = msg.htmlBody
+    html_stats = None
+    if not body and hasattr(msg, "htmlBody") and msg.htmlBody:
+        body, html_stats = convert_html_body(msg.htmlBody)
         print("DEBUG: Using HTML body as fallback for .msg file.")
     else:
         print(f"DEBUG: Raw MSG body length: {len(body) if body else 0}")
 
     formatted_body = format_email_body(body) if body else ""
     print(f"DEBUG: Formatted MSG body length: {len(formatted_body)}")
-    print(f"DEBUG: Completed parse_msg for file: {file_path}")
-    return {"metadata": metadata, "body": formatted_body}
+    print(f"DEBUG: Completed parse_msg for file: {describe_source(source)}")
+    return {"metadata": metadata, "body": formatted_body, "html": html_stats}
 
-def parse_email(file_path: str) -> dict:
+def parse_email(source, filename: str = None) -> dict:
     """
     Dispatch function for parsing a file.
     Since we now handle only .msg files, this calls parse_msg.
     """
-    print(f"DEBUG: In parse_email with file: {file_path}")
-    if file_path.lower().endswith(".msg"):
-        return parse_msg(file_path)
+    print(f"DEBUG: In parse_email with file: {describe_source(source)}")
+    if source_filename(source, filename).lower().endswith(".msg"):
+        return parse_msg(source)
     else:
         error_msg = "Unsupported file format. Only .msg files are supported."
         print(f"ERROR: {error_msg}")
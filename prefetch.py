@@ -0,0 +1,48 @@
+import queue
+import threading
+
+def prefetch(iterable, maxsize: int = 8):
+    """
+    Runs the given iterator in a background thread and yields its items through a
+    bounded queue. This lets extraction of the next messages overlap with the
+    analysis of the current one while keeping at most `maxsize` items in memory.
+    Exceptions raised by the iterator are re-raised in the consumer.
+    """
+    done = object()
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            # Closing a generator runs its cleanup, e.g. closing the PST file.
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            items.put(done)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early.
+        stop.set()
+        while worker.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
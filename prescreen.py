@@ -0,0 +1,253 @@
+import os
+import re
+import time
+import random
+import threading
+
+from chunking import CATEGORY_SEVERITY
+
+# Rules file, pipeline mode and LLM sample rate of the pre-screen (optionally set via environment variables).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRESCREEN_RULES_PATH = os.getenv("PRESCREEN_RULES_PATH", os.path.join(BASE_DIR, "prescreen_rules.txt"))
+# "llm": every body goes to the LLM (matches are only reported).
+# "prescreen": only bodies with a match, plus a random sample of the rest, go to the LLM.
+# "rules": no LLM calls; the verdict comes from the rules alone.
+PRESCREEN_MODE = os.getenv("PRESCREEN_MODE", "llm").lower()
+PRESCREEN_SAMPLE_RATE = float(os.getenv("PRESCREEN_SAMPLE_RATE", "0.05"))
+
+PRESCREEN_MODES = ("llm", "prescreen", "rules")
+
+_WORD = re.compile(r"\w+")
+# ASCII characters that separate words, and the common non-ASCII ones in Outlook bodies.
+_ASCII_SEPARATORS = {code: " " for code in range(128) if not (chr(code).isalnum() or chr(code) == "_")}
+_UNICODE_SEPARATORS = "\u2018\u2019\u201c\u201d\u2013\u2014\u2026\u00a0"
+
+# Aggregate counters across all bodies screened by this process.
+PRESCREEN_METRICS = {"screened": 0, "matched": 0, "sampled": 0, "skipped_llm": 0, "scan_seconds": 0.0}
+# Bodies are screened concurrently in the bulk worker threads.
+_metrics_lock = threading.Lock()
+
+def load_rules(path: str = PRESCREEN_RULES_PATH) -> dict:
+    """
+    Reads a rules file: "[Category]" lines start a category, every other non-empty,
+    non-comment line is a trigger phrase of the current category.
+
+    Returns:
+        dict: category -> list of phrases, in file order.
+
+    Raises:
+        ValueError: If a phrase appears before the first category.
+    """
+    rules = {}
+    category = None
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                category = line[1:-1].strip()
+                rules.setdefault(category, [])
+            elif category is None:
+                raise ValueError(f"{path}:{number}: phrase outside of a [Category] section")
+            else:
+                rules[category].append(line)
+    return rules
+
+def _words(text: str) -> tuple:
+    return tuple(_WORD.findall(text.lower()))
+
+def _word_set(text: str) -> set:
+    # The lower-cased words of the text; a C-speed path for (mostly) ASCII text.
+    lower = text.lower()
+    for separator in _UNICODE_SEPARATORS:
+        if separator in lower:
+            lower = lower.replace(separator, " ")
+    if lower.isascii():
+        return set(lower.translate(_ASCII_SEPARATORS).split())
+    return set(_WORD.findall(lower))
+
+def _phrase_pattern(words: tuple) -> str:
+    # Words separated by any run of spaces or punctuation ("there's", "there’s", "risk - free").
+    return r"\W+".join(re.escape(word) for word in words)
+
+class Prescreener:
+    """
+    Scores bodies against the trigger phrases of every category.
+
+    All phrases are compiled into one case-insensitive regex that matches them as
+    whole word sequences, with any spaces or punctuation between the words (curly
+    apostrophes, dashes, line breaks). Most bodies never reach the regex: the body's
+    set of words is built at C speed and a phrase is only possible if all of its
+    words are in that set, so a body without candidates costs a few set checks.
+    """
+
+    def __init__(self, rules: dict, sample_rate: float = PRESCREEN_SAMPLE_RATE, seed=None):
+        self.rules = rules
+        self.sample_rate = sample_rate
+        self._random = random.Random(seed)
+        self._lookup = {}  # phrase words -> (category, phrase)
+        for category, phrases in rules.items():
+            for phrase in phrases:
+                words = _words(phrase)
+                if words:
+                    self._lookup.setdefault(words, (category, phrase))
+        # A phrase can only occur in a body that contains all of its words.
+        self._required = [frozenset(words) for words in self._lookup]
+        alternation = "|".join(_phrase_pattern(words) for words in sorted(self._lookup, key=len, reverse=True))
+        self._pattern = re.compile(rf"\b(?:{alternation or '(?!)'})\b", re.IGNORECASE)
+
+    def may_match(self, text: str) -> bool:
+        """
+        Returns False if no phrase can occur in the text because, for every phrase,
+        at least one of its words is missing. Never returns False for a text that matches.
+        """
+        words = _word_set(text or "")
+        return any(required <= words for required in self._required)
+
+    def scan(self, text: str) -> list:
+        """
+        Returns every phrase match in the text as a dict with category, phrase,
+        start and end (character offsets in the text) and the matched text.
+        """
+        matches = []
+        if not self.may_match(text):
+            return matches
+        for match in self._pattern.finditer(text):
+            category, phrase = self._lookup.get(_words(match.group(0)), ("Unknown", match.group(0)))
+            matches.append({
+                "category": category,
+                "phrase": phrase,
+                "start": match.start(),
+                "end": match.end(),
+                "text": match.group(0)
+            })
+        return matches
+
+    def score(self, text: str) -> dict:
+        """
+        Scans the text and summarizes the result.
+
+        Returns:
+            dict: "matched", the most severe matched "category" (or "None"), per-category
+            match "counts", the "matches" with their spans and the scan time in "elapsed_us".
+        """
+        start = time.perf_counter()
+        matches = self.scan(text)
+        elapsed = time.perf_counter() - start
+        counts = {}
+        for match in matches:
+            counts[match["category"]] = counts.get(match["category"], 0) + 1
+        with _metrics_lock:
+            PRESCREEN_METRICS["screened"] += 1
+            PRESCREEN_METRICS["matched"] += bool(matches)
+            PRESCREEN_METRICS["scan_seconds"] += elapsed
+        return {
+            "matched": bool(matches),
+            "category": min(counts, key=_severity_rank) if counts else "None",
+            "counts": counts,
+            "matches": matches,
+            "elapsed_us": round(elapsed * 1_000_000, 1)
+        }
+
+    def route(self, screen: dict, mode: str = None) -> dict:
+        """
+        Decides whether a scored body goes to the LLM in the given mode and records
+        the decision ("mode", "sent_to_llm" and "reason") in the screen dict.
+
+        Raises:
+            ValueError: If the mode is not one of PRESCREEN_MODES.
+        """
+        mode = (mode or PRESCREEN_MODE).lower()
+        if mode not in PRESCREEN_MODES:
+            raise ValueError(f"Unknown pre-screen mode {mode!r}; expected one of {', '.join(PRESCREEN_MODES)}")
+        if mode == "llm":
+            sent, reason = True, "llm mode"
+        elif mode == "rules":
+            sent, reason = False, "rules mode"
+        elif screen["matched"]:
+            sent, reason = True, "matched"
+        elif self._random.random() < self.sample_rate:
+            sent, reason = True, "sampled"
+        else:
+            sent, reason = False, "no match"
+        with _metrics_lock:
+            PRESCREEN_METRICS["sampled"] += reason == "sampled"
+            PRESCREEN_METRICS["skipped_llm"] += not sent
+        screen.update({"mode": mode, "sent_to_llm": sent, "reason": reason})
+        return screen
+
+def _severity_rank(category: str) -> int:
+    return CATEGORY_SEVERITY.index(category) if category in CATEGORY_SEVERITY else len(CATEGORY_SEVERITY)
+
+def rules_verdict(screen: dict) -> str:
+    """
+    Returns a verdict in the Classification/Category/Explanation format built from
+    the matches alone, for bodies that are not sent to the LLM.
+    """
+    if not screen["matched"]:
+        return ("Classification: No suspicious activity detected\nCategory: None\n"
+                "Explanation: No pre-screen trigger phrases matched.")
+    phrases = []
+    for match in screen["matches"]:
+        quoted = f'"{match["text"]}" ({match["category"]})'
+        if quoted not in phrases:
+            phrases.append(quoted)
+    return (f"Classification: Suspicious activity detected\nCategory: {screen['category']}\n"
+            f"Explanation: Matched pre-screen trigger phrases: {', '.join(phrases)}.")
+
+_prescreener = None
+
+def get_prescreener() -> Prescreener:
+    """
+    Returns the process-wide Prescreener built from PRESCREEN_RULES_PATH, creating it on first use.
+    """
+    global _prescreener
+    if _prescreener is None:
+        _prescreener = Prescreener(load_rules())
+        print(f"DEBUG: Loaded {len(_prescreener._lookup)} pre-screen phrases from {PRESCREEN_RULES_PATH}")
+    return _prescreener
+
+def screen_body(text: str, mode: str = None) -> dict:
+    """
+    Scores the body and decides whether it goes to the LLM; see Prescreener.score and route.
+    """
+    prescreener = get_prescreener()
+    screen = prescreener.route(prescreener.score(text), mode)
+    print(f"DEBUG: Pre-screen {screen['mode']}: {len(screen['matches'])} matches in {screen['elapsed_us']} us, "
+          f"sent to LLM: {screen['sent_to_llm']} ({screen['reason']})")
+    return screen
+
+def screen_and_analyze(text: str, analyze, mode: str = None) -> tuple:
+    """
+    Scores the body with the pre-screen rules and, depending on the mode, gets the
+    verdict from analyze(text) or from the rules.
+
+    Args:
+        text (str): The formatted email body.
+        analyze: function taking the body and returning the LLM analysis.
+        mode (str, optional): "llm", "prescreen" or "rules"; defaults to PRESCREEN_MODE.
+
+    Returns:
+        tuple: (analysis, screen), where screen holds the match spans and the routing decision.
+    """
+    screen = screen_body(text, mode)
+    analysis = analyze(text) if screen["sent_to_llm"] else rules_verdict(screen)
+    return analysis, screen
+
+async def screen_and_analyze_async(text: str, analyze, mode: str = None) -> tuple:
+    """
+    Async variant of screen_and_analyze; analyze is an async function.
+    """
+    screen = screen_body(text, mode)
+    analysis = await analyze(text) if screen["sent_to_llm"] else rules_verdict(screen)
+    return analysis, screen
+
+def prescreen_metrics() -> dict:
+    """
+    Returns the aggregate pre-screen counters with the average scan time per body.
+    """
+    with _metrics_lock:
+        metrics = dict(PRESCREEN_METRICS)
+    metrics["avg_scan_us"] = metrics["scan_seconds"] / metrics["screened"] * 1_000_000 if metrics["screened"] else 0.0
+    return metrics
@@ -0,0 +1,119 @@
+import os
+import hashlib
+import threading
+
+# Folder of the versioned prompt templates (optionally set via environment variables).
+# Templates live in prompts/<family>/<version>.txt; the version used by a family is chosen
+# with PROMPT_<FAMILY>_VERSION, e.g. PROMPT_CUSTOM_API_VERSION=v2 (default v1).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_DIR = os.getenv("PROMPT_DIR", os.path.join(BASE_DIR, "prompts"))
+PROMPT_DEFAULT_VERSION = os.getenv("PROMPT_DEFAULT_VERSION", "v1")
+
+# Where the email goes in templates for single-message completions.
+EMAIL_PLACEHOLDER = "{email}"
+
+class PromptTemplate:
+    """
+    One version of a prompt, read from prompts/<family>/<version>.txt.
+
+    Everything before the {email} placeholder is the static prefix: instructions and
+    examples that are byte-identical for every request, so the provider's prompt-prefix
+    cache can reuse them, and the variable email always comes last. Templates without
+    the placeholder are system prompts that are sent apart from the input (custom API).
+
+    Args:
+        family (str): The prompt family, e.g. "custom_api".
+        version (str): The version, e.g. "v2".
+        text (str): The template text.
+    """
+
+    def __init__(self, family: str, version: str, text: str):
+        if text.count(EMAIL_PLACEHOLDER) > 1:
+            raise ValueError(f"Prompt {family}/{version} has more than one {EMAIL_PLACEHOLDER} placeholder")
+        self.family = family
+        self.version = version
+        self.text = text.strip()
+        self.sha256 = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+        self.prefix, _, self.suffix = self.text.partition(EMAIL_PLACEHOLDER)
+        self.has_placeholder = EMAIL_PLACEHOLDER in self.text
+
+    @property
+    def label(self) -> str:
+        """
+        The version recorded with each result, e.g. "custom_api/v2@1f3a9c0b2d4e".
+        """
+        return f"{self.family}/{self.version}@{self.sha256[:12]}"
+
+    def render(self, email: str) -> str:
+        """
+        Returns the static prefix followed by the email (and the suffix, if any).
+        """
+        if not self.has_placeholder:
+            raise ValueError(f"Prompt {self.label} is a system prompt; send the email as separate input")
+        return f"{self.prefix}{email}{self.suffix}"
+
+class PromptRegistry:
+    """
+    All prompt templates under a folder, loaded and hashed once.
+
+    Args:
+        folder (str): The prompts folder with one sub-folder per family.
+    """
+
+    def __init__(self, folder: str = PROMPT_DIR):
+        self.folder = folder
+        self.templates = {}
+        for family in sorted(os.listdir(folder)):
+            family_dir = os.path.join(folder, family)
+            if not os.path.isdir(family_dir):
+                continue
+            for name in sorted(os.listdir(family_dir)):
+                version, extension = os.path.splitext(name)
+                if extension != ".txt":
+                    continue
+                with open(os.path.join(family_dir, name), "r", encoding="utf-8") as f:
+                    template = PromptTemplate(family, version, f.read())
+                self.templates[(family, version)] = template
+                print(f"DEBUG: Loaded prompt {template.label} ({len(template.prefix)} chars of static prefix)")
+
+    def versions(self, family: str) -> list:
+        return [version for (name, version) in self.templates if name == family]
+
+    def get(self, family: str, version: str = None) -> PromptTemplate:
+        """
+        Returns a template; without a version, the one selected by PROMPT_<FAMILY>_VERSION.
+
+        Raises:
+            ValueError: If the family has no such version.
+        """
+        if version is None:
+            version = os.getenv(f"PROMPT_{family.upper()}_VERSION", PROMPT_DEFAULT_VERSION)
+        template = self.templates.get((family, version))
+        if template is None:
+            raise ValueError(f"Unknown prompt {family}/{version}; available: {', '.join(self.versions(family)) or 'none'}")
+        return template
+
+    def describe(self) -> dict:
+        """
+        Returns family/version -> SHA-256 of every loaded template.
+        """
+        return {f"{family}/{version}": template.sha256 for (family, version), template in self.templates.items()}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_prompt_registry() -> PromptRegistry:
+    """
+    Returns the process-wide PromptRegistry loaded from PROMPT_DIR, creating it on first use.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
+
+def get_prompt(family: str, version: str = None) -> PromptTemplate:
+    """
+    Returns the selected template of a family from the process-wide registry.
+    """
+    return get_prompt_registry().get(family, version)
@@ -0,0 +1,288 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+
+from batcher import estimate_tokens
+
+# Quota of an Azure OpenAI deployment and how the limiter adapts to it (optionally set via environment variables).
+# Every setting can be overridden per deployment, e.g. RATE_LIMIT_GPT_35_TURBO_TPM for "gpt-35-turbo".
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_TPM = int(os.getenv("RATE_LIMIT_TPM", "120000"))
+RATE_LIMIT_RPM = int(os.getenv("RATE_LIMIT_RPM", "720"))
+# Azure evaluates the quota over short windows, so at most this many seconds of budget are spent in a burst.
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+# Completion tokens reserved per request when the call sets no max_tokens.
+RATE_LIMIT_COMPLETION_TOKENS = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", "500"))
+# Times a rate-limited (429) request is retried before the error reaches the caller.
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+
+# Tokens added per request for the chat message framing.
+_MESSAGE_OVERHEAD_TOKENS = 8
+# Concurrency is halved at most once per this many seconds, so one burst of 429s counts once.
+_DECREASE_COOLDOWN = 2.0
+# Pause after a 429 that carries no Retry-After header.
+_DEFAULT_RETRY_AFTER = 1.0
+
+class TokenBucket:
+    """
+    Refills `per_minute / 60` units per second up to `capacity` and lets callers
+    wait until the units they need are available.
+    """
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float) -> float:
+        """
+        Takes `amount` units, waiting as long as needed, and returns the seconds waited.
+        An amount above the capacity is taken once the bucket is full.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount: float):
+        """
+        Gives back (positive) or takes (negative) units once the real usage is known.
+        The balance may go negative, which delays the next callers.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    Returns True for HTTP 429 errors of the openai client (0.x and 1.x) and of httpx/requests.
+    """
+    if type(error).__name__ == "RateLimitError":
+        return True
+    for attribute in ("http_status", "status_code"):
+        if getattr(error, attribute, None) == 429:
+            return True
+    return getattr(getattr(error, "response", None), "status_code", None) == 429
+
+def retry_after_seconds(error: Exception):
+    """
+    Returns the delay requested by a 429 (retry-after-ms or Retry-After header, or the
+    "retry after N seconds" hint in Azure's error message), or None.
+    """
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        lowered = {str(name).lower(): value for name, value in dict(headers).items()}
+    except (TypeError, ValueError):
+        lowered = {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(lowered[name]) * scale
+        except (KeyError, TypeError, ValueError):
+            pass
+    match = re.search(r"retry after (\d+(?:\.\d+)?) second", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+def estimate_request_tokens(prompt: str, max_tokens: int = None) -> int:
+    """
+    Estimates the quota a chat request uses: prompt tokens plus the completion tokens
+    reserved for the answer.
+    """
+    return estimate_tokens(prompt) + _MESSAGE_OVERHEAD_TOKENS + (max_tokens or RATE_LIMIT_COMPLETION_TOKENS)
+
+def _usage_tokens(response):
+    usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+    if usage is None:
+        return None
+    total = usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else None
+
+class RateLimiter:
+    """
+    Client-side limiter for one deployment's tokens-per-minute and requests-per-minute quota.
+
+    Each request first takes a concurrency slot, then one unit from the RPM bucket and
+    its estimated tokens from the TPM bucket; when the response reports its real usage
+    the difference is given back or charged. The concurrency limit adapts with AIMD:
+    it grows by about one per `limit` successful requests and halves on a 429, and a
+    Retry-After pauses every new request until it has passed. Rate-limited requests
+    are retried instead of failing.
+
+    Args:
+        name (str): The deployment name, used in logs.
+        tpm (int): Tokens-per-minute quota.
+        rpm (int): Requests-per-minute quota.
+        max_concurrency (int): Upper bound of the adaptive concurrency limit.
+    """
+
+    def __init__(self, name: str, tpm: int = RATE_LIMIT_TPM, rpm: int = RATE_LIMIT_RPM,
+                 max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY, burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES, enabled: bool = RATE_LIMIT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self.tpm = tpm
+        self.rpm = rpm
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.tokens = TokenBucket(tpm, tpm / 60.0 * burst_seconds)
+        self.requests = TokenBucket(rpm, rpm / 60.0 * burst_seconds)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.decreases = 0
+        self.waited_seconds = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._window = deque()  # (finished_at, tokens) of the last minute
+        self._condition = threading.Condition()
+
+    def call(self, fn, estimated_tokens: int):
+        """
+        Runs fn() within the limits and returns its result, retrying it when the
+        deployment answers 429.
+
+        Args:
+            fn: function performing the request and returning the response.
+            estimated_tokens (int): Estimated prompt + completion tokens (see estimate_request_tokens).
+        """
+        if not self.enabled:
+            return fn()
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens)
+            try:
+                response = fn()
+            except Exception as e:
+                self._release()
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._on_rate_limited(retry_after_seconds(e))
+                continue
+            self._release()
+            self._on_success(estimated_tokens, _usage_tokens(response))
+            return response
+
+    def _acquire(self, estimated_tokens: int):
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._condition.wait(timeout=pause if pause > 0 else None)
+            self.in_flight += 1
+        self.requests.acquire(1)
+        self.tokens.acquire(estimated_tokens)
+        waited = time.monotonic() - start
+        with self._condition:
+            self.waited_seconds += waited
+
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_success(self, estimated_tokens: int, used_tokens):
+        if used_tokens is not None:
+            self.tokens.adjust(estimated_tokens - used_tokens)
+        with self._condition:
+            self.completed += 1
+            self._window.append((time.monotonic(), used_tokens if used_tokens is not None else estimated_tokens))
+            # Additive increase: about +1 per `limit` successful requests.
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def _on_rate_limited(self, retry_after):
+        now = time.monotonic()
+        delay = retry_after if retry_after is not None else _DEFAULT_RETRY_AFTER
+        with self._condition:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, now + delay)
+            # Multiplicative decrease, once per burst of 429s.
+            if now - self._last_decrease >= _DECREASE_COOLDOWN:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = now
+                self.decreases += 1
+            limit = int(self.limit)
+        print(f"DEBUG: {self.name} rate limited (429); pausing {delay:.2f} s, concurrency limit now {limit}")
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current budget use: tokens and requests completed in the last
+        minute against the quota, the adaptive concurrency limit and the 429 counters.
+        A bulk job can use `concurrency_limit` as its parallelism.
+        """
+        now = time.monotonic()
+        with self._condition:
+            while self._window and now - self._window[0][0] > 60:
+                self._window.popleft()
+            tokens_last_minute = sum(tokens for _, tokens in self._window)
+            requests_last_minute = len(self._window)
+            return {
+                "deployment": self.name,
+                "tpm_limit": self.tpm,
+                "rpm_limit": self.rpm,
+                "tokens_last_minute": tokens_last_minute,
+                "requests_last_minute": requests_last_minute,
+                "tpm_utilization": round(tokens_last_minute / self.tpm, 3) if self.tpm else 0.0,
+                "rpm_utilization": round(requests_last_minute / self.rpm, 3) if self.rpm else 0.0,
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rate_limited": self.rate_limited,
+                "concurrency_decreases": self.decreases,
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "waited_seconds": round(self.waited_seconds, 2)
+            }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _setting(deployment: str, name: str, default):
+    key = f"RATE_LIMIT_{re.sub(r'[^0-9A-Za-z]+', '_', deployment).upper()}_{name}"
+    value = os.getenv(key)
+    return type(default)(value) if value is not None else default
+
+def get_rate_limiter(deployment: str) -> RateLimiter:
+    """
+    Returns the process-wide RateLimiter of a deployment, creating it on first use
+    with the RATE_LIMIT_* settings and their per-deployment overrides.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(deployment)
+        if limiter is None:
+            limiter = _limiters[deployment] = RateLimiter(
+                deployment,
+                tpm=_setting(deployment, "TPM", RATE_LIMIT_TPM),
+                rpm=_setting(deployment, "RPM", RATE_LIMIT_RPM),
+                max_concurrency=_setting(deployment, "MAX_CONCURRENCY", RATE_LIMIT_MAX_CONCURRENCY)
+            )
+            print(f"DEBUG: Rate limiter for {deployment}: {limiter.tpm} TPM, {limiter.rpm} RPM, "
+                  f"up to {limiter.max_concurrency} concurrent requests")
+        return limiter
+
+def rate_limit_snapshot() -> dict:
+    """
+    Returns the budget use of every deployment called so far.
+    """
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {deployment: limiter.snapshot() for deployment, limiter in limiters.items()}
@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+
+from eml_stream import CHARS_PER_TOKEN
+
+# Whether handlers strip quoted reply history before analysis (optionally set via environment variables).
+STRIP_REPLY_HISTORY = os.getenv("STRIP_REPLY_HISTORY", "1") == "1"
+# Size of the summary of the quoted history appended to the new content; 0 disables it.
+REPLY_SUMMARY_CHARS = int(os.getenv("REPLY_SUMMARY_CHARS", "0"))
+
+# "On Mon, 3 Jun 2024 at 10:00, John Smith <john@example.com> wrote:"
+_ON_WROTE = re.compile(r"^\s*On\b.*\bwrote:\s*$", re.IGNORECASE)
+# "-----Original Message-----", "---------- Forwarded message ---------", "Begin forwarded message:"
+_SEPARATOR = re.compile(
+    r"^\s*(-{2,}\s*(Original Message|Forwarded message|Forwarded by)\b.*|Begin forwarded message:\s*)$",
+    re.IGNORECASE
+)
+# First line of an Outlook reply header block ("From: ...", optionally in bold as "*From:*").
+_HEADER_FROM = re.compile(r"^\s*\*?From:\*?\s", re.IGNORECASE)
+_HEADER_DATE = re.compile(r"^\s*\*?(Sent|Date):\*?\s", re.IGNORECASE)
+_HEADER_OTHER = re.compile(r"^\s*\*?(To|Subject|Cc):\*?\s", re.IGNORECASE)
+_HEADER_LINE = re.compile(r"^\*?(From|Sent|Date|To|Cc|Subject):\*?\s", re.IGNORECASE)
+_UNDERSCORES = re.compile(r"^\s*_{5,}\s*$")
+
+# Lines after "From:" in which an Outlook header block must show its Sent/Date and To/Subject lines.
+_HEADER_BLOCK_LINES = 6
+# Content lines kept per quoted message in the summary.
+_SUMMARY_LINES_PER_MESSAGE = 2
+
+# Aggregate savings across all messages handled by this process.
+REPLY_METRICS = {"messages": 0, "stripped": 0, "original_chars": 0, "sent_chars": 0}
+# prepare_body runs in the bulk parse threads.
+_metrics_lock = threading.Lock()
+
+def _is_outlook_header(lines: list, index: int) -> bool:
+    if not _HEADER_FROM.match(lines[index]):
+        return False
+    block = lines[index + 1:index + 1 + _HEADER_BLOCK_LINES]
+    return any(_HEADER_DATE.match(line) for line in block) and any(_HEADER_OTHER.match(line) for line in block)
+
+def _history_start(lines: list) -> int:
+    """
+    Returns the index of the first line of the quoted history, or len(lines) if there is none.
+    """
+    for index, line in enumerate(lines):
+        if _SEPARATOR.match(line) or _ON_WROTE.match(line):
+            return index
+        # Gmail wraps long attribution lines: "On Mon, ... John Smith <john@example.com>\nwrote:".
+        if (line.lstrip().startswith("On ") and index + 1 < len(lines)
+                and _ON_WROTE.match(f"{line} {lines[index + 1]}")):
+            return index
+        if _is_outlook_header(lines, index):
+            # Outlook puts a line of underscores above the header block.
+            if index > 0 and _UNDERSCORES.match(lines[index - 1]):
+                return index - 1
+            return index
+    return len(lines)
+
+def split_reply(body: str) -> tuple:
+    """
+    Splits an email body into the new content and the quoted reply/forward history.
+
+    The history starts at the first attribution line ("On ... wrote:"), separator
+    ("-----Original Message-----", forwarded-message markers) or Outlook header block
+    (From:/Sent:/To:/Subject:). Lines quoted with ">" are moved to the history too.
+
+    Args:
+        body (str): The formatted email body.
+
+    Returns:
+        tuple: (new_content, quoted_history), both stripped.
+    """
+    lines = body.split("\n")
+    start = _history_start(lines)
+    new_lines = []
+    quoted_lines = []
+    for line in lines[:start]:
+        (quoted_lines if line.lstrip().startswith(">") else new_lines).append(line)
+    quoted_lines.extend(lines[start:])
+    return "\n".join(new_lines).strip(), "\n".join(quoted_lines).strip()
+
+def summarize_history(quoted: str, max_chars: int) -> str:
+    """
+    Builds a short extractive summary of the quoted history: the header lines of every
+    quoted message plus its first content lines, cut at max_chars.
+    """
+    summary = []
+    content_lines = 0
+    for line in quoted.split("\n"):
+        line = line.lstrip("> \t").strip()
+        if not line or _UNDERSCORES.match(line) or _SEPARATOR.match(line):
+            continue
+        if _HEADER_LINE.match(line) or _ON_WROTE.match(line):
+            summary.append(line)
+            content_lines = 0
+        elif content_lines < _SUMMARY_LINES_PER_MESSAGE:
+            summary.append(line)
+            content_lines += 1
+    return "\n".join(summary)[:max_chars].strip()
+
+def strip_reply_history(body: str, summary_chars: int = None) -> tuple:
+    """
+    Removes the quoted reply/forward history from an email body before analysis.
+
+    Only the new content is kept, optionally followed by a bounded summary of the
+    history. If the body has no new content (e.g. a bare forward), it is returned
+    unchanged so the forwarded message is still analyzed.
+
+    Args:
+        body (str): The formatted email body.
+        summary_chars (int, optional): Size of the history summary; defaults to REPLY_SUMMARY_CHARS (0 = none).
+
+    Returns:
+        tuple: (text, stats) where stats has "stripped", "original_chars", "sent_chars",
+               "quoted_chars" and "tokens_saved" (estimated with CHARS_PER_TOKEN).
+    """
+    summary_chars = REPLY_SUMMARY_CHARS if summary_chars is None else summary_chars
+    body = body or ""
+    new_content, quoted = split_reply(body)
+    stripped = bool(quoted and new_content)
+    if not stripped:
+        text = body
+    else:
+        text = new_content
+        if summary_chars > 0:
+            summary = summarize_history(quoted, summary_chars)
+            if summary:
+                text = f"{new_content}\n\n[Summary of quoted history]\n{summary}"
+
+    stats = {
+        "stripped": stripped,
+        "original_chars": len(body),
+        "sent_chars": len(text),
+        "quoted_chars": len(quoted) if stripped else 0,
+        "tokens_saved": (len(body) - len(text)) // CHARS_PER_TOKEN
+    }
+    with _metrics_lock:
+        REPLY_METRICS["messages"] += 1
+        REPLY_METRICS["stripped"] += stripped
+        REPLY_METRICS["original_chars"] += len(body)
+        REPLY_METRICS["sent_chars"] += len(text)
+    if stripped:
+        print(f"DEBUG: Stripped quoted history: {len(body)} -> {len(text)} chars "
+              f"(~{stats['tokens_saved']} tokens saved)")
+    return text, stats
+
+def prepare_body(body: str) -> tuple:
+    """
+    Returns the text to send for analysis and its history stats, honouring STRIP_REPLY_HISTORY.
+    """
+    if not STRIP_REPLY_HISTORY:
+        body = body or ""
+        return body, {"stripped": False, "original_chars": len(body), "sent_chars": len(body), "quoted_chars": 0,
+                      "tokens_saved": 0}
+    return strip_reply_history(body)
+
+def reply_metrics() -> dict:
+    """
+    Returns the aggregate reply-history savings for this process.
+    """
+    with _metrics_lock:
+        metrics = dict(REPLY_METRICS)
+    metrics["tokens_saved"] = (metrics["original_chars"] - metrics["sent_chars"]) // CHARS_PER_TOKEN
+    return metrics
@@ -0,0 +1,423 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import httpx
+import requests
+
+from http_client import HTTP_READ_TIMEOUT
+
+# Default resilience settings for calls to LLM backends (optionally set via environment variables).
+# Every setting can be overridden per endpoint, e.g. RESILIENCE_CUSTOM_API_TIMEOUT for the "custom_api" endpoint.
+RESILIENCE_TIMEOUT = float(os.getenv("RESILIENCE_TIMEOUT", str(HTTP_READ_TIMEOUT)))
+RESILIENCE_MAX_ATTEMPTS = int(os.getenv("RESILIENCE_MAX_ATTEMPTS", "3"))
+RESILIENCE_BACKOFF_BASE = float(os.getenv("RESILIENCE_BACKOFF_BASE", "0.5"))
+RESILIENCE_BACKOFF_MAX = float(os.getenv("RESILIENCE_BACKOFF_MAX", "8"))
+RESILIENCE_BREAKER_FAILURES = int(os.getenv("RESILIENCE_BREAKER_FAILURES", "5"))
+RESILIENCE_BREAKER_RESET = float(os.getenv("RESILIENCE_BREAKER_RESET", "30"))
+RESILIENCE_HEDGE = os.getenv("RESILIENCE_HEDGE", "0") == "1"
+RESILIENCE_HEDGE_PERCENTILE = float(os.getenv("RESILIENCE_HEDGE_PERCENTILE", "0.95"))
+RESILIENCE_HEDGE_MIN_SAMPLES = int(os.getenv("RESILIENCE_HEDGE_MIN_SAMPLES", "20"))
+RESILIENCE_HEDGE_WORKERS = int(os.getenv("RESILIENCE_HEDGE_WORKERS", "8"))
+
+# Status codes worth another attempt; any other HTTP error is returned to the caller at once.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Successful latencies kept per endpoint for the hedging percentile.
+_LATENCY_WINDOW = 200
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a backend whose circuit breaker is open.
+    """
+
+class ResiliencePolicy:
+    """
+    Timeouts, retries, circuit breaker and hedging settings of one endpoint.
+
+    Args:
+        timeout (float): Limit for a single attempt, in seconds.
+        max_attempts (int): Attempts per call, including the first one.
+        backoff_base (float): Backoff cap before the second attempt; doubles per attempt.
+        backoff_max (float): Upper bound of the backoff cap.
+        breaker_failures (int): Consecutive failed attempts that open the circuit.
+        breaker_reset (float): Seconds the circuit stays open before a probe is let through.
+        hedge (bool): Send a duplicate request when an attempt runs past the latency percentile.
+        hedge_percentile (float): Latency percentile after which the duplicate is sent.
+        hedge_min_samples (int): Successful calls needed before hedging starts.
+    """
+
+    SETTINGS = {
+        "timeout": float,
+        "max_attempts": int,
+        "backoff_base": float,
+        "backoff_max": float,
+        "breaker_failures": int,
+        "breaker_reset": float,
+        "hedge": lambda value: value == "1",
+        "hedge_percentile": float,
+        "hedge_min_samples": int,
+    }
+
+    def __init__(self, timeout: float = RESILIENCE_TIMEOUT, max_attempts: int = RESILIENCE_MAX_ATTEMPTS,
+                 backoff_base: float = RESILIENCE_BACKOFF_BASE, backoff_max: float = RESILIENCE_BACKOFF_MAX,
+                 breaker_failures: int = RESILIENCE_BREAKER_FAILURES, breaker_reset: float = RESILIENCE_BREAKER_RESET,
+                 hedge: bool = RESILIENCE_HEDGE, hedge_percentile: float = RESILIENCE_HEDGE_PERCENTILE,
+                 hedge_min_samples: int = RESILIENCE_HEDGE_MIN_SAMPLES):
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_failures = max(1, breaker_failures)
+        self.breaker_reset = breaker_reset
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = max(1, hedge_min_samples)
+
+    @classmethod
+    def from_env(cls, endpoint: str) -> "ResiliencePolicy":
+        """
+        Returns the default policy with the RESILIENCE_<ENDPOINT>_<SETTING> overrides applied.
+        """
+        prefix = f"RESILIENCE_{endpoint.upper()}_"
+        overrides = {}
+        for name, convert in cls.SETTINGS.items():
+            value = os.getenv(prefix + name.upper())
+            if value is not None:
+                overrides[name] = convert(value)
+        return cls(**overrides)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.SETTINGS}
+
+class CircuitBreaker:
+    """
+    Fails fast while a backend is down.
+
+    After `failure_threshold` consecutive failed attempts the circuit opens and calls
+    raise CircuitOpenError without reaching the backend. After `reset_timeout` seconds
+    one probe call is let through (half-open): its success closes the circuit, its
+    failure opens it again for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self, endpoint: str = "backend"):
+        """
+        Returns if a call may go ahead.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already in flight.
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            # A probe that never reported back (e.g. a cancelled request) is given up after reset_timeout.
+            probe_abandoned = self._probing and time.monotonic() - self._probe_started >= self.reset_timeout
+            if state == "half_open" and (not self._probing or probe_abandoned):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                print(f"DEBUG: Circuit for {endpoint} is half-open; sending a probe request.")
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"Circuit for {endpoint} is open after {self.failures} consecutive failures; "
+                               f"retry in {retry_in:.1f} s")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """
+        Ends a call whose outcome tells nothing about the backend (e.g. cancelled before it
+        answered), so a half-open circuit can send its next probe at once.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the most recent successful calls.
+    """
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = 1):
+        """
+        Returns the latency below which `fraction` of the recent calls completed, or
+        None with fewer than `min_samples` samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples or not samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Returns True for timeouts, connection failures and retryable HTTP status codes.
+    """
+    if isinstance(error, (httpx.HTTPStatusError, requests.exceptions.HTTPError)):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, requests.exceptions.ConnectionError,
+                              requests.exceptions.Timeout, asyncio.TimeoutError, TimeoutError))
+
+def retry_after(error: Exception):
+    """
+    Returns the Retry-After delay in seconds sent with a 429 or 503, or None.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float, rng=random) -> float:
+    """
+    Exponential backoff with full jitter: a random delay between 0 and
+    min(cap, base * 2 ** attempt), so clients that failed together do not retry together.
+    """
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+_hedge_executor = None
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        _hedge_executor = ThreadPoolExecutor(max_workers=RESILIENCE_HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _hedge_executor
+
+class Resilience:
+    """
+    Runs calls to one endpoint with per-attempt timeouts, retries with exponential
+    backoff and jitter on retryable errors, a circuit breaker and optional hedging.
+
+    `send(timeout)` performs one attempt and must raise on failure (e.g. call
+    raise_for_status()); `timeout` is the per-attempt limit in seconds, which a
+    synchronous `send` passes on to its HTTP client. The analysis requests are
+    idempotent, so retried and hedged duplicates are safe.
+    """
+
+    def __init__(self, endpoint: str, policy: ResiliencePolicy = None):
+        self.endpoint = endpoint
+        self.policy = policy or ResiliencePolicy.from_env(endpoint)
+        self.breaker = CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_reset)
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        """
+        Returns the seconds after which a duplicate request is sent, or None if hedging
+        is disabled or there are not enough latency samples yet.
+        """
+        if not self.policy.hedge:
+            return None
+        return self.latency.percentile(self.policy.hedge_percentile, self.policy.hedge_min_samples)
+
+    def _before_attempt(self):
+        try:
+            self.breaker.allow(self.endpoint)
+        except CircuitOpenError:
+            self.short_circuited += 1
+            raise
+        self.attempts += 1
+
+    def _after_failure(self, attempt: int, error: Exception):
+        # Returns the backoff before the next attempt, or re-raises if there is none.
+        if not is_retryable(error):
+            # The backend answered; the request itself is at fault.
+            self.breaker.record_success()
+            self.failures += 1
+            raise error
+        self.breaker.record_failure()
+        if attempt + 1 >= self.policy.max_attempts:
+            self.failures += 1
+            print(f"ERROR: {self.endpoint} failed after {attempt + 1} attempts: {error!r}")
+            raise error
+        delay = backoff_delay(attempt, self.policy.backoff_base, self.policy.backoff_max)
+        delay = max(delay, min(retry_after(error) or 0, self.policy.backoff_max))
+        self.retries += 1
+        print(f"DEBUG: {self.endpoint} attempt {attempt + 1} failed ({error!r}); retrying in {delay:.2f} s")
+        return delay
+
+    def call(self, send):
+        """
+        Calls send(timeout) in the current thread with retries, returning its result.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            Exception: The last error once the attempts are used up, or any non-retryable error.
+        """
+        self.calls += 1
+        for attempt in range(self.policy.max_attempts):
+            self._before_attempt()
+            start = time.monotonic()
+            try:
+                hedge_after = self.hedge_delay()
+                result = send(self.policy.timeout) if hedge_after is None else self._hedged(send, hedge_after)
+            except Exception as e:
+                time.sleep(self._after_failure(attempt, e))
+                continue
+            self.latency.record(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def _hedged(self, send, hedge_after: float):
+        executor = _get_hedge_executor()
+        first = executor.submit(send, self.policy.timeout)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+        print(f"DEBUG: {self.endpoint} slower than {hedge_after:.2f} s; sending a hedged request")
+        self.hedges += 1
+        second = executor.submit(send, self.policy.timeout)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.hedge_wins += future is second
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def call_async(self, send):
+        """
+        Async variant of call; send(timeout) is an async function and each attempt is
+        also cancelled after the timeout.
+        """
+        self.calls += 1
+        for attempt in range(self.policy.max_attempts):
+            self._before_attempt()
+            start = time.monotonic()
+            try:
+                hedge_after = self.hedge_delay()
+                if hedge_after is None:
+                    result = await asyncio.wait_for(send(self.policy.timeout), self.policy.timeout)
+                else:
+                    result = await self._hedged_async(send, hedge_after)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(attempt, e))
+                continue
+            self.latency.record(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    async def _hedged_async(self, send, hedge_after: float):
+        first = asyncio.ensure_future(asyncio.wait_for(send(self.policy.timeout), self.policy.timeout))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return first.result()
+            print(f"DEBUG: {self.endpoint} slower than {hedge_after:.2f} s; sending a hedged request")
+            self.hedges += 1
+            second = asyncio.ensure_future(asyncio.wait_for(send(self.policy.timeout), self.policy.timeout))
+            tasks.append(second)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is second
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing request is not needed any more.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        """
+        Returns the call counters, the circuit state and the current hedging threshold.
+        """
+        p95 = self.latency.percentile(0.95)
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+_resilience = {}
+_resilience_lock = threading.Lock()
+
+def get_resilience(endpoint: str = "custom_api") -> Resilience:
+    """
+    Returns the process-wide Resilience of an endpoint, created on first use with the
+    policy from the environment.
+    """
+    with _resilience_lock:
+        resilience = _resilience.get(endpoint)
+        if resilience is None:
+            resilience = _resilience[endpoint] = Resilience(endpoint)
+            print(f"DEBUG: Resilience policy for {endpoint}: {resilience.policy.to_dict()}")
+        return resilience
+
+def resilience_stats() -> dict:
+    """
+    Returns the stats of every endpoint used so far.
+    """
+    with _resilience_lock:
+        endpoints = dict(_resilience)
+    return {endpoint: resilience.stats() for endpoint, resilience in endpoints.items()}
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from bulk import run_blocking
+from normalizer import format_email_body
+
+# Location, size limits and lifetime of the analysis result cache (optionally set via environment variables).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(BASE_DIR, ".cache", "result_cache.sqlite3"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Disk hits whose last access time is written in one statement.
+_TOUCH_BATCH = 64
+
+class ResultCache:
+    """
+    Two-tier cache of LLM analysis results: an in-process LRU in front of SQLite.
+
+    All analysis calls are deterministic (temperature 0 or a fixed system prompt), so
+    the same input always gets the same verdict. Entries are keyed by the SHA-256 of the
+    normalized input text, the system prompt text and the model/toolkit name, so
+    editing a prompt or switching models never serves an old result. Entries expire
+    after `ttl` seconds; the memory tier keeps at most `memory_entries` results and the
+    SQLite tier evicts least recently used entries above `max_bytes`. Both tiers hold the
+    JSON payload and every hit decodes a fresh copy, so a caller that modifies its
+    result never changes what others get.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 memory_entries: int = RESULT_CACHE_MEMORY_ENTRIES, ttl: float = RESULT_CACHE_TTL,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._memory = OrderedDict()  # key -> (expires_at, JSON payload)
+        self._touched = {}  # key -> last access of disk hits not yet written
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_results ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON analysis_results (last_access)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_results").fetchone()[0]
+
+    @staticmethod
+    def key_for(input_text: str, system_prompt: str = "", model: str = "") -> str:
+        """
+        Returns the cache key for an analysis call. The input is normalized with
+        format_email_body first, so whitespace-only differences still hit.
+        """
+        digest = hashlib.sha256()
+        for part in (format_email_body(input_text or ""), system_prompt or "", model or ""):
+            encoded = part.encode("utf-8", "surrogatepass")
+            # Length-prefix each part so the boundaries between them are unambiguous.
+            digest.update(f"{len(encoded)}:".encode("ascii"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns the cached result for the key, or None on a miss or an expired entry.
+        """
+        if not self.enabled:
+            return None
+        payload = self._get_memory(key)
+        return json.loads(payload) if payload is not None else self._get_disk(key)
+
+    async def get_async(self, key: str):
+        """
+        Async variant of get for the event loop: the memory tier answers inline and
+        only a memory miss goes to SQLite, in a worker thread (bulk.run_blocking).
+        """
+        if not self.enabled:
+            return None
+        payload = self._get_memory(key)
+        if payload is not None:
+            return json.loads(payload)
+        return await run_blocking(self._get_disk, key)
+
+    def _get_memory(self, key: str):
+        # Returns the stored payload, or None on a miss.
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM analysis_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                # Expired rows are left for _evict, so a lookup never writes.
+                self.expired += row is not None
+                self.misses += 1
+                return None
+            # The LRU order on disk is updated in batches, not with a commit per hit.
+            self._touched[key] = now
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            self._remember(key, row[1], row[0])
+            self.disk_hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value):
+        """
+        Stores a result (a string or a JSON-serializable dict) in both tiers.
+        """
+        if not self.enabled:
+            return
+        payload = self._remember_new(key, value)
+        if payload is not None:
+            self._put_disk(key, *payload)
+
+    async def put_async(self, key: str, value):
+        """
+        Async variant of put: the memory tier is updated inline and the SQLite write
+        runs in a worker thread (bulk.run_blocking).
+        """
+        if not self.enabled:
+            return
+        payload = self._remember_new(key, value)
+        if payload is not None:
+            await run_blocking(self._put_disk, key, *payload)
+
+    def _remember_new(self, key: str, value):
+        # Returns (payload, expires_at) to write to disk, or None if too large for the disk tier.
+        payload = json.dumps(value, default=str)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, payload)
+        return (payload, expires_at) if len(payload.encode("utf-8")) <= self.max_bytes else None
+
+    def _put_disk(self, key: str, payload: str, expires_at: float):
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM analysis_results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_results (key, payload, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, expires_at, now)
+            )
+            self._touched.pop(key, None)
+            self._total += size - (old[0] if old else 0)
+            self._flush_touched()
+            self._evict(now)
+            self._conn.commit()
+
+    def _remember(self, key: str, expires_at: float, payload: str):
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE analysis_results SET last_access = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self, now: float):
+        # The total size is tracked incrementally; the table is only scanned when it is over
+        # the limit, and then trimmed to 90% of it so the next puts do not evict again.
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        while self._total > target:
+            # Expired entries go first, then the least recently used.
+            rows = self._conn.execute(
+                "SELECT key, size FROM analysis_results ORDER BY expires_at > ?, last_access LIMIT 256", (now,)
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                break
+            for key, size in rows:
+                if self._total <= target:
+                    break
+                self._conn.execute("DELETE FROM analysis_results WHERE key = ?", (key,))
+                self._total -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters per tier and the current size of the cache.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()[0]
+            total = self._total
+            memory_entries = len(self._memory)
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "memory_entries": memory_entries,
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes
+        }
+
+_result_cache = None
+
+def get_result_cache() -> ResultCache:
+    """
+    Returns the process-wide ResultCache, creating it on first use.
+    """
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+class _Call:
+    """
+    One in-flight synchronous call and its outcome.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight, later
+    callers with the same key wait for its outcome instead of making their own call.
+
+    The key is the analysis cache key (input, system prompt and model), so a
+    mass-mailed message dropped into many mailboxes or a retried upload costs one
+    LLM request. Errors are shared too; the next call after a failure starts afresh.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """
+        Calls fn(*args, **kwargs) unless a call for the key is already running in another
+        thread, in which case that call's result is returned (or its exception raised).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            print("DEBUG: Waiting for an identical in-flight call.")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn, *args, **kwargs):
+        """
+        Awaits fn(*args, **kwargs) unless a call for the key is already in flight on the
+        event loop, in which case that call is awaited instead. The shared call runs as its
+        own task, so a caller that gets cancelled (e.g. a client disconnect) does not
+        cancel it for the others.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self.leaders += 1
+            else:
+                print("DEBUG: Awaiting an identical in-flight call.")
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller was cancelled.
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Returns how many calls were made and how many were saved by coalescing.
+        """
+        with self._lock:
+            in_flight = len(self._calls) + len(self._tasks)
+        total = self.leaders + self.coalesced
+        return {
+            "calls": self.leaders,
+            "coalesced": self.coalesced,
+            "saved_ratio": self.coalesced / total if total else 0.0,
+            "in_flight": in_flight
+        }
+
+_single_flight = None
+
+def get_single_flight() -> SingleFlight:
+    """
+    Returns the process-wide SingleFlight, creating it on first use.
+    """
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
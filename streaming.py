@@ -0,0 +1,96 @@
+import json
+import time
+import threading
+from collections import deque
+
+from verdict_parser import VerdictParseError, parse_verdict
+
+# Time-to-first-byte samples kept for the streaming metrics.
+_TTFB_WINDOW = 500
+
+# Aggregate counters across all streamed analyses of this process.
+STREAM_METRICS = {"streams": 0, "completed": 0, "errors": 0, "chunks": 0}
+_ttfb_samples = deque(maxlen=_TTFB_WINDOW)
+_metrics_lock = threading.Lock()
+
+def sse_event(event: str, data) -> str:
+    """
+    Formats one server-sent event; data is sent as a single line of JSON.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def final_verdict(text: str):
+    """
+    Parses the complete analysis into an AnalysisResult dict, or None if it holds no verdict.
+    """
+    try:
+        return parse_verdict(text).model_dump()
+    except VerdictParseError:
+        return None
+
+async def single_chunk(text: str):
+    """
+    Yields an already complete analysis as one chunk, for answers that are not streamed.
+    """
+    yield text
+
+async def sse_analysis(chunks, started: float, prelude: dict = None):
+    """
+    Turns a stream of analysis text chunks into server-sent events:
+      - "prelude" with `prelude` (e.g. metadata), sent at once if given
+      - one "token" event per chunk as it arrives
+      - "verdict" with the full analysis, the parsed verdict (AnalysisResult fields, or null if
+        none could be parsed), time to first byte and total time
+      - "error" instead of the verdict if the stream fails
+
+    Args:
+        chunks: async iterator of text chunks (e.g. stream_custom_api()).
+        started (float): time.perf_counter() when the request arrived.
+        prelude (dict, optional): Data sent before the analysis starts.
+    """
+    with _metrics_lock:
+        STREAM_METRICS["streams"] += 1
+    if prelude is not None:
+        yield sse_event("prelude", prelude)
+    parts = []
+    ttfb = None
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+                print(f"DEBUG: Stream time to first byte: {ttfb * 1000:.0f} ms")
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+    except Exception as e:
+        print("ERROR: Streaming analysis failed:", e)
+        with _metrics_lock:
+            STREAM_METRICS["errors"] += 1
+        yield sse_event("error", {"detail": str(e)})
+        return
+    analysis = "".join(parts)
+    total = time.perf_counter() - started
+    with _metrics_lock:
+        STREAM_METRICS["completed"] += 1
+        STREAM_METRICS["chunks"] += len(parts)
+        if ttfb is not None:
+            _ttfb_samples.append(ttfb)
+    yield sse_event("verdict", {
+        "analysis": analysis,
+        "verdict": final_verdict(analysis),
+        "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+        "total_ms": round(total * 1000, 1)
+    })
+
+def stream_metrics() -> dict:
+    """
+    Returns the streaming counters with the median and p95 time to first byte.
+    """
+    with _metrics_lock:
+        metrics = dict(STREAM_METRICS)
+        samples = sorted(_ttfb_samples)
+    if samples:
+        metrics["ttfb_p50_ms"] = round(samples[len(samples) // 2] * 1000, 1)
+        metrics["ttfb_p95_ms"] = round(samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000, 1)
+    return metrics
@@ -0,0 +1,72 @@
+import os
+import json
+import asyncio
+
+# Every call must reach the stub and must not be answered from the result cache.
+os.environ["RESULT_CACHE_ENABLED"] = "0"
+
+from bench_verdict_parser import PRETTY, RESPONSES, VERDICT
+from http_client import close_async_client
+from resilience import get_resilience
+from test_resilience import fast_policy, get_stub
+from verdict_parser import parse_verdict
+
+CONTEXT = [{"id": f"doc-{i}", "text": "Section 4.2 \"fair and balanced\" {[,]}\n" * 50} for i in range(50)]
+
+# Answers that are not strict JSON but start like an object.
+MALFORMED = {
+    "Python literals": PRETTY.replace("true", "True"),
+    "prose after the object": PRETTY + "\nHope this helps!",
+    "smart quotes": PRETTY.replace('"', "“", 1).replace('"', "”", 1),
+    "context then Python literals": json.dumps({"context": CONTEXT, **VERDICT}).replace("true", "True"),
+}
+
+def analyzer():
+    import analyzer_jsonvalidation
+    analyzer_jsonvalidation.CUSTOM_API_URL = get_stub().url
+    get_resilience("custom_api").policy = fast_policy()
+    return analyzer_jsonvalidation
+
+def test_bench_responses_match_parse_verdict():
+    module = analyzer()
+    stub = get_stub()
+    responses = {**RESPONSES, **MALFORMED}
+    for name, text in responses.items():
+        stub.load(("body", text))
+        assert module.invoke_custom_api("Test", f"Sync check: {name}", "prompt") == parse_verdict(text).model_dump(), name
+
+    async def check_async():
+        try:
+            for name, text in responses.items():
+                stub.load(("body", text))
+                result = await module.invoke_custom_api_async("Test", f"Async check: {name}", "prompt")
+                assert result == parse_verdict(text).model_dump(), name
+        finally:
+            await close_async_client()
+    asyncio.run(check_async())
+
+def test_malformed_objects_give_the_verdict():
+    module = analyzer()
+    stub = get_stub()
+    for name, text in MALFORMED.items():
+        stub.load(("body", text))
+        assert module.invoke_custom_api("Test", f"Malformed check: {name}", "prompt") == VERDICT, name
+
+def test_context_is_skipped():
+    module = analyzer()
+    get_stub().load(("body", json.dumps({"summary": VERDICT["summary"], "context": CONTEXT,
+                                         **{k: v for k, v in VERDICT.items() if k != "summary"}})))
+    assert module.invoke_custom_api("Test", "Context check.", "prompt") == VERDICT
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
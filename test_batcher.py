@@ -0,0 +1,114 @@
+import json
+import asyncio
+
+import pytest
+
+from batcher import MicroBatcher, batch_instructions, format_batch_input, parse_batch_verdicts
+
+def test_parse_batch_verdicts():
+    response = json.dumps([{"id": 2, "verdict": "second"}, {"id": "[1]", "verdict": "first"},
+                           {"id": 3, "verdict": {"violation_detected": False}}])
+    assert parse_batch_verdicts(f"```json\n{response}\n```", 3) == ["first", "second", '{"violation_detected": false}']
+    assert parse_batch_verdicts('Here you go: ["a", "b"]', 2) == ["a", "b"]
+
+def test_parse_batch_verdicts_rejects_malformed_or_short_answers():
+    for response in ("No array here.", '[{"id": 1, "verdict": "only one"}]', '[{"id": 1, "verdict": "a"}, {"id": 1}]',
+                     '[{"id": 1, "verdict": "a"}, {"id": 2, "verdict": "  "}]', '[{"id": 1, "verdict": "a"},'):
+        with pytest.raises(ValueError):
+            parse_batch_verdicts(response, 2)
+
+def test_batch_prompt_numbers_messages():
+    assert format_batch_input(["one", "two"]) == "[1]\none\n\n[2]\ntwo"
+    assert "2 separate messages" in batch_instructions("Analyze.", 2)
+
+def batcher_with(send_batch, **settings):
+    sent_one = []
+
+    async def send_one(text):
+        sent_one.append(text)
+        if text == "boom":
+            raise RuntimeError("single call failed")
+        return f"single: {text}"
+    settings.setdefault("max_wait", 0.02)
+    return MicroBatcher(send_batch, send_one, **settings), sent_one
+
+def test_concurrent_inputs_share_one_batch():
+    batches = []
+
+    async def send_batch(texts):
+        batches.append(texts)
+        return [f"batched: {text}" for text in texts]
+    batcher, sent_one = batcher_with(send_batch, max_items=3)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(f"email {number}") for number in range(5)))
+    assert asyncio.run(run()) == [f"batched: email {number}" for number in range(5)]
+    assert batches == [["email 0", "email 1", "email 2"], ["email 3", "email 4"]]
+    assert sent_one == []
+    assert batcher.stats() == {"batches": 2, "batched_items": 5, "avg_batch_size": 2.5, "fallbacks": 0}
+
+def test_token_limit_starts_a_new_batch():
+    batches = []
+
+    async def send_batch(texts):
+        batches.append(texts)
+        return texts
+    batcher, sent_one = batcher_with(send_batch, max_tokens=30)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit("x" * 40) for _ in range(4)))
+    asyncio.run(run())
+    assert [len(batch) for batch in batches] == [2, 2]
+
+def test_lone_input_sent_on_its_own():
+    async def send_batch(texts):
+        raise AssertionError("a single input is not batched")
+    batcher, sent_one = batcher_with(send_batch)
+    assert asyncio.run(batcher.submit("alone")) == "single: alone"
+    assert sent_one == ["alone"]
+
+def test_unsplittable_batch_falls_back_to_single_calls():
+    for send_batch_result in (ValueError("Batched response does not contain a JSON array"), ["only one"]):
+        async def send_batch(texts):
+            if isinstance(send_batch_result, Exception):
+                raise send_batch_result
+            return send_batch_result
+        batcher, sent_one = batcher_with(send_batch)
+
+        async def run():
+            return await asyncio.gather(batcher.submit("a"), batcher.submit("boom"), batcher.submit("c"),
+                                        return_exceptions=True)
+        first, second, third = asyncio.run(run())
+        assert (first, third) == ("single: a", "single: c")
+        assert isinstance(second, RuntimeError)
+        assert sorted(sent_one) == ["a", "boom", "c"]
+        assert batcher.stats()["fallbacks"] == 1
+
+def test_analyzer_batches_skip_few_shot():
+    import updated_text_email_analyzer as analyzer
+    calls = []
+
+    async def invoke(tkd_name, input_text, system_prompt, examples=True):
+        calls.append((input_text, examples))
+        return json.dumps([{"id": 1, "verdict": "first"}, {"id": 2, "verdict": "second"}])
+    original = analyzer.invoke_custom_api_async
+    analyzer.invoke_custom_api_async = invoke
+    try:
+        batcher = analyzer._get_batcher("Test few-shot", "Analyze.")
+        assert asyncio.run(batcher.send_batch(["one", "two"])) == ["first", "second"]
+    finally:
+        analyzer.invoke_custom_api_async = original
+    assert calls == [("[1]\none\n\n[2]\ntwo", False)]
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+
+from bulk import bulk_map, clamp_concurrency
+
+def test_results_in_order_with_bounded_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def process(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 * (item % 3))
+        in_flight -= 1
+        return item * 2
+    assert asyncio.run(bulk_map(range(20), process, concurrency=4)) == [item * 2 for item in range(20)]
+    assert peak == 4
+
+def test_items_pulled_only_when_a_slot_is_free():
+    pulled = []
+
+    def items():
+        for item in range(10):
+            pulled.append(item)
+            yield item
+
+    async def process(item):
+        # At most `concurrency` items are pulled ahead of the finished ones.
+        assert len(pulled) <= item + 2
+        await asyncio.sleep(0.001)
+        return item
+    asyncio.run(bulk_map(items(), process, concurrency=2))
+
+def test_on_error_records_result():
+    async def process(item):
+        if item == 2:
+            raise ValueError("bad item")
+        return item
+    results = asyncio.run(bulk_map(range(4), process, on_error=lambda item, e: str(e)))
+    assert results == [0, 1, "bad item", 3]
+
+def test_first_error_cancels_and_closes():
+    closed = []
+
+    def items():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    async def process(item):
+        if item == 3:
+            raise ValueError("bad item")
+        await asyncio.sleep(0.01)
+        return item
+    with pytest.raises(ValueError):
+        asyncio.run(bulk_map(items(), process, concurrency=4))
+    assert closed == [True]
+
+def test_cancel_while_next_is_running_closes_generator():
+    entered = threading.Event()
+    release = threading.Event()
+    closed = []
+
+    def items():
+        try:
+            yield 1
+            # The second next() blocks here, in a worker thread.
+            entered.set()
+            release.wait(5)
+            yield 2
+        finally:
+            closed.append(True)
+
+    async def process(item):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(bulk_map(items(), process, concurrency=2))
+        while not entered.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+    assert closed == [True]
+
+def test_clamp_concurrency():
+    assert clamp_concurrency(0) == 1
+    assert clamp_concurrency(10_000) > 1
+    assert clamp_concurrency(3) == 3
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+from chunking import (analyze_in_chunks, analyze_in_chunks_async, join_text_verdicts, merge_json_verdicts,
+                      merge_text_verdicts, needs_chunking, split_into_chunks)
+
+CLEAN = "Classification: No suspicious activity detected\nCategory: None\nExplanation: Routine update."
+GUARANTEES = ("Classification: Suspicious activity detected\nCategory: Gaurantees & Assurances\n"
+              "Explanation: Promises a sure return.")
+INSIDER = ("Classification: Suspicious activity detected\nCategory: Insider Trading\n"
+           "Explanation: Mentions the merger before it is public.")
+
+# A chunk answer for the openai prompt, which has no Classification/Category labels.
+FREE_FORM_FLAGGED = """Summary: The sender discusses an upcoming merger with a client.
+Red flags: "keep this between us", "buy before the announcement".
+Fraud or compliance violation suspected: Yes - the sender shares material non-public information.
+Tag: Market abuse
+Suggested next action: Escalate to compliance team."""
+FREE_FORM_CLEAN = """Summary: Scheduling a quarterly review meeting.
+Red flags: None.
+Fraud or compliance violation suspected: No
+Suggested next action: No action needed."""
+
+def test_free_form_violation_stays_flagged():
+    merged = merge_text_verdicts([FREE_FORM_CLEAN, FREE_FORM_FLAGGED])
+    assert "Classification: Suspicious activity detected" in merged
+    assert "Part 2/2" in merged and "Part 1/2" not in merged
+
+def test_free_form_answers_joined_unchanged():
+    joined = join_text_verdicts([FREE_FORM_CLEAN, FREE_FORM_FLAGGED])
+    assert joined == f"Part 1/2:\n{FREE_FORM_CLEAN}\n\nPart 2/2:\n{FREE_FORM_FLAGGED}"
+
+def body(paragraphs: int) -> str:
+    return "\n\n".join(f"Paragraph {number}: " + "the client asked about the quarterly figures. " * 20
+                         for number in range(paragraphs))
+
+def test_needs_chunking_threshold():
+    assert not needs_chunking("", threshold_tokens=10)
+    assert not needs_chunking("x" * 36, threshold_tokens=10)
+    assert needs_chunking("x" * 40, threshold_tokens=10)
+    assert not needs_chunking("x" * 40_000, threshold_tokens=0)
+
+def test_chunks_respect_size_and_overlap():
+    text = body(30)
+    chunks = split_into_chunks(text, max_tokens=400, overlap_tokens=50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 400 * 4 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split("\n\n")[0] in previous
+    for number in range(30):
+        assert any(f"Paragraph {number}:" in chunk for chunk in chunks)
+
+def test_analyze_in_chunks_merges_in_order():
+    text = body(30)
+    seen = []
+    lock = threading.Lock()
+    def analyze(chunk):
+        with lock:
+            seen.append(chunk)
+        return INSIDER if "Paragraph 17:" in chunk else CLEAN
+    merged = analyze_in_chunks(text, analyze, lambda verdicts: verdicts, max_tokens=400, overlap_tokens=50)
+    assert len(merged) == len(seen) > 1
+    assert merged == [INSIDER if "Paragraph 17:" in chunk else CLEAN
+                      for chunk in split_into_chunks(text, 400, 50)]
+
+def test_analyze_in_chunks_single_chunk_not_merged():
+    assert analyze_in_chunks("short body", lambda chunk: CLEAN, lambda verdicts: 1 / 0) == CLEAN
+
+def test_analyze_in_chunks_async():
+    async def analyze(chunk):
+        await asyncio.sleep(0)
+        return GUARANTEES if "Paragraph 3:" in chunk else CLEAN
+    merged = asyncio.run(analyze_in_chunks_async(body(30), analyze, merge_text_verdicts, max_tokens=400,
+                                                 overlap_tokens=50, concurrency=3))
+    assert merged.startswith("Classification: Suspicious activity detected\nCategory: Guarantees & Assurances")
+
+def test_any_flagged_chunk_wins():
+    merged = merge_text_verdicts([CLEAN, GUARANTEES, CLEAN])
+    assert merged.startswith("Classification: Suspicious activity detected\nCategory: Guarantees & Assurances\n")
+    assert merged.endswith("Explanation: Part 2/3: Promises a sure return.")
+
+def test_most_severe_category_wins():
+    merged = merge_text_verdicts([GUARANTEES, CLEAN, INSIDER])
+    assert "Category: Insider Trading" in merged
+    assert "Part 1/3: Promises a sure return. Part 3/3: Mentions the merger" in merged
+
+def test_all_clean_stays_clean():
+    merged = merge_text_verdicts([CLEAN, CLEAN])
+    assert merged == ("Classification: No suspicious activity detected\nCategory: None\n"
+                      "Explanation: Part 1/2: Routine update. Part 2/2: Routine update.")
+
+def test_json_merge():
+    clean = {"summary": "Meeting notes.", "red_flags": [], "violation_detected": False, "violation_type": "None",
+             "explanation": "Nothing unusual.", "recommended_action": "No action needed"}
+    guarantees = {"summary": "Sure return.", "red_flags": ["slam dunk"], "violation_detected": True,
+                  "violation_type": "Guarantees & Assurances", "explanation": "Promises a return.",
+                  "recommended_action": "Request more info"}
+    insider = {"summary": "Merger tip.", "red_flags": ["slam dunk", "before the announcement"],
+               "violation_detected": True, "violation_type": "Insider Trading", "explanation": "Shares MNPI.",
+               "recommended_action": "Escalate to compliance team"}
+    assert merge_json_verdicts([clean, guarantees, insider]) == {
+        "summary": "Meeting notes. Sure return. Merger tip.",
+        "red_flags": ["slam dunk", "before the announcement"],
+        "violation_detected": True,
+        "violation_type": "Insider Trading",
+        "explanation": "Promises a return. Shares MNPI.",
+        "recommended_action": "Escalate to compliance team",
+    }
+    merged = merge_json_verdicts([clean, clean])
+    assert merged["violation_detected"] is False
+    assert merged["violation_type"] == "None"
+    assert merged["recommended_action"] == "No action needed"
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,68 @@
+from email import policy
+from email.parser import BytesParser
+
+from eml_stream import read_eml_body
+
+MULTIPART = b"""From: a@example.com
+To: b@example.com
+Subject: Quarterly figures
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="XX"
+
+--XX
+Content-Type: text/plain; charset=utf-8
+
+First part of the body.
+--XX
+Content-Type: application/octet-stream
+Content-Disposition: attachment; filename="data.bin"
+Content-Transfer-Encoding: base64
+
+AAECAwQ=
+--XX
+Content-Type: text/plain; charset=utf-8
+
+Second part.
+--XX--
+"""
+
+def test_body_matches_full_parse():
+    message, body, truncated = read_eml_body(MULTIPART, chunk_size=16)
+    full = BytesParser(policy=policy.default).parsebytes(MULTIPART)
+    expected = "".join(part.get_content() for part in full.walk()
+                       if part.get_content_type() == "text/plain" and "attachment" not in part.get("Content-Disposition", ""))
+    assert body == expected
+    assert not truncated
+    assert message["Subject"] == "Quarterly figures"
+
+def test_budget_truncates():
+    message, body, truncated = read_eml_body(MULTIPART, max_chars=10, chunk_size=16)
+    assert truncated
+    assert body == "First part"
+    assert message["Subject"] == "Quarterly figures"
+
+def test_single_part_text_body():
+    message, body, truncated = read_eml_body(b"Subject: Hi\nContent-Type: text/plain\n\nHello there.\n")
+    assert body == "Hello there.\n"
+    assert not truncated
+
+def test_single_part_non_text_body_is_empty():
+    raw = (b"Subject: Report\nMIME-Version: 1.0\nContent-Type: application/octet-stream\n"
+           b"Content-Transfer-Encoding: base64\n\nAAECAwQ=\n")
+    message, body, truncated = read_eml_body(raw)
+    assert body == ""
+    assert not truncated
+    assert message["Subject"] == "Report"
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
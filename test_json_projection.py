@@ -0,0 +1,111 @@
+import json
+import random
+
+import pytest
+
+from json_projection import JsonProjector, project_chunks, project_text
+
+VERDICT = {
+    "summary": "Promises a \"guaranteed\" return.\nSee below.",
+    "red_flags": ["slam dunk", "{not: a [bracket]}"],
+    "violation_detected": True,
+    "violation_type": "Guarantees & Assurances",
+    "score": -1.5e3,
+    "notes": None,
+}
+CONTEXT = [{"id": f"doc-{i}", "text": "Section 4.2 \"fair and balanced\" \\ {[,]}\n" * 3} for i in range(20)]
+
+def response(**extra) -> str:
+    head = dict(list(VERDICT.items())[:3])
+    tail = dict(list(VERDICT.items())[3:])
+    return json.dumps({**head, "context": CONTEXT, **tail, **extra})
+
+def split(text: str, size: int) -> list:
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+def test_context_skipped_at_every_chunk_boundary():
+    for size in (1, 2, 3, 7, 64, 4096):
+        projector = project_chunks(split(response(), size))
+        assert projector.result == VERDICT, size
+        assert projector.skipped_chars["context"] == len(json.dumps(CONTEXT)), size
+
+def test_random_objects_and_cuts_match_json_loads():
+    rng = random.Random(3)
+    def value(depth=0):
+        kind = rng.randrange(6 if depth < 3 else 3)
+        if kind == 0:
+            return rng.choice([True, False, None, 0, -12, 3.5e10])
+        if kind in (1, 2):
+            return "".join(rng.choice('ab"\\/\n{}[],:é ') for _ in range(rng.randrange(10)))
+        if kind == 3:
+            return [value(depth + 1) for _ in range(rng.randrange(4))]
+        return {f"k{i}\"": value(depth + 1) for i in range(rng.randrange(4))}
+    for _ in range(300):
+        obj = {("context" if i == 0 else f"key{i}"): value() for i in range(rng.randrange(1, 6))}
+        text = json.dumps(obj, indent=rng.choice([None, 1]), ensure_ascii=rng.random() < 0.5)
+        cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randrange(10))))
+        chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert project_chunks(chunks).result == {k: v for k, v in obj.items() if k != "context"}
+
+def test_keys_selects_top_level_keys():
+    assert project_text(response(), keys=["violation_type", "context"]) == {"violation_type": "Guarantees & Assurances"}
+
+def test_non_object_kept_as_text():
+    text = "Classification: Suspicious activity detected\nCategory: Front Running"
+    projector = project_chunks(split(text, 5))
+    assert not projector.is_object
+    assert projector.text == text
+    assert project_text(text) == text
+    assert project_text("   ") == "   "
+
+def test_truncated_object_raises():
+    text = response()
+    with pytest.raises(ValueError):
+        project_chunks(split(text[:len(text) // 2], 100))
+
+def test_lenient_falls_back_to_text_without_skipped_values():
+    # Each response breaks after the context, which is left out of the text.
+    cases = {
+        "Python literal": (response().replace("null", "None"), "None"),
+        "prose after the object": (response() + "\nHope this helps!", "Hope this helps!"),
+        "smart quotes": (response().replace('"violation_type"', "“violation_type”"), "“violation_type”"),
+        "truncated": (response()[:-20], '"violation_type"'),
+    }
+    for name, (text, marker) in cases.items():
+        for size in (1, 7, 64, 4096):
+            projector = project_chunks(split(text, size), lenient=True)
+            assert not projector.is_object, name
+            assert projector.error, name
+            assert marker in projector.text, name
+            assert "fair and balanced" not in projector.text, (name, size)
+
+def test_lenient_keeps_text_after_an_early_error():
+    text = response().replace("true", "True")
+    projector = project_chunks(split(text, 64), lenient=True)
+    assert projector.text == text
+
+def test_lenient_well_formed_object_unchanged():
+    for size in (1, 7, 4096):
+        projector = project_chunks(split(response(), size), lenient=True)
+        assert projector.result == VERDICT
+        assert projector.error is None
+
+def test_skipped_values_never_kept():
+    projector = JsonProjector()
+    for chunk in split(response(), 50):
+        projector.feed(chunk)
+        assert "context" not in projector.result
+    assert projector.close() == VERDICT
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
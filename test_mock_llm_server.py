@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import mock_llm_server
+from mock_llm_server import MockLLM
+
+def test_configure_converts_types():
+    mock = MockLLM()
+    config = mock.configure(latency="normal", latency_ms="250", error_rate="0.5")
+    assert config["latency"] == "normal"
+    assert config["latency_ms"] == 250
+    assert config["error_rate"] == 0.5
+    assert mock.config == config
+
+def test_configure_invalid_change_leaves_config_unchanged():
+    mock = MockLLM()
+    before = dict(mock.config)
+    for changes in ({"latency": "foo"}, {"latency_ms": 100, "response_format": "xml"},
+                    {"error_rate": 0.2, "latency_ms": "slow"}, {"latency_ms": 100, "unknown": 1}):
+        with pytest.raises(ValueError):
+            mock.configure(**changes)
+        assert mock.config == before, changes
+
+def test_config_route_rejects_without_applying():
+    client = TestClient(mock_llm_server.app)
+    before = client.get("/mock/stats").json()["config"]
+    response = client.put("/mock/config", json={"latency": "foo", "latency_ms": 1})
+    assert response.status_code == 400
+    assert client.get("/mock/stats").json()["config"] == before
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
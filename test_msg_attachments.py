@@ -0,0 +1,48 @@
+import os
+import hashlib
+
+import pytest
+
+from msg_attachments import list_attachments, read_attachment
+
+# A .msg with two attachments by value: statement.bin (70000 bytes, in the regular OLE
+# stream area) and summary.txt (31 bytes, in the mini stream).
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data", "attachments.msg")
+STATEMENT_SHA256 = "9f6d8bb550591a5410aa72b997e7d49e3eed1ce025e83628addaf4382d2295bd"
+SUMMARY_SHA256 = "83b8a066cb7c9e250a8fd7d70b43709945f33b062a343c610923985b0930f30d"
+
+def test_list_attachments_hashes_from_ole_streams():
+    attachments = list_attachments(FIXTURE)
+    assert attachments == [
+        {"index": 0, "name": "statement.bin", "size": 70000, "sha256": STATEMENT_SHA256},
+        {"index": 1, "name": "summary.txt", "size": 31, "sha256": SUMMARY_SHA256},
+    ]
+
+def test_list_attachments_from_bytes_and_file_object():
+    with open(FIXTURE, "rb") as f:
+        data = f.read()
+        assert list_attachments(f, include_hashes=False)[0] == {"index": 0, "name": "statement.bin",
+                                                                "size": 70000, "sha256": None}
+    assert [item["sha256"] for item in list_attachments(data)] == [STATEMENT_SHA256, SUMMARY_SHA256]
+
+def test_read_attachment_on_demand():
+    data = read_attachment(FIXTURE, 1)
+    assert data == b"Account 1234: balance 1,000.00\n"
+    assert hashlib.sha256(read_attachment(FIXTURE, 0)).hexdigest() == STATEMENT_SHA256
+
+def test_read_attachment_size_cap_checked_before_reading():
+    with pytest.raises(ValueError, match="above the 1024 byte limit"):
+        read_attachment(FIXTURE, 0, max_bytes=1024)
+    with pytest.raises(IndexError):
+        read_attachment(FIXTURE, 2)
+
+def test_parser_lists_attachments_without_loading_them(monkeypatch):
+    extract_msg = pytest.importorskip("extract_msg")
+    from parser4 import parse_msg
+    def loaded(msg):
+        raise AssertionError("extract_msg loaded the attachments")
+    monkeypatch.setattr(extract_msg.msg_classes.msg.MSGFile, "attachments", property(loaded))
+    with open(FIXTURE, "rb") as f:
+        result = parse_msg(f)
+    assert result["body"].startswith("Please find the two statements attached.")
+    assert [item["sha256"] for item in result["attachments"]] == [STATEMENT_SHA256, SUMMARY_SHA256]
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from prescreen import Prescreener, load_rules, prescreen_metrics, rules_verdict, screen_and_analyze
+
+RULES = {
+    "Insider Trading": ["before it's announced", "non-public information"],
+    "Rumors and Secrets": ["there's a rumor", "keep this between us"],
+    "Guarantees & Assurances": ["risk-free", "slam dunk"],
+}
+
+def test_matches_across_punctuation_case_and_line_breaks():
+    prescreener = Prescreener(RULES)
+    for text in ("Buy before it's announced.", "Buy BEFORE it’s announced!", "buy before it s announced",
+                 "Buy before\nit's  announced", "Buy before -- it's ... announced"):
+        matches = prescreener.scan(text)
+        assert [match["phrase"] for match in matches] == ["before it's announced"], text
+        assert text[matches[0]["start"]:matches[0]["end"]] == matches[0]["text"]
+
+def test_curly_apostrophes_and_dashes():
+    prescreener = Prescreener(RULES)
+    assert prescreener.scan("There’s a rumor going around")[0]["category"] == "Rumors and Secrets"
+    assert prescreener.scan("It is totally risk—free")[0]["phrase"] == "risk-free"
+    assert prescreener.scan("A “slam dunk” deal")[0]["phrase"] == "slam dunk"
+
+def test_whole_words_only():
+    prescreener = Prescreener(RULES)
+    for text in ("Beforeit's announced", "slam dunked", "a riskfree bond", "There's a rumored deal"):
+        assert not prescreener.scan(text), text
+    assert not prescreener.may_match("nothing relevant here")
+    assert prescreener.may_match("a slam and a dunk")
+
+def test_score_picks_most_severe_category():
+    screen = Prescreener(RULES).score("Keep this between us: it is a slam dunk, before it's announced. Slam dunk!")
+    assert screen["matched"]
+    assert screen["category"] == "Insider Trading"
+    assert screen["counts"] == {"Rumors and Secrets": 1, "Guarantees & Assurances": 2, "Insider Trading": 1}
+
+def test_routing_modes():
+    prescreener = Prescreener(RULES, sample_rate=0.0)
+    matched = "It's a slam dunk."
+    clean = "See you at the quarterly review."
+    assert prescreener.route(prescreener.score(clean), "llm")["reason"] == "llm mode"
+    assert prescreener.route(prescreener.score(matched), "rules")["sent_to_llm"] is False
+    routed = prescreener.route(prescreener.score(matched), "PRESCREEN")
+    assert (routed["mode"], routed["sent_to_llm"], routed["reason"]) == ("prescreen", True, "matched")
+    routed = prescreener.route(prescreener.score(clean), "prescreen")
+    assert (routed["sent_to_llm"], routed["reason"]) == (False, "no match")
+    always = Prescreener(RULES, sample_rate=1.0)
+    assert always.route(always.score(clean), "prescreen")["reason"] == "sampled"
+    with pytest.raises(ValueError):
+        prescreener.route(prescreener.score(clean), "fast")
+
+def test_rules_verdict():
+    prescreener = Prescreener(RULES)
+    verdict = rules_verdict(prescreener.score("Slam dunk. A slam dunk, and there's a rumor."))
+    assert verdict == ("Classification: Suspicious activity detected\nCategory: Rumors and Secrets\n"
+                       'Explanation: Matched pre-screen trigger phrases: "Slam dunk" (Guarantees & Assurances), '
+                       '"slam dunk" (Guarantees & Assurances), "there\'s a rumor" (Rumors and Secrets).')
+    assert rules_verdict(prescreener.score("Lunch at noon?")).startswith(
+        "Classification: No suspicious activity detected\nCategory: None\n")
+
+def test_screen_and_analyze_skips_llm_in_rules_mode():
+    calls = []
+    analysis, screen = screen_and_analyze("It's a slam dunk.", lambda text: calls.append(text) or "LLM", "rules")
+    assert calls == []
+    assert analysis.startswith("Classification:")
+    analysis, screen = screen_and_analyze("It's a slam dunk.", lambda text: "LLM", "llm")
+    assert analysis == "LLM"
+
+def test_metrics_are_consistent_across_threads():
+    prescreener = Prescreener(RULES, sample_rate=0.0)
+    before = prescreen_metrics()
+
+    def work():
+        for _ in range(500):
+            prescreener.route(prescreener.score("It's a slam dunk."), "prescreen")
+            prescreener.route(prescreener.score("Nothing here."), "prescreen")
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = prescreen_metrics()
+    assert after["screened"] - before["screened"] == 8000
+    assert after["matched"] - before["matched"] == 4000
+    assert after["skipped_llm"] - before["skipped_llm"] == 4000
+
+def test_load_rules():
+    path = os.path.join(tempfile.mkdtemp(), "rules.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# comment\n\n[Front Running]\nget in now\n  likely big upside  \n[Customer Complaints]\n")
+    assert load_rules(path) == {"Front Running": ["get in now", "likely big upside"], "Customer Complaints": []}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("orphan phrase\n[Front Running]\n")
+    with pytest.raises(ValueError):
+        load_rules(path)
+    assert all(load_rules().values())
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,80 @@
+import os
+import re
+import hashlib
+import tempfile
+
+import pytest
+
+from prompt_registry import PromptRegistry, PromptTemplate
+
+def make_folder(files: dict) -> str:
+    folder = tempfile.mkdtemp()
+    for path, text in files.items():
+        os.makedirs(os.path.join(folder, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(folder, path), "w", encoding="utf-8") as f:
+            f.write(text)
+    return folder
+
+def test_render_puts_email_after_static_prefix():
+    template = PromptTemplate("openai", "v1", 'Analyze this.\n"""{email}"""\n')
+    assert template.prefix == 'Analyze this.\n"""'
+    assert template.suffix == '"""'
+    assert template.render("Hello {name}") == 'Analyze this.\n"""Hello {name}"""'
+
+def test_hash_and_label_of_stripped_text():
+    template = PromptTemplate("custom_api", "v2", "\n  Instructions.\n\n")
+    digest = hashlib.sha256(b"Instructions.").hexdigest()
+    assert template.sha256 == digest
+    assert template.label == f"custom_api/v2@{digest[:12]}"
+    assert PromptTemplate("custom_api", "v2", "Instructions.").sha256 == digest
+    assert PromptTemplate("custom_api", "v3", "Instructions!").sha256 != digest
+
+def test_system_prompt_cannot_render():
+    template = PromptTemplate("custom_api", "v1", "Instructions only.")
+    assert not template.has_placeholder
+    with pytest.raises(ValueError):
+        template.render("email")
+
+def test_more_than_one_placeholder_rejected():
+    with pytest.raises(ValueError):
+        PromptTemplate("openai", "v9", "{email} and again {email}")
+
+def test_registry_loads_versions_and_selects_by_env():
+    folder = make_folder({"family/v1.txt": "First {email}", "family/v2.txt": "Second {email}",
+                          "family/notes.md": "not a prompt", "README.txt": "not a family"})
+    registry = PromptRegistry(folder)
+    assert sorted(registry.versions("family")) == ["v1", "v2"]
+    assert registry.get("family").version == "v1"
+    os.environ["PROMPT_FAMILY_VERSION"] = "v2"
+    try:
+        assert registry.get("family").render("x") == "Second x"
+    finally:
+        del os.environ["PROMPT_FAMILY_VERSION"]
+    assert set(registry.describe()) == {"family/v1", "family/v2"}
+    with pytest.raises(ValueError):
+        registry.get("family", "v3")
+    with pytest.raises(ValueError):
+        registry.get("unknown")
+
+def test_shipped_prompts_load_and_end_cleanly():
+    registry = PromptRegistry()
+    assert registry.templates
+    for (family, version), template in registry.templates.items():
+        last_line = template.text.splitlines()[-1]
+        # A numbered heading with nothing after it is left over from an edit.
+        assert not re.fullmatch(r"\s*\d+\.\s*", last_line), f"{family}/{version}"
+        if template.has_placeholder:
+            assert template.render("EMAIL").count("EMAIL") == 1
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,336 @@
+import os
+import time
+import socket
+import asyncio
+import threading
+
+# The analyzer test must reach the stub and must not be answered from the result cache.
+os.environ["RESULT_CACHE_ENABLED"] = "0"
+
+import httpx
+import requests
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from http_client import close_async_client
+from resilience import (Resilience, ResiliencePolicy, CircuitOpenError, backoff_delay, is_retryable,
+                        get_resilience)
+
+class FaultStub:
+    """
+    Local stand-in for the custom API that fails on demand.
+
+    Each request takes the next fault from `script`; when the script is empty it
+    answers "OK" at once. Faults are ("status", code), ("delay", seconds),
+    ("retry_after", seconds), which answers 429 with a Retry-After header, and
+    ("body", text), which answers 200 with that text.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.app = FastAPI(title="Fault-injecting stub")
+        self.app.post("/query", response_class=PlainTextResponse)(self.query)
+        self.url = None
+
+    def load(self, *faults):
+        with self._lock:
+            self.script = list(faults)
+            self.requests = 0
+
+    async def query(self, request: Request):
+        with self._lock:
+            self.requests += 1
+            fault = self.script.pop(0) if self.script else None
+        if fault is None:
+            return "OK"
+        kind, value = fault
+        if kind == "body":
+            return value
+        if kind == "delay":
+            await asyncio.sleep(value)
+            return "OK (slow)"
+        if kind == "retry_after":
+            return PlainTextResponse("Too many requests", status_code=429, headers={"Retry-After": str(value)})
+        return PlainTextResponse(f"Injected {value}", status_code=value)
+
+    def start(self) -> str:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        self.url = f"http://127.0.0.1:{port}/query"
+        return self.url
+
+_stub = None
+
+def get_stub() -> FaultStub:
+    global _stub
+    if _stub is None:
+        _stub = FaultStub()
+        _stub.start()
+    return _stub
+
+def run_async(coroutine):
+    # Runs a coroutine in a new event loop and closes the shared HTTP client bound to it.
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await close_async_client()
+    return asyncio.run(run())
+
+def fast_policy(**overrides) -> ResiliencePolicy:
+    settings = {"timeout": 1.0, "max_attempts": 3, "backoff_base": 0.01, "backoff_max": 0.05,
+                "breaker_failures": 5, "breaker_reset": 30, "hedge": False}
+    settings.update(overrides)
+    return ResiliencePolicy(**settings)
+
+def sync_send(stub: FaultStub):
+    def send(timeout: float):
+        response = requests.post(stub.url, json={"input": "test"}, timeout=(1, timeout))
+        response.raise_for_status()
+        return response.text
+    return send
+
+def async_send(stub: FaultStub, client: httpx.AsyncClient):
+    async def send(timeout: float):
+        response = await client.post(stub.url, json={"input": "test"})
+        response.raise_for_status()
+        return response.text
+    return send
+
+def test_retries_transient_5xx():
+    stub = get_stub()
+    stub.load(("status", 503), ("status", 502))
+    resilience = Resilience("test", fast_policy())
+    assert resilience.call(sync_send(stub)) == "OK"
+    assert stub.requests == 3
+    assert resilience.stats()["retries"] == 2
+
+def test_gives_up_after_max_attempts():
+    stub = get_stub()
+    stub.load(("status", 500), ("status", 500), ("status", 500), ("status", 500))
+    resilience = Resilience("test", fast_policy(max_attempts=3))
+    try:
+        resilience.call(sync_send(stub))
+    except requests.exceptions.HTTPError as e:
+        assert e.response.status_code == 500
+    else:
+        raise AssertionError("expected the last HTTP error")
+    assert stub.requests == 3
+
+def test_no_retry_on_client_error():
+    stub = get_stub()
+    stub.load(("status", 400))
+    resilience = Resilience("test", fast_policy())
+    try:
+        resilience.call(sync_send(stub))
+    except requests.exceptions.HTTPError as e:
+        assert e.response.status_code == 400
+    else:
+        raise AssertionError("expected the 400 to be raised")
+    assert stub.requests == 1
+    assert resilience.breaker.state == "closed"
+
+def test_honours_retry_after():
+    stub = get_stub()
+    stub.load(("retry_after", 0.3))
+    resilience = Resilience("test", fast_policy(backoff_max=1))
+    start = time.monotonic()
+    assert resilience.call(sync_send(stub)) == "OK"
+    assert time.monotonic() - start >= 0.3
+
+def test_sync_attempt_timeout():
+    stub = get_stub()
+    stub.load(("delay", 2))
+    resilience = Resilience("test", fast_policy(timeout=0.3))
+    start = time.monotonic()
+    assert resilience.call(sync_send(stub)) == "OK"
+    assert time.monotonic() - start < 1.5
+    assert stub.requests == 2
+
+def test_async_attempt_timeout():
+    stub = get_stub()
+    stub.load(("delay", 2))
+    resilience = Resilience("test", fast_policy(timeout=0.3))
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await resilience.call_async(async_send(stub, client))
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == "OK"
+    assert time.monotonic() - start < 1.5
+    assert stub.requests == 2
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    stub = get_stub()
+    stub.load(*[("status", 503)] * 4)
+    resilience = Resilience("test", fast_policy(max_attempts=2, breaker_failures=4, breaker_reset=0.5))
+    for _ in range(2):
+        try:
+            resilience.call(sync_send(stub))
+        except requests.exceptions.HTTPError:
+            pass
+    assert resilience.breaker.state == "open"
+
+    # While open, calls fail without reaching the backend.
+    start = time.monotonic()
+    try:
+        resilience.call(sync_send(stub))
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("expected CircuitOpenError")
+    assert time.monotonic() - start < 0.05
+    assert stub.requests == 4
+
+    # After the reset timeout one probe goes through and closes the circuit.
+    time.sleep(0.6)
+    assert resilience.breaker.state == "half_open"
+    assert resilience.call(sync_send(stub)) == "OK"
+    assert resilience.breaker.state == "closed"
+    assert resilience.stats()["short_circuited"] == 1
+
+def test_failed_probe_reopens_circuit():
+    stub = get_stub()
+    stub.load(("status", 503), ("status", 503))
+    resilience = Resilience("test", fast_policy(max_attempts=1, breaker_failures=1, breaker_reset=0.3))
+    for _ in range(2):
+        try:
+            resilience.call(sync_send(stub))
+        except (requests.exceptions.HTTPError, CircuitOpenError):
+            pass
+        time.sleep(0.35)
+    assert resilience.breaker.opened == 2
+    assert resilience.breaker.state == "half_open"
+
+def test_hedged_request_async():
+    stub = get_stub()
+    stub.load()
+    resilience = Resilience("test", fast_policy(hedge=True, hedge_percentile=0.95, hedge_min_samples=5))
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            send = async_send(stub, client)
+            for _ in range(5):
+                await resilience.call_async(send)
+            # The first copy is slow, the hedged duplicate answers at once.
+            stub.load(("delay", 1.5))
+            start = time.monotonic()
+            result = await resilience.call_async(send)
+            return result, time.monotonic() - start
+
+    result, seconds = asyncio.run(run())
+    assert result == "OK"
+    assert seconds < 1.0
+    assert resilience.stats()["hedges"] == 1
+    assert resilience.stats()["hedge_wins"] == 1
+
+def test_hedged_request_sync():
+    stub = get_stub()
+    stub.load()
+    resilience = Resilience("test", fast_policy(hedge=True, hedge_min_samples=5))
+    send = sync_send(stub)
+    for _ in range(5):
+        resilience.call(send)
+    stub.load(("delay", 1.5))
+    start = time.monotonic()
+    assert resilience.call(send) == "OK"
+    assert time.monotonic() - start < 1.0
+    assert resilience.stats()["hedge_wins"] == 1
+
+def test_backoff_jitter_bounds():
+    delays = [backoff_delay(attempt, 0.5, 4) for attempt in range(6) for _ in range(50)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert max(backoff_delay(0, 0.5, 4) for _ in range(50)) <= 0.5
+    assert len(set(delays)) > 100  # Jittered, not a fixed schedule.
+
+def test_retryable_classification():
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert is_retryable(requests.exceptions.ReadTimeout())
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(ValueError("bad JSON"))
+
+def test_policy_env_override():
+    os.environ["RESILIENCE_SLOW_BACKEND_TIMEOUT"] = "7.5"
+    os.environ["RESILIENCE_SLOW_BACKEND_HEDGE"] = "1"
+    try:
+        policy = ResiliencePolicy.from_env("slow_backend")
+    finally:
+        del os.environ["RESILIENCE_SLOW_BACKEND_TIMEOUT"]
+        del os.environ["RESILIENCE_SLOW_BACKEND_HEDGE"]
+    assert policy.timeout == 7.5
+    assert policy.hedge is True
+
+def test_analyzer_retries_transient_error():
+    stub = get_stub()
+    import updated_text_email_analyzer as analyzer
+    analyzer.CUSTOM_API_URL = stub.url
+    get_resilience("custom_api").policy = fast_policy()
+    stub.load(("status", 503))
+    assert analyzer.invoke_custom_api("Test", "Transient failure check.", "prompt") == "OK"
+    stub.load(("status", 502))
+    assert run_async(analyzer.invoke_custom_api_async("Test", "Transient failure check, async.", "prompt")) == "OK"
+    assert get_resilience("custom_api").stats()["retries"] == 2
+
+def test_stream_reports_to_breaker_when_client_disconnects():
+    stub = get_stub()
+    import updated_text_email_analyzer as analyzer
+    from resilience import CircuitBreaker
+    analyzer.CUSTOM_API_URL = stub.url
+    resilience = get_resilience("custom_api")
+    original = resilience.breaker
+    breaker = resilience.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+
+    async def disconnect_mid_stream():
+        stream = analyzer.stream_custom_api("Test", "Disconnect after the first chunk.", "prompt")
+        assert await stream.__anext__() == "Verdict: OK"
+        await stream.aclose()
+
+    async def cancel_before_answer():
+        stream = analyzer.stream_custom_api("Test", "Cancelled before the backend answers.", "prompt")
+        task = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await stream.aclose()
+
+    try:
+        breaker.record_failure()
+        time.sleep(0.25)
+        stub.load(("body", "Verdict: OK"))
+        run_async(disconnect_mid_stream())
+        assert breaker.state == "closed"
+
+        breaker.record_failure()
+        time.sleep(0.25)
+        stub.load(("delay", 1))
+        run_async(cancel_before_answer())
+        # The abandoned probe is released, so the next call may probe at once.
+        assert breaker.state == "half_open"
+        breaker.allow("custom_api")
+    finally:
+        resilience.breaker = original
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
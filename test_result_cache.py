@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import tempfile
+
+from result_cache import ResultCache
+
+VERDICT = {"violation_detected": True, "red_flags": ["slam dunk"], "violation_type": "Guarantees & Assurances"}
+
+def new_cache(**settings) -> ResultCache:
+    settings.setdefault("enabled", True)
+    return ResultCache(os.path.join(tempfile.mkdtemp(), "results.sqlite3"), **settings)
+
+def disk_total(cache: ResultCache) -> int:
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_results").fetchone()[0]
+
+def test_key_ignores_whitespace_but_not_prompt_or_model():
+    key = ResultCache.key_for("Hello   world\n\n\n", "prompt", "model")
+    assert key == ResultCache.key_for("Hello world", "prompt", "model")
+    assert key != ResultCache.key_for("Hello world", "prompt v2", "model")
+    assert key != ResultCache.key_for("Hello world", "prompt", "other model")
+
+def test_hits_are_copies():
+    cache = new_cache()
+    cache.put("k", VERDICT)
+    first = cache.get("k")
+    first["red_flags"].append("changed")
+    first["violation_detected"] = False
+    assert cache.get("k") == VERDICT
+    assert cache.stats()["memory_hits"] == 2
+
+def test_ttl_expires_both_tiers():
+    cache = new_cache(ttl=0.2)
+    cache.put("k", "verdict")
+    assert cache.get("k") == "verdict"
+    time.sleep(0.25)
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["misses"] == 1
+
+def test_memory_lru_falls_back_to_disk():
+    cache = new_cache(memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, f"verdict {key}")
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "verdict a"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"]) == (0, 1)
+    # The disk hit is kept in memory again, pushing out the least recently used entry.
+    assert list(cache._memory) == ["c", "a"]
+    assert cache.get("a") == "verdict a"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_disk_read_by_a_new_process():
+    path = os.path.join(tempfile.mkdtemp(), "results.sqlite3")
+    ResultCache(path, enabled=True).put("k", VERDICT)
+    reopened = ResultCache(path, enabled=True)
+    assert reopened.get("k") == VERDICT
+    assert reopened.stats()["disk_hits"] == 1
+
+def test_disk_eviction_is_lru_and_size_is_tracked():
+    payload = "x" * 1000
+    cache = new_cache(max_bytes=10_000, memory_entries=1)
+    for number in range(9):
+        cache.put(f"k{number}", payload)
+    assert cache.stats()["evictions"] == 0
+    cache.get("k0")  # Touched on disk, so k1 is now the least recently used.
+    cache.put("k9", payload)
+    # Trimmed to 90% of the limit, so the next put fits without evicting again.
+    assert cache.stats()["size_bytes"] == disk_total(cache) <= 10_000 * 0.9
+    evictions = cache.stats()["evictions"]
+    cache.put("k10", payload)
+    stats = cache.stats()
+    assert stats["evictions"] == evictions > 0
+    assert stats["size_bytes"] == disk_total(cache) <= 10_000
+    remaining = {row[0] for row in cache._conn.execute("SELECT key FROM analysis_results")}
+    assert {"k0", "k9", "k10"} <= remaining
+    assert "k1" not in remaining
+
+def test_size_accounting_on_replace_and_reopen():
+    path = os.path.join(tempfile.mkdtemp(), "results.sqlite3")
+    cache = ResultCache(path, enabled=True)
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 50)
+    cache.put("a", "z" * 10)
+    assert cache.stats()["size_bytes"] == disk_total(cache) == len('"' + "z" * 10 + '"') + len('"' + "y" * 50 + '"')
+    assert ResultCache(path, enabled=True).stats()["size_bytes"] == disk_total(cache)
+
+def test_oversized_result_only_in_memory():
+    cache = new_cache(max_bytes=100)
+    cache.put("k", "x" * 200)
+    assert cache.get("k") == "x" * 200
+    assert cache.stats()["entries"] == 0
+
+def test_async_get_and_put():
+    cache = new_cache(memory_entries=1)
+
+    async def run():
+        await cache.put_async("a", VERDICT)
+        await cache.put_async("b", "verdict b")
+        return await cache.get_async("b"), await cache.get_async("a"), await cache.get_async("missing")
+    assert asyncio.run(run()) == ("verdict b", VERDICT, None)
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_disabled_cache_stores_nothing():
+    cache = new_cache(enabled=False)
+    cache.put("k", "verdict")
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from bench_verdict_parser import PRETTY, RESPONSES, VERDICT
+from verdict_parser import (VerdictParseError, coerce_verdict, parse_verdict, parse_verdict_object,
+                            verdict_metrics)
+
+def test_json_shapes_give_the_verdict():
+    for name in ("well-formed JSON", "JSON in code fence", "JSON in prose", "trailing commas"):
+        assert parse_verdict(RESPONSES[name]).model_dump() == VERDICT, name
+
+def test_repairs_python_literals_and_smart_quotes():
+    text = PRETTY.replace("true", "True").replace('"Escalate to compliance team"', "“Escalate to compliance team”")
+    with pytest.raises(ValueError):
+        json.loads(text)
+    assert parse_verdict(text).model_dump() == VERDICT
+
+def test_label_format():
+    result = parse_verdict(RESPONSES["label format"])
+    assert result.violation_detected is True
+    assert result.violation_type == "Guarantees & Assurances"  # "Gaurantees" is normalised.
+    assert result.explanation == "Implies certainty about the outcome of a financial deal."
+    assert result.recommended_action == "Escalate to compliance team"
+
+def test_label_format_without_violation():
+    result = parse_verdict("Classification: No suspicious activity detected\nCategory: None\nExplanation: Routine.")
+    assert result.violation_detected is False
+    assert result.violation_type == "None"
+    assert result.recommended_action == "No action needed"
+
+def test_free_text():
+    result = parse_verdict(RESPONSES["free text"])
+    assert result.violation_detected is True
+    assert result.violation_type == "Guarantees & Assurances"
+    assert "slam dunk" in result.explanation
+
+def test_free_text_without_violation():
+    result = parse_verdict("No suspicious activity detected in this routine update.")
+    assert result.violation_detected is False
+    assert result.violation_type == "None"
+
+def test_refusal_raises():
+    with pytest.raises(VerdictParseError):
+        parse_verdict("I'm sorry, I can't help with that.")
+    with pytest.raises(VerdictParseError):
+        parse_verdict("")
+
+def test_coerce_fills_defaults_and_types():
+    result = coerce_verdict({"Violation_Detected": "Yes", "red_flags": "slam dunk", "violation_type": "front running"})
+    assert result.violation_detected is True
+    assert result.red_flags == ["slam dunk"]
+    assert result.violation_type == "Front Running"
+    assert result.summary == ""
+    assert result.recommended_action == "Escalate to compliance team"
+
+def test_verdict_object_unwraps_answer_text():
+    assert parse_verdict_object({"response": RESPONSES["JSON in code fence"]}).model_dump() == VERDICT
+    assert parse_verdict_object(dict(VERDICT)).model_dump() == VERDICT
+
+def test_metrics_count_parse_paths():
+    before = verdict_metrics()
+    parse_verdict(RESPONSES["well-formed JSON"])
+    parse_verdict(RESPONSES["JSON in prose"])
+    with pytest.raises(VerdictParseError):
+        parse_verdict("nothing here")
+    after = verdict_metrics()
+    assert after["json"] == before["json"] + 1
+    assert after["repaired_json"] == before["repaired_json"] + 1
+    assert after["failed"] == before["failed"] + 1
+    assert 0 < after["success_rate"] < 1
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    raise SystemExit(1 if failed else 0)
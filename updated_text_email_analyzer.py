@@ -1,34 +1,42 @@
 import os
+import httpx
 import requests
 from dotenv import load_dotenv, find_dotenv
+from http_client import endpoint, get_async_client, get_session, request_timeout
+from result_cache import get_result_cache
+from singleflight import get_single_flight
+from prompt_registry import get_prompt
+from fewshot import FEWSHOT_K, with_examples, with_examples_async
+from resilience import get_resilience, is_retryable
+from chunking import analyze_in_chunks, analyze_in_chunks_async, needs_chunking, merge_text_verdicts
+from batcher import (LLM_BATCH_ENABLED, MicroBatcher, batch_instructions, format_batch_input,
+                     is_short, parse_batch_verdicts)
 
 # Load environment variables if available.
 _ = load_dotenv(find_dotenv())
 
-# Set the custom API endpoint URL.
-CUSTOM_API_URL = os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query")
+# Set the custom API endpoint URL (the mock server when USE_MOCK_LLM=1).
+CUSTOM_API_URL = endpoint(os.getenv("CUSTOM_API_URL", "http://10.39.16.10:8000/query"), "/query")
+
+# System prompt template, loaded once (the version is selected with PROMPT_CUSTOM_API_VERSION).
+PROMPT = get_prompt("custom_api")
+
+# One micro-batcher per (toolkit, system prompt) pair; only used when LLM_BATCH_ENABLED=1.
+_batchers = {}
 
 def get_system_prompt() -> str:
     """
-    Returns a multi-line system prompt string for the custom API,
-    using triple-quoted strings for readability.
+    Returns the system prompt for the custom API: the selected version of the
+    custom_api template in prompts/, loaded and hashed once at import.
     """
-    prompt = """
-You are a compliance analyst trained to detect and categorize potential fraudulent or non compliant communication within a regulated banking environment.
-Given a communication excerpt, identify whether it suggests suspicious or fraudulent activity. If yes, assign it to one of the following categories:
-1. Guarantees & Assurances
-2. Gifts & Entertainment
-3. Front Running
+    return PROMPT.text
 
-Instructions:
-1. Read the message carefully.
-2. If it contains language suggesting fraud, ethical lapses, or regulatory risk, classify it and respond: "Suspicious Activity detected".
-3. If no suspicious activity is detected, respond: "No suspicious activity detected".
-4. Provide a brief explanation of the reasoning behind the classification.
+def prompt_version() -> str:
     """
-    result = prompt.strip()
-    print(f"DEBUG: system_prompt (first 100 chars): {result[:100]}...")
-    return result
+    Returns the label (family/version@hash) of the system prompt, recorded with each result;
+    "+fewshot<k>" is added when similar examples from the category guide are appended.
+    """
+    return f"{PROMPT.label}+fewshot{FEWSHOT_K}" if FEWSHOT_K > 0 else PROMPT.label
 
 def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str:
     """
@@ -54,6 +62,22 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
         print("ERROR:", error_msg)
         raise ValueError(error_msg)
     
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return analyze_in_chunks(input_text, lambda chunk: invoke_custom_api(tkd_name, chunk, system_prompt),
+                                 merge_text_verdicts)
+
+    # The examples most similar to the input are appended to the static instructions (FEWSHOT_K > 0).
+    system_prompt = with_examples(system_prompt, input_text)
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+    
     payload = {
         "tkd_name": tkd_name,
         "input": input_text,
@@ -62,14 +86,217 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
     print("DEBUG: Invoking custom API with payload:")
     print(f"DEBUG: {payload}")
     
+    # Concurrent identical calls share one request instead of each calling the API.
+    return get_single_flight().do(cache_key, _post_custom_api, payload, cache_key)
+
+async def invoke_custom_api_async(tkd_name: str, input_text: str, system_prompt: str, examples: bool = True) -> str:
+    """
+    Async variant of invoke_custom_api for use inside async FastAPI handlers.
+
+    The request goes through the shared, pooled httpx.AsyncClient (keep-alive, pool
+    size and timeouts configured in http_client.py), so the event loop keeps serving
+    other requests while the custom API is working.
+
+    Args:
+        tkd_name (str): The toolkit/model identifier.
+        input_text (str): The email content.
+        system_prompt (str): The analysis instructions.
+        examples (bool, optional): Whether to append few-shot examples (FEWSHOT_K). Batched
+            calls pass False: examples after the per-message batch instructions weaken the
+            one-verdict-per-message answer format.
+
+    Returns:
+        str: The plain text response from the custom API.
+    """
+    if not input_text or input_text.strip() == "":
+        error_msg = "Input text is empty. Cannot invoke custom API without email content."
+        print("ERROR:", error_msg)
+        raise ValueError(error_msg)
+
+    # Bodies too long for one request are analyzed in chunks and the verdicts merged.
+    if needs_chunking(input_text):
+        return await analyze_in_chunks_async(
+            input_text, lambda chunk: invoke_custom_api_async(tkd_name, chunk, system_prompt, examples),
+            merge_text_verdicts
+        )
+
+    # The examples most similar to the input are appended to the static instructions (FEWSHOT_K > 0).
+    if examples:
+        system_prompt = await with_examples_async(system_prompt, input_text)
+
+    # Identical input, instructions and toolkit always produce the same analysis.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+
+    payload = {
+        "tkd_name": tkd_name,
+        "input": input_text,
+        "system_prompt": system_prompt
+    }
+    print(f"DEBUG: Invoking custom API (async) with payload: {payload}")
+
+    # Concurrent identical calls await one shared request instead of each calling the API.
+    return await get_single_flight().do_async(cache_key, _post_custom_api_async, payload, cache_key)
+
+async def stream_custom_api(tkd_name: str, input_text: str, system_prompt: str):
+    """
+    Streaming variant of invoke_custom_api_async: an async generator that yields the
+    response text in chunks as the custom API sends them, so callers can forward them
+    before the whole analysis is done. The complete response is cached afterwards.
+
+    Cached results and bodies that need chunking are yielded as one chunk. A stream
+    cannot be retried once it has started, so only the circuit breaker applies.
+
+    Args:
+        tkd_name (str): The toolkit/model identifier.
+        input_text (str): The email content.
+        system_prompt (str): The analysis instructions.
+    """
+    if not input_text or input_text.strip() == "":
+        error_msg = "Input text is empty. Cannot invoke custom API without email content."
+        print("ERROR:", error_msg)
+        raise ValueError(error_msg)
+
+    if needs_chunking(input_text):
+        yield await invoke_custom_api_async(tkd_name, input_text, system_prompt)
+        return
+
+    system_prompt = await with_examples_async(system_prompt, input_text)
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, tkd_name)
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        yield cached
+        return
+
+    payload = {
+        "tkd_name": tkd_name,
+        "input": input_text,
+        "system_prompt": system_prompt
+    }
     headers = {"Content-Type": "application/json"}
-    
+    print(f"DEBUG: Streaming custom API response for payload: {payload}")
+
+    breaker = get_resilience("custom_api").breaker
+    breaker.allow("custom_api")
+    # True once the backend answered, False on a failure that counts against it. The
+    # outcome is recorded in `finally`, so a client disconnecting mid-stream
+    # (GeneratorExit/CancelledError) still reports back to the breaker.
+    healthy = None
+    parts = []
     try:
-        response = requests.post(CUSTOM_API_URL, json=payload, headers=headers)
+        async with get_async_client().stream("POST", CUSTOM_API_URL, json=payload, headers=headers) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            healthy = True
+            async for chunk in response.aiter_text():
+                if chunk:
+                    parts.append(chunk)
+                    yield chunk
+    except httpx.HTTPStatusError as he:
+        print("ERROR: HTTP error when invoking custom API:", he)
+        print("ERROR: Response Content:", he.response.text)
+        healthy = not is_retryable(he)
+        raise he
+    except Exception as e:
+        print("ERROR invoking custom API:", e)
+        if is_retryable(e):
+            healthy = False
+        raise e
+    finally:
+        if healthy is True:
+            breaker.record_success()
+        elif healthy is False:
+            breaker.record_failure()
+        else:
+            breaker.release()
+
+    result = "".join(parts)
+    print(f"DEBUG: Streamed custom API response (first 100 chars): {result[:100]}...")
+    await cache.put_async(cache_key, result)
+
+async def invoke_custom_api_batched(tkd_name: str, input_text: str, system_prompt: str) -> str:
+    """
+    Like invoke_custom_api_async, but short inputs may be packed together with other
+    concurrent short inputs into one request (opt-in with LLM_BATCH_ENABLED=1).
+
+    The batch asks for a JSON array with one verdict per input and each caller gets its
+    own verdict back. A batch is sent after at most LLM_BATCH_MAX_WAIT_MS, and inputs
+    are retried one by one if the batched answer cannot be split.
+
+    Args:
+        tkd_name (str): The toolkit/model identifier.
+        input_text (str): The email content or text to analyze.
+        system_prompt (str): The analysis instructions.
+
+    Returns:
+        str: The verdict for this input.
+    """
+    if not LLM_BATCH_ENABLED or not input_text or input_text.strip() == "" or not is_short(input_text):
+        return await invoke_custom_api_async(tkd_name, input_text, system_prompt)
+
+    # Verdicts taken from a batched reply are cached apart from the per-input answers of
+    # invoke_custom_api_async, so a non-batched caller never gets a batch-format answer.
+    cache = get_result_cache()
+    cache_key = cache.key_for(input_text, system_prompt, f"{tkd_name}+batched")
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        print(f"DEBUG: Result cache hit (first 100 chars): {cached[:100]}...")
+        return cached
+
+    result = await _get_batcher(tkd_name, system_prompt).submit(input_text)
+    await cache.put_async(cache_key, result)
+    return result
+
+def _get_batcher(tkd_name: str, system_prompt: str) -> MicroBatcher:
+    batcher = _batchers.get((tkd_name, system_prompt))
+    if batcher is None:
+        async def send_batch(texts: list) -> list:
+            response = await invoke_custom_api_async(
+                tkd_name, format_batch_input(texts), batch_instructions(system_prompt, len(texts)), examples=False
+            )
+            return parse_batch_verdicts(response, len(texts))
+
+        async def send_one(text: str) -> str:
+            return await invoke_custom_api_async(tkd_name, text, system_prompt)
+
+        batcher = _batchers[(tkd_name, system_prompt)] = MicroBatcher(send_batch, send_one)
+    return batcher
+
+def batch_stats() -> dict:
+    """
+    Returns the micro-batching counters summed over all batchers.
+    """
+    totals = {"batches": 0, "batched_items": 0, "fallbacks": 0}
+    for batcher in _batchers.values():
+        for name, value in batcher.stats().items():
+            if name in totals:
+                totals[name] += value
+    return totals
+
+def _post_custom_api(payload: dict, cache_key: str) -> str:
+    """
+    Sends the payload to the custom API and caches its plain text response.
+    """
+    headers = {"Content-Type": "application/json"}
+    
+    def send(timeout: float):
+        response = get_session().post(CUSTOM_API_URL, json=payload, headers=headers, timeout=request_timeout(timeout))
         response.raise_for_status()  # Raise an error if HTTP error code.
+        return response
+
+    try:
+        # Per-attempt timeout, retries with backoff and the circuit breaker are in resilience.py.
+        response = get_resilience("custom_api").call(send)  # Raise an error if HTTP error code.
     except requests.exceptions.HTTPError as he:
         print("ERROR: HTTP error when invoking custom API:", he)
-        print("ERROR: Response Content:", response.text)
+        print("ERROR: Response Content:", he.response.text)
         raise he
     except Exception as e:
         print("ERROR invoking custom API:", e)
@@ -77,4 +304,31 @@ def invoke_custom_api(tkd_name: str, input_text: str, system_prompt: str) -> str
     
     result = response.text
     print(f"DEBUG: Received custom API response (first 100 chars): {result[:100]}...")
+    get_result_cache().put(cache_key, result)
+    return result
+
+async def _post_custom_api_async(payload: dict, cache_key: str) -> str:
+    """
+    Async variant of _post_custom_api using the pooled httpx.AsyncClient.
+    """
+    headers = {"Content-Type": "application/json"}
+
+    async def send(timeout: float):
+        response = await get_async_client().post(CUSTOM_API_URL, json=payload, headers=headers)
+        response.raise_for_status()
+        return response
+
+    try:
+        response = await get_resilience("custom_api").call_async(send)
+    except httpx.HTTPStatusError as he:
+        print("ERROR: HTTP error when invoking custom API:", he)
+        print("ERROR: Response Content:", he.response.text)
+        raise he
+    except Exception as e:
+        print("ERROR invoking custom API:", e)
+        raise e
+
+    result = response.text
+    print(f"DEBUG: Received custom API response (first 100 chars): {result[:100]}...")
+    await get_result_cache().put_async(cache_key, result)
     return result
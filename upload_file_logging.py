@@ -1,7 +1,5 @@
 import os
 import uvicorn
-import shutil
-import tempfile
 import logging
 
 from fastapi import FastAPI, HTTPException, Query, File, UploadFile
@@ -17,8 +15,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Import custom modules.
-from parser import parse_email        # parse_email(file_path: str) -> dict
-from analyzer import get_system_prompt, invoke_custom_api  # from analyzer.py
+from parser import parse_email        # parse_email(source, filename: str = None) -> dict
+from parse_cache import get_parse_cache
+from analyzer import get_system_prompt, invoke_custom_api_async, invoke_custom_api_batched  # from analyzer.py
+from http_client import close_async_client
+from reply_history import prepare_body
 
 # Determine the absolute base directory (project folder) and set the archive folder.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -40,6 +41,11 @@ app = FastAPI(
     version="1.0"
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    # Release the pooled connections to the custom API.
+    await close_async_client()
+
 # ---------------------------
 # Endpoint 1: Analyze via Filename (GET)
 # ---------------------------
@@ -58,18 +64,19 @@ async def analyze_email_endpoint(
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
     
     try:
-        email_data = parse_email(file_path)
+        email_data = get_parse_cache().parse(parse_email, file_path)
         logger.debug(f"Parsed email data: {email_data}")
-        email_body = email_data.get("body", "")
+        email_body, history = prepare_body(email_data.get("body", ""))
         logger.debug(f"Extracted email body (first 100 chars): {email_body[:100]}...")
         
         system_prompt = get_system_prompt()
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        analysis = await invoke_custom_api_async(TKD_NAME, email_body, system_prompt)
         logger.debug(f"Custom API analysis received (first 100 chars): {analysis[:100]}...")
         
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history
         }
         logger.debug(f"Assembled result: {result}")
     except Exception as e:
@@ -94,7 +101,7 @@ async def analyze_text_endpoint(request: TextAnalysisRequest):
     
     try:
         system_prompt = get_system_prompt()
-        analysis = invoke_custom_api(TKD_NAME, text_input, system_prompt)
+        analysis = await invoke_custom_api_batched(TKD_NAME, text_input, system_prompt)
         logger.debug(f"Custom API analysis (first 100 chars): {analysis[:100]}...")
         result = {"analysis": analysis}
         logger.debug(f"Assembled result for text analysis: {result}")
@@ -115,35 +122,28 @@ async def analyze_file_endpoint(
         raise HTTPException(status_code=400, detail="Only .msg files are supported")
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp:
-            temp_file_path = tmp.name
-            content = await file.read()
-            tmp.write(content)
-        logger.debug(f"Saved uploaded file to temporary path: {temp_file_path}")
+        # Parse the upload directly in memory (no temporary file).
+        content = await file.read()
+        logger.debug(f"Read uploaded file into memory ({len(content)} bytes)")
         
-        email_data = parse_email(temp_file_path)
+        email_data = parse_email(content, filename=file.filename)
         logger.debug(f"Parsed email data: {email_data}")
-        email_body = email_data.get("body", "")
+        email_body, history = prepare_body(email_data.get("body", ""))
         logger.debug(f"Extracted email body (first 100 chars): {email_body[:100]}...")
         
         system_prompt = get_system_prompt()
-        analysis = invoke_custom_api(TKD_NAME, email_body, system_prompt)
+        analysis = await invoke_custom_api_async(TKD_NAME, email_body, system_prompt)
         logger.debug(f"Custom API analysis received (first 100 chars): {analysis[:100]}...")
         
         result = {
             "metadata": email_data.get("metadata", {}),
-            "analysis": analysis
+            "analysis": analysis,
+            "history": history
         }
         logger.debug(f"Assembled result for file upload: {result}")
     except Exception as e:
         logger.error(f"Exception in /analyze-file endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        try:
-            os.remove(temp_file_path)
-            logger.debug(f"Removed temporary file: {temp_file_path}")
-        except Exception as e:
-            logger.error(f"Error removing temporary file: {str(e)}")
     
     return JSONResponse(content=result)
 
@@ -1,32 +1,9 @@
-import re
 import os
+from normalizer import format_email_body
+from email_source import describe_source, msg_source, source_filename
+from html_text import convert_html_body
 
-def format_email_body(body: str) -> str:
-    """
-    Formats an email body by normalizing newline characters,
-    collapsing extra spaces and newlines, and ensuring clean, human-readable text.
-    
-    Steps:
-      1. Convert Windows-style newlines (\r\n) and stray carriage returns (\r) into Unix-style newlines (\n).
-      2. Collapse multiple spaces or tab characters into a single space.
-      3. Collapse multiple consecutive newlines into a single blank line.
-      4. Trim leading and trailing whitespace.
-    
-    Args:
-        body (str): The raw email body text.
-    
-    Returns:
-        str: The formatted email body.
-    """
-    # Normalize newlines to Unix-style.
-    body = body.replace('\r\n', '\n').replace('\r', '\n')
-    # Collapse multiple spaces or tabs into a single space.
-    body = re.sub(r'[ \t]+', ' ', body)
-    # Collapse multiple consecutive newlines into one blank line.
-    body = re.sub(r'\n\s*\n', '\n\n', body)
-    return body.strip()
-
-def parse_msg(file_path: str) -> dict:
+def parse_msg(source) -> dict:
     """
     Parses an Outlook email (.msg) file using the extract_msg package and returns a dictionary
     with the extracted metadata and a formatted email body.
@@ -34,14 +11,14 @@ def parse_msg(file_path: str) -> dict:
     The metadata includes keys such as "From", "To", "Cc", "Bcc", and "Date".
     
     Args:
-        file_path (str): The path to the .msg file.
+        source: The path to the .msg file, or its content as bytes, memoryview or a file-like object.
     
     Returns:
         dict: A dictionary with two keys:
                 - "metadata": A dictionary with email header information.
                 - "body": A string containing the formatted email content.
     """
-    print(f"DEBUG: Starting parse_msg for file: {file_path}")
+    print(f"DEBUG: Starting parse_msg for file: {describe_source(source)}")
     try:
         import extract_msg
     except ImportError as e:
@@ -50,7 +27,7 @@ def parse_msg(file_path: str) -> dict:
         raise ImportError(error_msg) from e
 
     try:
-        msg = extract_msg.Message(file_path)
+        msg = extract_msg.Message(msg_source(source))
     except Exception as e:
         print(f"ERROR reading .msg file: {e}")
         raise e
@@ -66,24 +43,25 @@ def parse_msg(file_path: str) -> dict:
     
     body = msg.body
     if not body or body.strip() == "":
-        if hasattr(msg, "htmlBody"):
-            body = msg.htmlBody
+        if hasattr(msg, "htmlBody") and msg.htmlBody:
+            body, _ = convert_html_body(msg.htmlBody)
             print("DEBUG: Falling back to HTML body for .msg file.")
     print(f"DEBUG: Raw MSG body length: {len(body) if body else 0}")
     
     formatted_body = format_email_body(body) if body else ""
     print(f"DEBUG: Formatted MSG body length: {len(formatted_body)}")
-    print(f"DEBUG: Completed parse_msg for file: {file_path}")
+    print(f"DEBUG: Completed parse_msg for file: {describe_source(source)}")
     
     return {"metadata": metadata, "body": formatted_body}
 
-def parse_email(file_path: str) -> dict:
+def parse_email(source, filename: str = None) -> dict:
     """
     Dispatch function that determines the file type based on extension and invokes the appropriate parser.
     Currently supports only .msg files.
     
     Args:
-        file_path (str): The path to the file.
+        source: The path to the file, or its content as bytes, memoryview or a file-like object.
+        filename (str, optional): The original filename, required for in-memory sources.
     
     Returns:
         dict: The parsed email data.
@@ -91,9 +69,9 @@ def parse_email(file_path: str) -> dict:
     Raises:
         ValueError: If the file format is unsupported.
     """
-    print(f"DEBUG: In parse_email with file: {file_path}")
-    if file_path.lower().endswith(".msg"):
-        return parse_msg(file_path)
+    print(f"DEBUG: In parse_email with file: {describe_source(source)}")
+    if source_filename(source, filename).lower().endswith(".msg"):
+        return parse_msg(source)
     else:
         error_msg = "Unsupported file format. Only .msg files are supported."
         print("ERROR:", error_msg)
@@ -0,0 +1,203 @@
+import re
+import json
+import threading
+from typing import List
+
+from pydantic import BaseModel
+
+from chunking import canonical_category, categories_in
+
+class AnalysisResult(BaseModel):
+    summary: str
+    red_flags: List[str]
+    violation_detected: bool
+    violation_type: str
+    explanation: str
+    recommended_action: str
+
+class VerdictParseError(ValueError):
+    """
+    Raised when a response contains no verdict in any of the supported formats.
+    """
+
+# How the responses were parsed, across this process.
+VERDICT_METRICS = {"json": 0, "repaired_json": 0, "labels": 0, "free_text": 0, "failed": 0}
+_metrics_lock = threading.Lock()
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = re.compile(r"(?<![\"\w])(True|False|None)(?![\"\w])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+_LABEL = re.compile(r"^\s*[#*\-\s]*(Classification|Category|Explanation)\s*\**\s*:\s*\**\s*(.*)$", re.IGNORECASE)
+_DETECTED = re.compile(r"\b(no\s+)?suspicious\s+activity\s+(?:was\s+)?detected\b", re.IGNORECASE)
+
+# Keys that mark a JSON object as a verdict rather than a wrapper around the answer text.
+_VERDICT_KEYS = {"summary", "red_flags", "violation_detected", "violation_type", "explanation",
+                 "recommended_action", "classification", "category"}
+
+_DEFAULT_ACTIONS = {True: "Escalate to compliance team", False: "No action needed"}
+_TRUE_WORDS = ("true", "yes", "y", "1")
+
+def _count(kind: str):
+    with _metrics_lock:
+        VERDICT_METRICS[kind] += 1
+
+def _as_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    return str(value).strip().lower() in _TRUE_WORDS
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [line.strip(" -*\t") for line in str(value).splitlines() if line.strip(" -*\t")]
+
+def _is_none(value) -> bool:
+    return value is None or str(value).strip().lower() in ("", "none", "n/a", "null")
+
+def coerce_verdict(data: dict) -> AnalysisResult:
+    """
+    Maps a verdict dict onto AnalysisResult: missing fields get defaults, strings such as
+    "Yes" become booleans, a single red flag becomes a list, category spellings are
+    normalised, and Classification/Category/Explanation keys are accepted as well.
+    """
+    lowered = {str(key).strip().lower(): value for key, value in data.items()}
+    violation_type = lowered.get("violation_type", lowered.get("category"))
+    violation_type = "None" if _is_none(violation_type) else canonical_category(violation_type)
+    if "violation_detected" in lowered:
+        detected = _as_bool(lowered["violation_detected"])
+    elif "classification" in lowered:
+        detected = _is_flagged(str(lowered["classification"]))
+    else:
+        detected = violation_type != "None"
+    action = lowered.get("recommended_action")
+    return AnalysisResult(
+        summary=str(lowered.get("summary") or lowered.get("classification") or "").strip(),
+        red_flags=_as_list(lowered.get("red_flags")),
+        violation_detected=detected,
+        violation_type=violation_type,
+        explanation=str(lowered.get("explanation") or "").strip(),
+        recommended_action=str(action).strip() if not _is_none(action) else _DEFAULT_ACTIONS[detected]
+    )
+
+def _is_flagged(text: str) -> bool:
+    match = _DETECTED.search(text)
+    if match:
+        return not match.group(1)
+    return "suspicious" in text.lower() and "no suspicious" not in text.lower()
+
+def _json_candidates(text: str):
+    # The whole text, then fenced blocks, then the outermost braces.
+    yield text
+    for block in _CODE_FENCE.findall(text):
+        yield block.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        yield text[start:end + 1]
+
+def _repair(candidate: str) -> str:
+    candidate = candidate.translate(_SMART_QUOTES)
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+    return _PYTHON_LITERALS.sub(lambda m: {"True": "true", "False": "false", "None": "null"}[m.group(1)], candidate)
+
+def _parse_json(text: str):
+    for candidate in _json_candidates(text):
+        for source in dict.fromkeys((candidate, _repair(candidate))):
+            try:
+                data = json.loads(source)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                return data, source is not text
+    return None, False
+
+def _parse_labels(text: str):
+    labels = {}
+    current = None
+    for line in text.splitlines():
+        match = _LABEL.match(line)
+        if match:
+            current = match.group(1).lower()
+            labels[current] = match.group(2).strip().strip("*").strip()
+        elif current == "explanation" and line.strip():
+            labels["explanation"] = f"{labels['explanation']} {line.strip()}".strip()
+    return labels if "classification" in labels else None
+
+def _parse_free_text(text: str):
+    match = _DETECTED.search(text)
+    if not match:
+        return None
+    detected = not match.group(1)
+    categories = categories_in(text) if detected else []
+    explanation = (text[:match.start()] + text[match.end():]).strip(" \t\r\n.:;-\"'")
+    return {
+        "summary": match.group(0).capitalize(),
+        "violation_detected": detected,
+        "violation_type": categories[0] if categories else "None",
+        "explanation": " ".join(explanation.split())
+    }
+
+def parse_verdict(text: str) -> AnalysisResult:
+    """
+    Turns an LLM response into an AnalysisResult without calling the LLM again.
+
+    Tried in order:
+      1. well-formed JSON (the fast path)
+      2. JSON inside prose or ``` code fences, repaired for trailing commas, smart quotes
+         and Python literals
+      3. the "Classification: / Category: / Explanation:" label format
+      4. free text containing "Suspicious activity detected" / "No suspicious activity detected"
+
+    Raises:
+        VerdictParseError: If the response matches none of the formats.
+    """
+    text = (text or "").strip()
+    if text.startswith("{"):
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict):
+                _count("json")
+                return coerce_verdict(data)
+        except ValueError:
+            pass
+    data, repaired = _parse_json(text)
+    if data is not None:
+        _count("repaired_json" if repaired else "json")
+        return coerce_verdict(data)
+    labels = _parse_labels(text)
+    if labels is not None:
+        _count("labels")
+        return coerce_verdict(labels)
+    data = _parse_free_text(text)
+    if data is not None:
+        _count("free_text")
+        return coerce_verdict(data)
+    _count("failed")
+    raise VerdictParseError(f"No verdict found in response: {text[:200]!r}")
+
+def parse_verdict_object(data: dict) -> AnalysisResult:
+    """
+    Maps an already decoded JSON object (e.g. the kept keys of a projected response)
+    onto AnalysisResult. An object that only wraps the answer text, such as
+    {"response": "..."}, is parsed with parse_verdict.
+    """
+    if not any(str(key).strip().lower() in _VERDICT_KEYS for key in data):
+        texts = [value for value in data.values() if isinstance(value, str)]
+        if len(texts) == 1:
+            return parse_verdict(texts[0])
+    _count("json")
+    return coerce_verdict(data)
+
+def verdict_metrics() -> dict:
+    """
+    Returns the counts per parse path with the share of responses that yielded a verdict.
+    """
+    with _metrics_lock:
+        metrics = dict(VERDICT_METRICS)
+    total = sum(metrics.values())
+    metrics["success_rate"] = round(1 - metrics["failed"] / total, 4) if total else None
+    return metrics